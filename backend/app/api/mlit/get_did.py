@@ -3,15 +3,15 @@
 人口集中地区（DID）データなどの国土数値情報を取得
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, Dict, Any
-import httpx
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Optional, Dict, Any, Union
+import asyncio
 import logging
-import os
-from dotenv import load_dotenv
-
-# 環境変数を読み込み
-load_dotenv()
+from ...exceptions.station import MLITAPIError
+from ...utils.did_tile_prefetcher import get_did_tile_store
+from ...utils.mlit_api import TileStream, decode_tile_content, mlit_api_client
+from ...utils.tile_cache import CachedTile, TileKey, get_tile_cache
 
 logger = logging.getLogger(__name__)
 
@@ -21,19 +21,62 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# 国土交通省APIの設定
-MLIT_BASE_URL = "https://www.reinfolib.mlit.go.jp/ex-api/external"
-MLIT_API_KEY = os.getenv("MLIT_API_KEY")
+# レスポンス形式ごとのメディアタイプ
+GEOJSON_MEDIA_TYPE = "application/json"
+PBF_MEDIA_TYPE = "application/x-protobuf"
+
+
+def accepts_compressed(accept_encoding: str) -> bool:
+    """クライアントが上流の圧縮形式（gzip / deflate）をそのまま受け取れるかを判定する"""
+    accepted = {value.split(";")[0].strip().lower() for value in accept_encoding.split(",")}
+    return "*" in accepted or {"gzip", "deflate"} <= accepted
+
+
+class TileStreamingResponse(StreamingResponse):
+    """
+    タイルのストリーミング中継のレスポンス
+    クライアントの切断などで本文を最後まで送れなかった場合も、上流のレスポンスを閉じて中継を終了する
+    """
+    def __init__(self, tile: TileStream, **kwargs):
+        super().__init__(tile.chunks, **kwargs)
+        self.tile = tile
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.tile.aclose()
+
+
+def build_tile_response(tile: Union[CachedTile, TileStream], media_type: str, compressed_ok: bool) -> Response:
+    """
+    タイルをバイト列のままクライアントに返すレスポンスを作成する
+    上流の圧縮はクライアントが対応していればそのまま転送する
+    """
+    headers = {"Vary": "Accept-Encoding"}
+
+    if isinstance(tile, TileStream):
+        if tile.content_encoding:
+            headers["Content-Encoding"] = tile.content_encoding
+        return TileStreamingResponse(tile, media_type=media_type, headers=headers)
+
+    content = tile.content
+    if tile.content_encoding and compressed_ok:
+        headers["Content-Encoding"] = tile.content_encoding
+    elif tile.content_encoding:
+        content = decode_tile_content(tile)
+    return Response(content=content, media_type=media_type, headers=headers)
 
 
-@router.get("/did", summary="人口集中地区（DID）データの取得")
+@router.get("/did", summary="人口集中地区（DID）データの取得", response_class=Response)
 async def get_did_data(
+    request: Request,
     z: int = Query(..., description="ズームレベル（9-15、範囲外は自動調整）"),
     x: int = Query(..., description="タイルX座標"),
     y: int = Query(..., description="タイルY座標"),
     response_format: str = Query("geojson", description="レスポンス形式"),
     administrative_area_code: Optional[str] = Query(None, description="行政区域コード（5桁、カンマ区切り）", alias="administrativeAreaCode")
-) -> Dict[str, Any]:
+) -> Response:
     """
     国土交通省APIから人口集中地区（DID）データを取得します。
     
@@ -46,6 +89,8 @@ async def get_did_data(
     
     戻り値:
     - GeoJSONまたはPBF形式の人口集中地区データ
+      （上流のレスポンスを解析・再シリアライズせずにそのまま中継します。
+        PBF形式は application/x-protobuf のバイナリを返します）
     """
     
     try:
@@ -65,55 +110,47 @@ async def get_did_data(
             y = max(0, min(max_tile_coord, y))
             logger.info(f"Adjusted tile coordinates to: x={x}, y={y}")
         
-        # パラメータの構築
-        params = {
-            "response_format": response_format,
-            "z": z,
-            "x": x,
-            "y": y
-        }
-        
-        if administrative_area_code:
-            params["administrativeAreaCode"] = administrative_area_code
-        
-        # 国土交通省APIへのリクエスト
-        api_url = f"{MLIT_BASE_URL}/XKT031"
-        
-        # ヘッダーを設定
-        headers = {}
-        if MLIT_API_KEY:
-            headers["Ocp-Apim-Subscription-Key"] = MLIT_API_KEY
-        
-        logger.info(f"Requesting MLIT API: {api_url} with params: {params} and headers: {list(headers.keys())}")
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(api_url, params=params, headers=headers)
-            
-            # レスポンスの詳細をログ出力
-            logger.info(f"MLIT API response status: {response.status_code}")
-            if response.status_code != 200:
-                logger.error(f"MLIT API error response: {response.text}")
-            
-            response.raise_for_status()
-            
-            # レスポンスの形式に応じて処理
-            if response_format == "geojson":
-                return response.json()
-            else:
-                # PBF形式の場合はバイナリデータをそのまま返す
-                return {"data": response.content.hex()}
-                
-    except httpx.TimeoutException:
-        logger.error(f"Timeout when requesting MLIT API: {api_url}")
-        raise HTTPException(status_code=504, detail="国土交通省APIへのリクエストがタイムアウトしました")
-    
-    except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error when requesting MLIT API: {e.response.status_code} - {e.response.text}")
-        raise HTTPException(
-            status_code=e.response.status_code,
-            detail=f"国土交通省APIエラー: {e.response.status_code}"
+        # 共有クライアントでタイルを取得（キャッシュに存在すればAPIを呼び出さない）
+        cache_key = TileKey(
+            api="XKT031", z=z, x=x, y=y,
+            response_format=response_format,
+            administrative_area_code=administrative_area_code
         )
+        logger.info(f"Requesting MLIT tile: {cache_key.to_string()}")
+
+        media_type = GEOJSON_MEDIA_TYPE if response_format == "geojson" else PBF_MEDIA_TYPE
+        compressed_ok = accepts_compressed(request.headers.get("accept-encoding", ""))
+
+        # 事前取得済みのタイルストアにあればローカルから返す（行政区域コード指定時は対象外）
+        # ストアの読み込みはSQLiteへのアクセスのためスレッドプールで実行する
+        tile_store = get_did_tile_store(response_format) if not administrative_area_code else None
+        if tile_store is not None:
+            tile_data = await asyncio.to_thread(tile_store.get_tile, z, x, y)
+            if tile_data is not None:
+                stored_tile = CachedTile(
+                    content=tile_data, media_type=media_type, stored_at=0.0, content_encoding="gzip"
+                )
+                return build_tile_response(stored_tile, media_type, compressed_ok)
+            # 上流に存在しないことを確認済みのタイルはAPIを呼び出さずに空のレスポンスを返す
+            if await asyncio.to_thread(tile_store.is_missing, z, x, y):
+                return Response(status_code=204)
+
+        # GeoJSON・PBFともに変換せずストリーミングで返す
+        # （featureを加工する場合のみ mlit_api_client.fetch_tile で解析済みのデータを使う）
+        tile = await mlit_api_client.stream_tile(cache_key, decode=not compressed_ok)
+        return build_tile_response(tile, media_type, compressed_ok)
+
+    except MLITAPIError:
+        raise
     
     except Exception as e:
         logger.error(f"Unexpected error when requesting MLIT API: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"内部サーバーエラー: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"内部サーバーエラー: {str(e)}")
+
+
+@router.get("/tile-cache/stats", summary="タイルキャッシュの統計情報")
+async def get_tile_cache_stats() -> Dict[str, Any]:
+    """
+    MLITタイルキャッシュのヒット/ミス件数や使用量を返します。
+    """
+    return get_tile_cache().stats()
\ No newline at end of file
@@ -1,36 +1,33 @@
 from fastapi import APIRouter, HTTPException, Query
-import geopandas as gpd
-from pathlib import Path
+from ...models.station import (
+    StationCoordinatesBatchItem,
+    StationCoordinatesBatchRequest,
+    StationCoordinatesBatchResponse,
+)
+from ...utils.station_repository import get_station_repository
 
 router = APIRouter(
     prefix="/api/stations",
     tags=["stations"]
 )
 
-# GeoJSONファイルのパス
-STATION_GEOJSON_PATH = Path(__file__).parents[3] / "data/raw/geojson/S12-22_NumberOfPassengers.geojson"
-
 @router.get("/get_coordinates_by_stationid")
 async def get_coordinates_by_stationid(
     station_id: str = Query(..., description="駅ID")
 ):
     try:
-        # GeoJSONファイルの読み込み
-        gdf = gpd.read_file(STATION_GEOJSON_PATH, encoding='utf-8')
-
-        # 駅IDでフィルタリング
-        filtered_gdf = gdf[gdf["S12_001c"] == station_id]
+        # 常駐している駅データから駅IDで検索
+        station = get_station_repository().get_by_station_id(station_id)
 
-        if len(filtered_gdf) == 0:
+        if station is None:
             raise HTTPException(
                 status_code=404,
                 detail="指定された駅IDが見つかりません"
             )
 
-        row = filtered_gdf.iloc[0]
         coordinates = {
-            "lng": row.geometry.centroid.x,
-            "lat": row.geometry.centroid.y
+            "lng": station.lng,
+            "lat": station.lat
         }
 
         return {
@@ -38,6 +35,46 @@ async def get_coordinates_by_stationid(
             "coordinates": coordinates
         }
 
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=500,
+            detail="GeoJSONファイルが見つかりません"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"エラーが発生しました: {str(e)}"
+        )
+
+@router.post(
+    "/get_coordinates_by_stationid/batch",
+    response_model=StationCoordinatesBatchResponse,
+    response_model_exclude_none=True
+)
+async def get_coordinates_by_stationid_batch(request: StationCoordinatesBatchRequest):
+    """
+    複数の駅IDの座標をまとめて返す
+    結果はリクエストと同じ順序で返し、見つからない駅IDはerrorを返す
+    """
+    try:
+        repository = get_station_repository()
+        results = []
+        for station_id in request.station_ids:
+            station = repository.get_by_station_id(station_id)
+            if station is None:
+                results.append(StationCoordinatesBatchItem(
+                    station_id=station_id,
+                    error="指定された駅IDが見つかりません"
+                ))
+            else:
+                results.append(StationCoordinatesBatchItem(
+                    station_id=station_id,
+                    coordinates={"lng": station.lng, "lat": station.lat}
+                ))
+        return StationCoordinatesBatchResponse(results=results)
+
     except FileNotFoundError:
         raise HTTPException(
             status_code=500,
@@ -47,4 +84,4 @@ async def get_coordinates_by_stationid(
         raise HTTPException(
             status_code=500,
             detail=f"エラーが発生しました: {str(e)}"
-        )
\ No newline at end of file
+        )
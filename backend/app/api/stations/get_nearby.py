@@ -1,16 +1,15 @@
 from fastapi import APIRouter, Query
-from typing import List, Dict
-from ...utils.xyz_utils import lon_lat_to_xyz
-from ...exceptions.station import (
-    MLITUnauthorizedError,
-    MLITBadRequestError,
-    MLITNotFoundError,
-    MLITServerError
-)
-import requests
+from typing import List, Dict, Optional, Sequence, Tuple
+import numpy as np
+from ...utils.xyz_utils import tiles_covering_circle, tile_area_km2
+from ...exceptions.station import MLITBadRequestError, NearbySearchTooLargeError
+from ...models.station import NearbyStationsBatchRequest
+import asyncio
 import os
 from dotenv import load_dotenv
-from ...utils.point_to_point_distance import calculate_distance
+from ...utils.mlit_api import mlit_api_client
+from ...utils.point_to_point_distance import calculate_distances
+from ...utils.station_repository import get_station_repository
 import logging
 
 # 環境変数の読み込み
@@ -34,8 +33,21 @@ def setup_logger():
 logger = setup_logger()
 
 # 定数
-MLIT_API_BASE_URL = "https://www.reinfolib.mlit.go.jp/ex-api/external"
-MLIT_API_KEY = os.getenv('MLIT_API_KEY')  # 環境変数からAPIキーを取得
+# 周辺駅検索のデータソース（local: 常駐空間インデックス / mlit: 国土数値情報API）
+NEARBY_STATION_SOURCE = os.getenv('NEARBY_STATION_SOURCE', 'local')
+
+# XKT015（駅別乗降客数）APIが対応するズームレベル
+STATION_TILE_MIN_ZOOM = 11
+STATION_TILE_MAX_ZOOM = 15
+# 1回の検索で同時に取得するタイル数の上限
+MAX_STATION_TILES = 16
+# タイル取得バイト数の見積もり用の係数（1リクエストあたりの固定分と、面積あたりの駅データ量）
+TILE_OVERHEAD_BYTES = 1024
+STATION_BYTES_PER_KM2 = 300
+# 一括検索で同時に取得するタイル数の上限
+MAX_CONCURRENT_STATION_TILE_FETCHES = 8
+# 国土数値情報APIを使う一括検索で、1リクエストあたりに取得するタイル数（重複なし）の上限
+MAX_NEARBY_MLIT_BATCH_TILES = int(os.getenv('MAX_NEARBY_MLIT_BATCH_TILES', '128'))
 
 def calculate_center_coordinates(coordinates):
     """
@@ -59,111 +71,250 @@ def calculate_center_coordinates(coordinates):
     longitudes, latitudes = zip(*coordinates)
     return sum(longitudes) / len(longitudes), sum(latitudes) / len(latitudes)
 
-def handle_mlit_response(response):
+def station_feature_center(feature):
     """
-    国土数値情報APIのレスポンスを処理する関数
+    駅データのfeatureから駅の中心座標を取得する関数
 
     Args:
-        response (requests.Response): APIからのレスポンスオブジェクト
+        feature (dict): 駅データのGeoJSON feature
 
     Returns:
-        dict: JSON形式のレスポンスデータ
+        tuple or None: (中心の経度, 中心の緯度)、座標が不正な場合はNone
+    """
+    try:
+        station_coords = feature['geometry']['coordinates']
+        return calculate_center_coordinates([station_coords])
+    except (TypeError, ValueError, KeyError) as e:
+        logger.error(f"Error processing feature: {e}")
+        return None
 
-    Raises:
-        MLITUnauthorizedError: 認証エラーの場合
-        MLITBadRequestError: リクエストが不正な場合
-        MLITNotFoundError: データが見つからない場合
-        MLITServerError: サーバーエラーの場合
-    """
-    # ステータスコードに応じて適切なエラーをスロー
-    error_map = {
-        401: MLITUnauthorizedError,
-        400: lambda: MLITBadRequestError(f"リクエストパラメータが不正です: {response.text}"),
-        404: MLITNotFoundError,
+def build_station_info(feature, station_lon, station_lat, distance):
+    """
+    駅データのfeatureからレスポンス用の駅情報を抽出する関数
+
+    Args:
+        feature (dict): 駅データのGeoJSON feature
+        station_lon (float): 駅の経度
+        station_lat (float): 駅の緯度
+        distance (float): 検索中心からの距離（キロメートル）
+
+    Returns:
+        dict: 駅情報の辞書
+    """
+    properties = feature['properties']
+    return {
+        'name': properties.get('S12_001_ja', '不明'),
+        'line_name': properties.get('S12_003_ja', '不明'),
+        'company': properties.get('S12_002_ja', '不明'),
+        'station_code': properties.get('S12_001c', '不明'),
+        'coordinates': {'lon': station_lon, 'lat': station_lat},
+        'distance_km': round(float(distance), 2)
+    }
+
+def build_station_info_from_record(station, distance: float) -> Dict:
+    """
+    常駐している駅データのレコードからレスポンス用の駅情報を作成する関数
+    """
+    return {
+        'name': station.name,
+        'line_name': station.line_name,
+        'company': station.company,
+        'station_code': station.station_code,
+        'coordinates': {'lon': station.lng, 'lat': station.lat},
+        'distance_km': round(distance, 2)
     }
 
-    if response.status_code in error_map:
-        raise error_map[response.status_code]()
-    elif response.status_code >= 500:
-        raise MLITServerError()
+def find_nearby_stations_local(lon: float, lat: float, radius: float) -> List[Dict]:
+    """
+    常駐している駅データの空間インデックスから周辺駅を検索する関数
+
+    Args:
+        lon (float): 検索中心の経度
+        lat (float): 検索中心の緯度
+        radius (float): 検索半径（キロメートル）
+
+    Returns:
+        list: 駅情報のリスト（距離順にソート済み）
 
-    # ステータスコードが問題ない場合はJSONレスポンスを返す
-    response.raise_for_status()
-    return response.json()
+    Raises:
+        FileNotFoundError: 駅データファイルが存在しない場合
+    """
+    return [
+        build_station_info_from_record(station, distance)
+        for station, distance in get_station_repository().find_nearby(lon, lat, radius)
+    ]
 
-def fetch_stations(z: int, x: int, y: int):
+def find_nearby_stations_local_many(queries: Sequence[Tuple[float, float, float]]) -> List[List[Dict]]:
     """
-    国土数値情報APIから駅データを取得する関数
+    複数地点の周辺駅を常駐している空間インデックスからまとめて検索する関数
 
     Args:
-        z (int): ズームレベル
-        x (int): タイルのX座標
-        y (int): タイルのY座標
+        queries (list): [(経度, 緯度, 検索半径km), ...]
 
     Returns:
-        dict: 駅データのJSONレスポンス
+        list: クエリと同じ順序で、各地点の駅情報のリスト（距離順にソート済み）
 
     Raises:
-        MLITUnauthorizedError: APIキーが設定されていない場合
-        MLITServerError: サーバーエラーの場合
-    """
-    if not MLIT_API_KEY:
-        raise MLITUnauthorizedError()
-
-    url = f"{MLIT_API_BASE_URL}/XKT015"
-    params = {
-        "response_format": "geojson",
-        "z": z,
-        "x": x,
-        "y": y
-    }
-    headers = {"Ocp-Apim-Subscription-Key": MLIT_API_KEY}
+        FileNotFoundError: 駅データファイルが存在しない場合
+    """
+    return [
+        [build_station_info_from_record(station, distance) for station, distance in matches]
+        for matches in get_station_repository().find_nearby_many(queries)
+    ]
 
-    try:
-        # APIリクエストを送信
-        response = requests.get(url, params=params, headers=headers)
-        return handle_mlit_response(response)
-    except requests.RequestException:
-        raise MLITServerError()
+def choose_station_zoom(lon: float, lat: float, radius: float) -> int:
+    """
+    検索円を覆うタイル集合の取得バイト数の見積もりが最小となるズームレベルを返す関数
+
+    Args:
+        lon (float): 検索中心の経度
+        lat (float): 検索中心の緯度
+        radius (float): 検索半径（キロメートル）
 
-def process_station_feature(feature, lon, lat, radius):
+    Returns:
+        int: ズームレベル
+    """
+    best_zoom, best_cost = None, float('inf')
+    for z in range(STATION_TILE_MIN_ZOOM, STATION_TILE_MAX_ZOOM + 1):
+        tiles = tiles_covering_circle(lon, lat, radius, z)
+        if best_zoom is not None and len(tiles) > MAX_STATION_TILES:
+            break
+        cost = len(tiles) * (TILE_OVERHEAD_BYTES + tile_area_km2(z, lat) * STATION_BYTES_PER_KM2)
+        if cost < best_cost:
+            best_zoom, best_cost = z, cost
+    return best_zoom
+
+def choose_station_tiles(lon: float, lat: float, radius: float) -> List[Dict[str, int]]:
     """
-    駅データの各featureを処理し、必要な情報を抽出する関数
+    検索円を覆うタイル集合のうち、取得バイト数の見積もりが最小となるズームレベルのものを返す関数
 
     Args:
-        feature (dict): 駅データのGeoJSON feature
         lon (float): 検索中心の経度
         lat (float): 検索中心の緯度
         radius (float): 検索半径（キロメートル）
 
     Returns:
-        dict or None: 駅情報の辞書、または半径外の場合はNone
+        list: XYZタイル座標のリスト
     """
-    try:
-        # 駅の座標を取得
-        station_coords = feature['geometry']['coordinates']
-        station_lon, station_lat = calculate_center_coordinates([station_coords])
-    except (TypeError, ValueError, KeyError) as e:
-        logger.error(f"Error processing feature: {e}")
-        return None
+    return tiles_covering_circle(lon, lat, radius, choose_station_zoom(lon, lat, radius))
 
-    # 指定された座標との距離を計算
-    distance = calculate_distance(lon, lat, station_lon, station_lat)
+def station_feature_key(feature) -> tuple:
+    """
+    タイル境界で重複する駅featureを判定するためのキーを返す関数
+    """
+    properties = feature.get('properties') or {}
+    if properties.get('S12_001c'):
+        return (properties['S12_001c'], properties.get('S12_002_ja'), properties.get('S12_003_ja'))
+    return (repr(feature.get('geometry')),)
 
-    # 距離が半径内でない場合はNoneを返す
-    if distance > radius:
-        return None
+async def find_nearby_stations_mlit(lon: float, lat: float, radius: float) -> List[Dict]:
+    """
+    国土数値情報APIから取得した駅データで周辺駅を検索する関数
+    検索円を覆う全タイルを並行して取得し、タイル境界の重複を除外する
 
-    # 駅情報を抽出
-    properties = feature['properties']
-    return {
-        'name': properties.get('S12_001_ja', '不明'),
-        'line_name': properties.get('S12_003_ja', '不明'),
-        'company': properties.get('S12_002_ja', '不明'),
-        'station_code': properties.get('S12_001c', '不明'),
-        'coordinates': {'lon': station_lon, 'lat': station_lat},
-        'distance_km': round(distance, 2)
-    }
+    Args:
+        lon (float): 検索中心の経度
+        lat (float): 検索中心の緯度
+        radius (float): 検索半径（キロメートル）
+
+    Returns:
+        list: 駅情報のリスト（距離順にソート済み）
+    """
+    return (await find_nearby_stations_mlit_many([(lon, lat, radius)]))[0]
+
+async def find_nearby_stations_mlit_many(queries: Sequence[Tuple[float, float, float]]) -> List[List[Dict]]:
+    """
+    複数地点の周辺駅を国土数値情報APIの駅データでまとめて検索する関数
+    各地点の検索円を覆うタイルを集約し、複数の地点で共有されるタイルは1回だけ取得する
+    地点間でタイルを共有できるよう、ズームレベルは検索半径が最大の地点に合わせて全地点で揃える
+
+    Args:
+        queries (list): [(経度, 緯度, 検索半径km), ...]
+
+    Returns:
+        list: クエリと同じ順序で、各地点の駅情報のリスト（距離順にソート済み）
+
+    Raises:
+        NearbySearchTooLargeError: 取得するタイル数がMAX_NEARBY_MLIT_BATCH_TILESを超える場合
+    """
+    if not queries:
+        return []
+
+    z = choose_station_zoom(*max(queries, key=lambda query: query[2]))
+    query_tiles = [
+        [(xyz["z"], xyz["x"], xyz["y"]) for xyz in tiles_covering_circle(lon, lat, radius, z)]
+        for lon, lat, radius in queries
+    ]
+    unique_tiles = list(dict.fromkeys(tile for tiles in query_tiles for tile in tiles))
+    if len(unique_tiles) > MAX_NEARBY_MLIT_BATCH_TILES:
+        raise NearbySearchTooLargeError(
+            f"検索範囲が広すぎます（タイル数 {len(unique_tiles)} 件、上限 {MAX_NEARBY_MLIT_BATCH_TILES} 件）。"
+            "地点数または検索半径を減らしてください。"
+        )
+
+    # 駅データを並行して取得（同時リクエスト数は上限まで）
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_STATION_TILE_FETCHES)
+
+    async def fetch(tile):
+        async with semaphore:
+            return await mlit_api_client.fetch_stations(*tile)
+
+    tile_results = await asyncio.gather(*(fetch(tile) for tile in unique_tiles))
+
+    # タイル境界で重複するfeatureを除外し、駅の中心座標を1回だけ計算
+    feature_indices: Dict[tuple, Optional[int]] = {}
+    features, station_lons, station_lats = [], [], []
+    tile_features: Dict[tuple, List[int]] = {}
+    for tile, station_data in zip(unique_tiles, tile_results):
+        indices = []
+        for feature in station_data.get("features", []):
+            key = station_feature_key(feature)
+            if key not in feature_indices:
+                center = station_feature_center(feature)
+                if center is None:
+                    feature_indices[key] = None
+                else:
+                    feature_indices[key] = len(features)
+                    features.append(feature)
+                    station_lons.append(center[0])
+                    station_lats.append(center[1])
+            if feature_indices[key] is not None:
+                indices.append(feature_indices[key])
+        tile_features[tile] = indices
+
+    # featuresが存在しない場合は空リストを返す
+    if not features:
+        logger.warning("No features found in station data.")
+        return [[] for _ in queries]
+
+    # 各地点の候補featureを集め、検索中心からの距離を1回でまとめて計算
+    owners, candidates = [], []
+    for query_index, tiles in enumerate(query_tiles):
+        indices = np.unique(np.fromiter(
+            (index for tile in tiles for index in tile_features[tile]), dtype=np.int64
+        ))
+        candidates.append(indices)
+        owners.append(np.full(len(indices), query_index, dtype=np.int64))
+    owners = np.concatenate(owners)
+    candidates = np.concatenate(candidates)
+
+    query_array = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+    station_lons = np.asarray(station_lons)
+    station_lats = np.asarray(station_lats)
+    distances = calculate_distances(
+        query_array[owners, 0], query_array[owners, 1], station_lons[candidates], station_lats[candidates]
+    )
+
+    # 周辺駅をフィルタリングし、地点ごとに距離順で振り分ける
+    within = distances <= query_array[owners, 2]
+    owners, candidates, distances = owners[within], candidates[within], distances[within]
+    results: List[List[Dict]] = [[] for _ in queries]
+    for i in np.lexsort((distances, owners)):
+        index = candidates[i]
+        results[owners[i]].append(
+            build_station_info(features[index], station_lons[index], station_lats[index], distances[i])
+        )
+    return results
 
 router = APIRouter(
     prefix="/api/stations",
@@ -174,7 +325,8 @@ router = APIRouter(
 async def get_near_by_coordinates(
     lon: float = Query(..., description="経度", ge=-180, le=180),
     lat: float = Query(..., description="緯度", ge=-90, le=90),
-    radius: float = Query(2.0, description="検索半径（キロメートル）", ge=0.1, le=10.0)
+    radius: float = Query(2.0, description="検索半径（キロメートル）", ge=0.1, le=10.0),
+    source: Optional[str] = Query(None, description="データソース（local / mlit）。未指定時は環境変数の設定に従う", pattern="^(local|mlit)$")
 ) -> List[Dict]:
     """
     指定された座標の周辺駅を取得
@@ -183,33 +335,47 @@ async def get_near_by_coordinates(
     - lon: 経度 (-180 to 180)
     - lat: 緯度 (-90 to 90)
     - radius: 検索半径（キロメートル）、デフォルト2km、最小0.1km、最大10km
+    - source: データソース。local は常駐空間インデックス、mlit は国土数値情報API。
+      local の駅データが読み込めない場合は mlit にフォールバックする
 
     Returns:
     - 駅情報のリスト（距離順にソート済み）
     """
     try:
-        # 座標をズームレベル11でXYZタイルに変換
-        xyz = lon_lat_to_xyz(lon, lat, 11)
+        if (source or NEARBY_STATION_SOURCE) == "local":
+            try:
+                return find_nearby_stations_local(lon, lat, radius)
+            except FileNotFoundError as e:
+                logger.warning(f"Local station index unavailable, falling back to MLIT API: {e}")
+
+        return await find_nearby_stations_mlit(lon, lat, radius)
+
+    except (TypeError, ValueError) as e:
+        logger.error(f"Error during processing: {str(e)}")
+        raise MLITBadRequestError(f"座標変換エラー: {str(e)}")
 
-        # 駅データを取得
-        station_data = fetch_stations(xyz["z"], xyz["x"], xyz["y"])
+@router.post("/get_near_by_coordinates/batch")
+async def get_near_by_coordinates_batch(request: NearbyStationsBatchRequest) -> Dict[str, List[List[Dict]]]:
+    """
+    複数地点の周辺駅をまとめて取得
 
-        # featuresが存在しない場合は空リストを返す
-        if "features" not in station_data:
-            logger.warning("No features found in station data.")
-            return []
+    Parameters:
+    - queries: [{lon, lat, radius}, ...]（最大件数はMAX_NEARBY_BATCH_SIZE、radiusの既定値は2km）
+    - source: データソース。get_near_by_coordinates と同じ
 
-        # 周辺駅をフィルタリング
-        nearby_stations = [
-            station_info
-            for feature in station_data['features']
-            if (station_info := process_station_feature(feature, lon, lat, radius))
-        ]
+    Returns:
+    - results: クエリと同じ順序で、各地点の駅情報のリスト（距離順にソート済み）
+    """
+    queries = [(query.lon, query.lat, query.radius) for query in request.queries]
+    try:
+        if (request.source or NEARBY_STATION_SOURCE) == "local":
+            try:
+                return {"results": find_nearby_stations_local_many(queries)}
+            except FileNotFoundError as e:
+                logger.warning(f"Local station index unavailable, falling back to MLIT API: {e}")
 
-        # 距離順にソートして返す
-        return sorted(nearby_stations, key=lambda x: x['distance_km'])
+        return {"results": await find_nearby_stations_mlit_many(queries)}
 
     except (TypeError, ValueError) as e:
         logger.error(f"Error during processing: {str(e)}")
         raise MLITBadRequestError(f"座標変換エラー: {str(e)}")
-
@@ -1,10 +1,28 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
+import numpy as np
 from fastapi import APIRouter, Query
+from ..models.xyz import (
+    LonLatBatchItem,
+    LonLatBatchResponse,
+    LonLatToXYZBatchRequest,
+    TileCenterBatchRequest,
+    XYZBatchItem,
+    XYZBatchResponse,
+)
 from ..utils.xyz_utils import (
     lon_lat_to_xyz,
+    lon_lat_to_xyz_array,
+    xyz_array_to_tile_center_lon_lat,
     xyz_to_tile_center_lon_lat,
 )
 
+# バッチ変換で受け付けるズームレベルの範囲
+MIN_ZOOM = 0
+MAX_ZOOM = 24
+
+# Webメルカトルで表現できる緯度の上限
+MAX_MERCATOR_LAT = 85.05112878
+
 router = APIRouter(
     prefix="/api/xyz",
     tags=["xyz"]
@@ -27,3 +45,65 @@ async def get_tile_center_lon_lat(
 ) -> Dict[str, float]:
     """タイル中心の経度緯度を返す"""
     return xyz_to_tile_center_lon_lat({"x": x, "y": y, "z": z})
+
+@router.post("/lon-lat-to-xyz/batch", response_model=XYZBatchResponse, response_model_exclude_none=True)
+async def convert_lon_lat_to_xyz_batch(request: LonLatToXYZBatchRequest) -> XYZBatchResponse:
+    """
+    複数の経度緯度をまとめてXYZタイル座標に変換
+    結果はリクエストと同じ順序で返し、変換できない点はerrorを返す
+    """
+    lons = np.array([point.lon for point in request.points], dtype=np.float64)
+    lats = np.array([point.lat for point in request.points], dtype=np.float64)
+    zooms = np.array([point.z for point in request.points], dtype=np.int64)
+
+    errors: List[Optional[str]] = [None] * len(request.points)
+    for index, point in enumerate(request.points):
+        if not MIN_ZOOM <= point.z <= MAX_ZOOM:
+            errors[index] = f"ズームレベルは{MIN_ZOOM}〜{MAX_ZOOM}で指定してください"
+        elif not -180 <= point.lon <= 180:
+            errors[index] = "経度は-180〜180で指定してください"
+        elif not -MAX_MERCATOR_LAT <= point.lat <= MAX_MERCATOR_LAT:
+            errors[index] = f"緯度は-{MAX_MERCATOR_LAT}〜{MAX_MERCATOR_LAT}で指定してください"
+    valid = np.array([error is None for error in errors])
+
+    # ズームレベルごとにまとめて変換
+    xs = np.zeros(len(request.points), dtype=np.int64)
+    ys = np.zeros(len(request.points), dtype=np.int64)
+    for z in np.unique(zooms[valid]):
+        mask = valid & (zooms == z)
+        xs[mask], ys[mask] = lon_lat_to_xyz_array(lons[mask], lats[mask], int(z))
+
+    return XYZBatchResponse(results=[
+        XYZBatchItem(error=errors[i]) if errors[i] else XYZBatchItem(z=int(zooms[i]), x=int(xs[i]), y=int(ys[i]))
+        for i in range(len(request.points))
+    ])
+
+@router.post("/tile-center/batch", response_model=LonLatBatchResponse, response_model_exclude_none=True)
+async def get_tile_center_lon_lat_batch(request: TileCenterBatchRequest) -> LonLatBatchResponse:
+    """
+    複数のタイルの中心の経度緯度をまとめて返す
+    結果はリクエストと同じ順序で返し、範囲外のタイルはerrorを返す
+    """
+    xs = np.array([tile.x for tile in request.tiles], dtype=np.int64)
+    ys = np.array([tile.y for tile in request.tiles], dtype=np.int64)
+    zooms = np.array([tile.z for tile in request.tiles], dtype=np.int64)
+
+    errors: List[Optional[str]] = [None] * len(request.tiles)
+    for index, tile in enumerate(request.tiles):
+        if not MIN_ZOOM <= tile.z <= MAX_ZOOM:
+            errors[index] = f"ズームレベルは{MIN_ZOOM}〜{MAX_ZOOM}で指定してください"
+        elif not (0 <= tile.x < 2 ** tile.z and 0 <= tile.y < 2 ** tile.z):
+            errors[index] = f"ズームレベル{tile.z}のタイル座標は0〜{2 ** tile.z - 1}で指定してください"
+    valid = np.array([error is None for error in errors])
+
+    # ズームレベルごとにまとめて変換
+    lons = np.zeros(len(request.tiles), dtype=np.float64)
+    lats = np.zeros(len(request.tiles), dtype=np.float64)
+    for z in np.unique(zooms[valid]):
+        mask = valid & (zooms == z)
+        lons[mask], lats[mask] = xyz_array_to_tile_center_lon_lat(xs[mask], ys[mask], int(z))
+
+    return LonLatBatchResponse(results=[
+        LonLatBatchItem(error=errors[i]) if errors[i] else LonLatBatchItem(lon=float(lons[i]), lat=float(lats[i]))
+        for i in range(len(request.tiles))
+    ])
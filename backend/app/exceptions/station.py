@@ -39,3 +39,19 @@ class MLITServerError(MLITAPIError):
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="国土数値情報APIでエラーが発生しました。"
         )
+
+class MLITGatewayTimeoutError(MLITAPIError):
+    """タイムアウトエラー"""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="国土数値情報APIへのリクエストがタイムアウトしました。"
+        )
+
+class NearbySearchTooLargeError(HTTPException):
+    """周辺駅の一括検索で取得するタイル数が上限を超えるエラー"""
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=detail
+        )
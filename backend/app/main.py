@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import os
 
 # プロジェクトのルートディレクトリを絶対パスで取得
@@ -8,6 +9,7 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..
 # インポートパスをプロジェクトルートからの絶対パスに変更
 from .utils.data_trimmer import main as run_data_trimming
 from .utils.rent_scraper import main as run_rent_scraping
+from .utils.scrape_metrics import scrape_metrics
 from .utils.normalization_helper import (
     generate_all_comparison_files,
     generate_company_comparison_files,
@@ -20,10 +22,28 @@ from .api.stations.get_nearby import router as stations_router
 from .api.stations.get_stations_by_line_and_company import router as lines_router
 from .api.stations.get_coordinates_by_stationid import router as get_coordinates_by_stationid_router
 from .api.mlit.get_did import router as mlit_router
+from .utils.station_repository import warm_up_station_repository
+from .utils.mlit_api import mlit_api_client
+from .utils.tile_cache import get_tile_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 駅データはリクエストごとではなく起動時に一度だけ読み込む
+    warm_up_station_repository()
+    # MLIT APIへのリクエストは全てアプリケーション共有のコネクションプールを使う
+    await mlit_api_client.start()
+    yield
+    await mlit_api_client.close()
+    # 未反映のタイルキャッシュの最終アクセス時刻を書き込む（キャッシュを使った場合のみ）
+    if get_tile_cache.cache_info().currsize:
+        get_tile_cache().flush()
+
 
 app = FastAPI(
     title="Hikkoshilens API",
-    description="Hikkoshilens Backend API"
+    description="Hikkoshilens Backend API",
+    lifespan=lifespan
 )
 
 # CORSミドルウェアの設定
@@ -47,9 +67,17 @@ app.include_router(mlit_router)
 
 @app.post("/run-scraping", tags=["Data Preparation"])
 async def run_scraping_endpoint(background_tasks: BackgroundTasks):
+    # タスクの開始を待たずにここで実行中にし、同時に呼ばれても2つ目以降は409にする
+    if not scrape_metrics.try_start():
+        raise HTTPException(status_code=409, detail="Rent scraping is already running.")
     background_tasks.add_task(run_rent_scraping)
     return {"message": "Rent scraping task has been started."}
 
+@app.get("/run-scraping/status", tags=["Data Preparation"])
+async def run_scraping_status_endpoint():
+    """実行中（または直前）のスクレイピングの進捗・残り時間の見積もり・ステージごとの計測値を返します。"""
+    return scrape_metrics.snapshot()
+
 @app.post("/run-data-trimming/{data_name}", tags=["Data Preparation"])
 async def process_data_endpoint(data_name: str, background_tasks: BackgroundTasks):
     background_tasks.add_task(run_data_trimming, data_name)
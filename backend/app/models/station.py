@@ -1,7 +1,36 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Dict, Literal, Optional, List
+from .xyz import MAX_BATCH_SIZE
+
+# 周辺駅の一括検索で一度に受け付ける最大地点数
+MAX_NEARBY_BATCH_SIZE = 5000
 
 class MLITStationResponse(BaseModel):
     """国土数値情報APIのレスポンス型"""
     type: str
     features: List[dict]
+
+class StationCoordinatesBatchRequest(BaseModel):
+    """駅IDによる座標取得のバッチリクエスト"""
+    station_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class StationCoordinatesBatchItem(BaseModel):
+    """駅の座標（見つからなかった場合はerrorのみ）"""
+    station_id: str
+    coordinates: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
+
+class StationCoordinatesBatchResponse(BaseModel):
+    """リクエストと同じ順序の駅座標"""
+    results: List[StationCoordinatesBatchItem]
+
+class NearbyStationsQuery(BaseModel):
+    """周辺駅検索の1地点分の条件"""
+    lon: float = Field(..., ge=-180, le=180, description="経度")
+    lat: float = Field(..., ge=-90, le=90, description="緯度")
+    radius: float = Field(2.0, ge=0.1, le=10.0, description="検索半径（キロメートル）")
+
+class NearbyStationsBatchRequest(BaseModel):
+    """周辺駅の一括検索リクエスト"""
+    queries: List[NearbyStationsQuery] = Field(..., min_length=1, max_length=MAX_NEARBY_BATCH_SIZE)
+    source: Optional[Literal["local", "mlit"]] = Field(None, description="データソース（local / mlit）。未指定時は環境変数の設定に従う")
@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+# バッチAPIで一度に受け付ける最大件数
+MAX_BATCH_SIZE = 1000
+
+class LonLatZoom(BaseModel):
+    """経度緯度とズームレベル"""
+    lon: float
+    lat: float
+    z: int
+
+class TileXYZ(BaseModel):
+    """XYZタイル座標"""
+    x: int
+    y: int
+    z: int
+
+class LonLatToXYZBatchRequest(BaseModel):
+    """経度緯度→XYZ変換のバッチリクエスト"""
+    points: List[LonLatZoom] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TileCenterBatchRequest(BaseModel):
+    """タイル中心座標取得のバッチリクエスト"""
+    tiles: List[TileXYZ] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class XYZBatchItem(BaseModel):
+    """XYZ変換結果（変換できなかった場合はerrorのみ）"""
+    z: Optional[int] = None
+    x: Optional[int] = None
+    y: Optional[int] = None
+    error: Optional[str] = None
+
+class LonLatBatchItem(BaseModel):
+    """タイル中心座標（取得できなかった場合はerrorのみ）"""
+    lon: Optional[float] = None
+    lat: Optional[float] = None
+    error: Optional[str] = None
+
+class XYZBatchResponse(BaseModel):
+    """リクエストと同じ順序の変換結果"""
+    results: List[XYZBatchItem]
+
+class LonLatBatchResponse(BaseModel):
+    """リクエストと同じ順序のタイル中心座標"""
+    results: List[LonLatBatchItem]
@@ -0,0 +1,238 @@
+"""
+処理済みデータの列指向ストア
+- JSONファイル（例: stationcode.json）と同じ場所に、列ごとのNumPy配列を保存したディレクトリ（stationcode.columns）を作る
+- 数値の列は .npy をメモリマップで読み込むため、JSON全体をデコードせずにDataFrameを作れる
+- 文字列は全ての列で共有する文字列テーブル（重複なし）と、各行の番号の配列で保存する
+- 保存する内容は pd.read_json(JSONファイル) の結果そのもの（型の推論結果も含む）で、読み込むと同じDataFrameになる
+- ストアには元のJSONファイルのサイズと更新時刻を記録し、JSONが更新された場合は使わずにJSONを読み込む
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ストアのディレクトリの拡張子（JSONファイルの拡張子を置き換える）
+COLUMNAR_SUFFIX = ".columns"
+COLUMNAR_FORMAT_VERSION = 1
+
+_MANIFEST_FILE = "manifest.json"
+_STRINGS_DATA_FILE = "strings.data.npy"
+_STRINGS_OFFSETS_FILE = "strings.offsets.npy"
+
+
+def columnar_path(json_path: str) -> str:
+    """JSONファイルに対応するストアのディレクトリのパスを返す"""
+    base, _ = os.path.splitext(json_path)
+    return base + COLUMNAR_SUFFIX
+
+
+def file_fingerprint(json_path: str) -> dict:
+    """ファイルのサイズと更新時刻を返す（ファイルが更新されたかの判定に使う）"""
+    stat = os.stat(json_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class _StringTable:
+    """文字列を重複なく番号に変換する"""
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def encode(self, values) -> np.ndarray:
+        """文字列（欠損値は-1）の番号の配列を返す"""
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.strings)
+                self.strings.append(value)
+            codes[i] = code
+        return codes
+
+    def save(self, directory: str):
+        # 文字単位の位置を保存し、読み込み時は全体を1回でデコードしてから切り出す
+        offsets = np.zeros(len(self.strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in self.strings], out=offsets[1:])
+        data = np.frombuffer("".join(self.strings).encode("utf-8"), dtype=np.uint8)
+        np.save(os.path.join(directory, _STRINGS_DATA_FILE), data)
+        np.save(os.path.join(directory, _STRINGS_OFFSETS_FILE), offsets)
+
+
+def _load_strings(directory: str) -> np.ndarray:
+    """文字列テーブルを読み込み、番号で参照できるobjectの配列として返す"""
+    data = np.load(os.path.join(directory, _STRINGS_DATA_FILE), mmap_mode="r")
+    offsets = np.load(os.path.join(directory, _STRINGS_OFFSETS_FILE)).tolist()
+    text = data.tobytes().decode("utf-8")
+    strings = np.empty(len(offsets) - 1, dtype=object)
+    strings[:] = [text[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+    return strings
+
+
+def _is_float_pair_column(values: list) -> bool:
+    """全ての値が同じ長さのfloatのリスト（座標など）かを返す"""
+    if not values or not all(type(value) is list for value in values):
+        return False
+    width = len(values[0])
+    return width > 0 and all(
+        len(value) == width and all(type(v) is float for v in value) for value in values
+    )
+
+
+def _encode_column(series: pd.Series, directory: str, file_prefix: str, strings: _StringTable) -> dict:
+    """列を保存し、マニフェストに記録する列の情報を返す"""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind != "O":
+        # 数値・真偽値・日時はそのまま保存する
+        np.save(os.path.join(directory, f"{file_prefix}.npy"), series.to_numpy())
+        return {"kind": "array"}
+
+    values = series.to_numpy(dtype=object, na_value=None).tolist()
+    non_null = [value for value in values if value is not None]
+    if all(type(value) is str for value in non_null):
+        np.save(os.path.join(directory, f"{file_prefix}.npy"), strings.encode(values))
+        return {"kind": "string"}
+    if len(non_null) == len(values) and _is_float_pair_column(values):
+        np.save(os.path.join(directory, f"{file_prefix}.npy"), np.array(values, dtype=np.float64))
+        return {"kind": "float_list"}
+    # その他（ネストした値、型の混在など）は値ごとにJSON文字列にして保存する
+    encoded = [None if value is None else json.dumps(value, ensure_ascii=False) for value in values]
+    np.save(os.path.join(directory, f"{file_prefix}.npy"), strings.encode(encoded))
+    return {"kind": "json"}
+
+
+def _decode_column(info: dict, directory: str, file_prefix: str, strings: Optional[np.ndarray]):
+    """保存した列を読み込む（数値の列はメモリマップした配列を返す）"""
+    path = os.path.join(directory, f"{file_prefix}.npy")
+    kind = info["kind"]
+    if kind == "array":
+        # 書き込み時コピーでマップする（DataFrameを変更してもファイルは変わらない）
+        # np.memmapのサブクラスのままだとDataFrameの列の型が変わるため、同じバッファを参照するndarrayにする
+        return np.load(path, mmap_mode="c").view(np.ndarray)
+
+    if kind == "float_list":
+        return pd.Series(np.load(path).tolist(), dtype=object)
+
+    codes = np.load(path, mmap_mode="r")
+    values = np.empty(len(codes), dtype=object)
+    present = codes >= 0
+    values[present] = strings[codes[present]]
+    if kind == "json":
+        values[present] = [json.loads(value) for value in values[present]]
+    return pd.Series(values, dtype=info["dtype"])
+
+
+def write_frame(df: pd.DataFrame, directory: str, source: Optional[dict] = None):
+    """
+    DataFrameを列ごとに保存する（既存のストアは完成後に置き換える）
+
+    Args:
+        df: 保存するDataFrame（インデックスは0から始まる連番であること）
+        directory: ストアのディレクトリ
+        source: 元のJSONファイルのサイズと更新時刻（鮮度の確認に使う）
+    """
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        raise ValueError("Only DataFrames with a default RangeIndex can be stored.")
+
+    parent = os.path.dirname(directory) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.", dir=parent)
+    try:
+        strings = _StringTable()
+        columns = []
+        for position, name in enumerate(df.columns):
+            info = _encode_column(df[name], tmp_dir, f"col-{position:04d}", strings)
+            columns.append({"name": name, "dtype": str(df[name].dtype), **info})
+        strings.save(tmp_dir)
+        manifest = {
+            "version": COLUMNAR_FORMAT_VERSION,
+            "row_count": len(df),
+            "source": source,
+            "columns": columns,
+        }
+        with open(os.path.join(tmp_dir, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        os.chmod(tmp_dir, 0o755)
+
+        # ディレクトリは上書きできないため、古いストアを退避してから置き換える
+        old_dir = None
+        if os.path.exists(directory):
+            old_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.old.", dir=parent)
+            os.replace(directory, os.path.join(old_dir, "store"))
+        os.replace(tmp_dir, directory)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def read_frame(directory: str) -> pd.DataFrame:
+    """write_frameで保存したDataFrameを読み込む"""
+    with open(os.path.join(directory, _MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar format version: {manifest.get('version')}")
+
+    columns = manifest["columns"]
+    strings = None
+    if any(info["kind"] in ("string", "json") for info in columns):
+        strings = _load_strings(directory)
+    data = {
+        info["name"]: _decode_column(info, directory, f"col-{position:04d}", strings)
+        for position, info in enumerate(columns)
+    }
+    # 数値の列はメモリマップした配列をそのまま使う
+    return pd.DataFrame(data, index=pd.RangeIndex(manifest["row_count"]), copy=False)
+
+
+def write_columnar_companion(json_path: str) -> Optional[str]:
+    """
+    JSONファイル（レコードの配列）を読み込み、同じ内容のストアを作成する
+    データを作成した各処理（トリミング・スクレイピング・結合）がJSONを保存した直後に呼び出す
+    失敗してもJSONはそのまま使えるため、例外は送出せずにログに記録する
+
+    Returns:
+        str | None: 作成したストアのディレクトリ（失敗した場合はNone）
+    """
+    directory = columnar_path(json_path)
+    try:
+        source = file_fingerprint(json_path)
+        write_frame(pd.read_json(json_path), directory, source=source)
+        return directory
+    except Exception as e:
+        logger.warning(f"Failed to write columnar store for {json_path}: {e}")
+        return None
+
+
+def _is_fresh(directory: str, json_path: str) -> bool:
+    """ストアが現在のJSONファイルから作成されたものかを返す"""
+    try:
+        with open(os.path.join(directory, _MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest.get("source") == file_fingerprint(json_path)
+    except (OSError, ValueError):
+        return False
+
+
+def read_records(json_path: str) -> pd.DataFrame:
+    """
+    レコードの配列のJSONファイルをDataFrameとして読み込む
+    最新のストアがあればそれを読み込み、なければ pd.read_json で読み込む（結果は同じ）
+    """
+    directory = columnar_path(json_path)
+    if _is_fresh(directory, json_path):
+        try:
+            return read_frame(directory)
+        except Exception as e:
+            logger.warning(f"Failed to read columnar store {directory}, falling back to JSON: {e}")
+    return pd.read_json(json_path)
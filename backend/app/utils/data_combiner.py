@@ -2,13 +2,9 @@ import pandas as pd
 import logging
 import os
 
+from .columnar_store import write_columnar_companion
 # normalization_helperから正規化関連の関数とテーブルをインポート
-from .normalization_helper import (
-    preprocess_data, 
-    apply_normalization_mapping, 
-    COMPANY_MAPPING_TABLE, 
-    LINE_MAPPING_TABLE
-)
+from .normalization_helper import COMMON_KEYS, get_normalization_context
 
 # ロギングの基本設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,22 +20,19 @@ def combine_data_with_normalization(
     """
     logger.info("正規化テーブルを用いたデータ結合を開始します。")
 
-    common_keys = ['company', 'line', 'station']
-
     logger.info("データの読み込みと前処理を開始します...")
-    df_main = preprocess_data(main_data_path, common_keys)
-    df_lookup = preprocess_data(lookup_data_path, common_keys)
+    # 比較ファイルの生成と同じ入力ファイルなら、前処理済みのデータを再利用する
+    context = get_normalization_context(main_data_path, lookup_data_path)
 
-    if df_main.empty or df_lookup.empty:
+    if context.empty:
         logger.error("データの前処理に失敗したため、結合処理を中止します。")
         return
 
     logger.info("正規化マッピングを適用します...")
-    df_main_normalized = apply_normalization_mapping(df_main, COMPANY_MAPPING_TABLE, LINE_MAPPING_TABLE)
-    df_lookup_normalized = apply_normalization_mapping(df_lookup, COMPANY_MAPPING_TABLE, LINE_MAPPING_TABLE)
+    df_main_normalized, df_lookup_normalized = context.normalized(map_lines=True)
 
     logger.info("データの結合処理を開始します...")
-    merge_keys = [f'norm_{key}' for key in common_keys]
+    merge_keys = [f'norm_{key}' for key in COMMON_KEYS]
     
     df_combined = pd.merge(
         df_main_normalized,
@@ -59,6 +52,11 @@ def combine_data_with_normalization(
         logger.info(f"結合済みデータを '{output_path}' に正常に保存しました。")
     except Exception as e:
         logger.error(f"ファイルへの保存中にエラーが発生しました: {e}")
+        return
+
+    columnar_dir = write_columnar_companion(output_path)
+    if columnar_dir:
+        logger.info(f"列指向のストアを '{columnar_dir}' に保存しました。")
 
 if __name__ == '__main__':
     PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
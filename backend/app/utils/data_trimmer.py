@@ -1,6 +1,14 @@
+import contextlib
 import csv
+import io
 import json
 import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from .columnar_store import write_columnar_companion
+from .geojson_stream import iter_geojson_features
+from .geometry_kernel import GeometryDiagnostics, calculate_centroids
+from .station_data_writer import render_json_array_item, write_json_array_atomic, write_rendered_json_array_atomic
 
 # Configuration classes and functions moved from config.py
 class AreaCodeConfig:
@@ -31,8 +39,12 @@ class StationCodeConfig:
         ],
         "geometry_config": {
             "filter_by_type": "LineString",
-            "output_key": "coordinates"
-        }
+            "output_key": "coordinates",
+            # 平均座標をまとめて計算するフィーチャー数
+            "centroid_batch_size": 5000
+        },
+        # Trueの場合はGeoJSONを1フィーチャーずつ読み込み、結果も逐次書き出す（メモリ使用量が入力サイズによらない）
+        "streaming": True
     }
 
 ALL_CONFIGS = [AreaCodeConfig, StationCodeConfig]
@@ -80,76 +92,38 @@ def process_areacode_data(config) -> list:
                 data.append(extracted_row)
     return data
 
-def _calculate_average_coordinates(coordinates: list, feature_id_val: str, geometry_type: str) -> list | None:
+def _iter_geojson_features(input_file_path: str, streaming: bool):
     """
-    GeoJSONの座標リストから平均座標（中心点）を計算します。
-    MultiLineStringやPolygonのようなネストされた座標構造にも対応します。
+    GeoJSONファイルのフィーチャーを順に返します。
+    streamingがTrueの場合はファイル全体を読み込まず、1フィーチャーずつデコードします。
     """
-    if not coordinates or not isinstance(coordinates, list):
-        print(f"Warning: Invalid or empty coordinates for {geometry_type} feature '{feature_id_val}'. Skipping.")
-        return None
-
-    flat_points = []
-    # 再帰関数でネストされた座標リストをフラットな[経度, 緯度]のリストに変換
-    def flatten(coords):
-        # 最初の要素が数値であれば、それは[経度, 緯度]のペアと判断
-        if isinstance(coords, list) and len(coords) > 0 and isinstance(coords[0], (int, float)):
-            flat_points.append(coords)
-        # そうでなければ、リストの各要素に対して再帰的にflattenを呼び出す
-        elif isinstance(coords, list):
-            for item in coords:
-                flatten(item)
-    
-    flatten(coordinates)
-
-    if not flat_points:
-        print(f"Warning: No valid points found in coordinates for feature '{feature_id_val}'.")
-        return None
+    with open(input_file_path, 'r', encoding='utf-8') as f:
+        if streaming:
+            yield from iter_geojson_features(f)
+            return
+        geojson_data = json.load(f)
 
-    sum_lon, sum_lat = 0.0, 0.0
-    num_points = 0
-    
-    # 全ての座標点の合計を計算
-    for point_pair in flat_points:
-        try:
-            if isinstance(point_pair, list) and len(point_pair) >= 2:
-                lon = float(point_pair[0])
-                lat = float(point_pair[1])
-                sum_lon += lon
-                sum_lat += lat
-                num_points += 1
-            else:
-                raise TypeError("Point is not a list of two numbers")
-        except (ValueError, TypeError, IndexError) as e:
-            # 不正な形式の座標はスキップ
-            print(f"Warning: Skipping invalid coordinate point {point_pair} for feature '{str(feature_id_val)}' due to {e}")
-    
-    # 有効な座標点が一つでもあれば平均を計算して返す
-    if num_points > 0:
-        return [sum_lon / num_points, sum_lat / num_points]
-    else:
-        print(f"Warning: No valid coordinate points found to average for feature '{str(feature_id_val)}'. Skipping.")
-        return None
+    features = geojson_data.get("features", [])
+    if not isinstance(features, list):
+        raise ValueError(f"'features' in {input_file_path} is not a list.")
+    yield from features
 
-def process_stationcode_data(config) -> list:
-    """stationcode設定に基づいてGeoJSONファイルからデータを抽出します。"""
+def _iter_stationcode_batches(config):
+    """
+    stationcode設定に基づいてGeoJSONファイルからプロパティと座標を抽出し、
+    [(抽出したプロパティ, 座標, ログ用ID), ...] のバッチ（centroid_batch_size件ずつ）を順に返します。
+    """
     input_file_path = config.input_file_path
     processor_config = config.processor_specific_config
     properties_to_extract = processor_config.get("properties_to_extract", [])
     geometry_config = processor_config.get("geometry_config", {})
     filter_geom_type = geometry_config.get("filter_by_type")
-    geom_proc_output_key = geometry_config.get("output_key")
-
-    with open(input_file_path, 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
+    centroid_batch_size = geometry_config.get("centroid_batch_size", 5000)
+    streaming = processor_config.get("streaming", False)
 
-    features = geojson_data.get("features", [])
-    if not isinstance(features, list):
-        raise ValueError(f"'features' in {input_file_path} is not a list.")
-
-    results = []
+    batch = []
     # GeoJSONの各フィーチャー（地物）をループ処理
-    for feature in features:
+    for feature in _iter_geojson_features(input_file_path, streaming):
         if not isinstance(feature, dict):
             print(f"Warning: Skipping non-dictionary item in features list: {feature}")
             continue
@@ -177,26 +151,91 @@ def process_stationcode_data(config) -> list:
             for prop in properties_to_extract if prop["geojson_key"] in props
         }
 
-        # 3. ジオメトリの処理: 座標の平均値を計算
-        if geom_proc_output_key:
-            coordinates = geom.get("coordinates")
-            geom_type = geom.get("type", "Unknown")
-            # ヘルパー関数で平均座標を計算
-            processed_geom = _calculate_average_coordinates(coordinates, str(feature_id_for_logs), geom_type)
-            if processed_geom:
-                result_item[geom_proc_output_key] = processed_geom
-            else:
-                # 座標の処理に失敗したフィーチャーは結果に含めない
-                continue
-
-        if result_item:
-            results.append(result_item)
-            
-    return results
+        batch.append((result_item, geom.get("coordinates"), str(feature_id_for_logs)))
+        if len(batch) >= centroid_batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
 
-def _process_and_save(config):
+def _process_stationcode_batch(batch: list, output_key: str | None, render: bool = False):
+    """
+    抽出済みのバッチの平均座標を計算します。
+    別プロセスで実行できるよう、設定ではなく必要な値だけを受け取ります。
+
+    Returns:
+        tuple: (レコードのリスト（renderがTrueの場合はJSON配列の要素として整形した文字列のリスト）, GeometryDiagnostics)
+    """
+    diagnostics = GeometryDiagnostics()
+    if output_key:
+        # 3. ジオメトリの処理: 座標の平均値をバッチごとにベクトル演算で計算
+        centroids = calculate_centroids(
+            [coordinates for _, coordinates, _ in batch],
+            [feature_id for _, _, feature_id in batch],
+            diagnostics
+        )
+        records = []
+        for (result_item, _, _), centroid in zip(batch, centroids):
+            # 座標の処理に失敗したフィーチャーは結果に含めない
+            if centroid is not None:
+                result_item[output_key] = centroid
+                records.append(result_item)
+    else:
+        records = [result_item for result_item, _, _ in batch if result_item]
+
+    if render:
+        records = [render_json_array_item(record) for record in records]
+    return records, diagnostics
+
+def _report_geometry_diagnostics(diagnostics: GeometryDiagnostics, input_file_path: str):
+    """不正なジオメトリは1件ずつではなく、まとめて報告します。"""
+    if diagnostics.total:
+        print(f"Warning: {diagnostics.total} geometry issues found in {input_file_path}:")
+        for line in diagnostics.summary_lines():
+            print(f"  {line}")
+
+def iter_stationcode_data(config):
+    """stationcode設定に基づいてGeoJSONファイルからデータを抽出し、1件ずつ返します。"""
+    output_key = config.processor_specific_config.get("geometry_config", {}).get("output_key")
+    diagnostics = GeometryDiagnostics()
+    for batch in _iter_stationcode_batches(config):
+        records, batch_diagnostics = _process_stationcode_batch(batch, output_key)
+        diagnostics.merge(batch_diagnostics)
+        yield from records
+    _report_geometry_diagnostics(diagnostics, config.input_file_path)
+
+def iter_stationcode_rendered_parallel(config, executor: Executor, max_pending: int):
+    """
+    iter_stationcode_dataと同じレコードを、JSON配列の要素として整形した文字列で1件ずつ返します。
+    読み込んだバッチを順にexecutorへ渡して平均座標の計算と整形を並列に行い、結果は入力の順に返します。
+    先読みするバッチはmax_pending個までとし、メモリ使用量を抑えます。
+    """
+    output_key = config.processor_specific_config.get("geometry_config", {}).get("output_key")
+    diagnostics = GeometryDiagnostics()
+    pending = deque()
+
+    def pop_result():
+        records, batch_diagnostics = pending.popleft().result()
+        diagnostics.merge(batch_diagnostics)
+        return records
+
+    for batch in _iter_stationcode_batches(config):
+        pending.append(executor.submit(_process_stationcode_batch, batch, output_key, True))
+        if len(pending) >= max_pending:
+            yield from pop_result()
+    while pending:
+        yield from pop_result()
+    _report_geometry_diagnostics(diagnostics, config.input_file_path)
+
+def process_stationcode_data(config) -> list:
+    """stationcode設定に基づいてGeoJSONファイルからデータを抽出します。"""
+    return list(iter_stationcode_data(config))
+
+def _process_and_save(config, max_processes: int = 1):
     """
     単一の設定に基づいてデータ処理を実行し、結果をJSONファイルに保存します。
+    max_processesが2以上の場合、stationcodeはバッチごとに複数プロセスで処理します（出力は逐次処理と同じ）。
     """
     name = config.name
     print(f"--- Processing: {name} ---")
@@ -204,25 +243,34 @@ def _process_and_save(config):
     output_path = config.output_file_path
 
     try:
-        data = None
-        if name == "areacode":
-            data = process_areacode_data(config)
-        elif name == "stationcode":
-            data = process_stationcode_data(config)
-        else:
+        if name not in ("areacode", "stationcode"):
             print(f"Warning: No processor found for '{name}'. Skipping.")
             return
 
         output_dir = os.path.dirname(output_path)
         if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+            # 複数の設定を並列に処理する場合、同じディレクトリを同時に作成することがある
+            os.makedirs(output_dir, exist_ok=True)
             print(f"Created directory: {output_dir}")
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        # json.dump(data, f, ensure_ascii=False, indent=4) と同じ内容を一時ファイルに書き込んでから置き換える
+        if name == "areacode":
+            write_json_array_atomic(process_areacode_data(config), output_path)
+        elif max_processes > 1:
+            with ProcessPoolExecutor(max_workers=max_processes) as executor:
+                items = iter_stationcode_rendered_parallel(config, executor, max_pending=max_processes * 2)
+                write_rendered_json_array_atomic(items, output_path)
+        else:
+            # 抽出結果はリストにまとめず、1件ずつファイルに書き出す
+            write_json_array_atomic(iter_stationcode_data(config), output_path)
         
         print(f"Successfully converted {input_path} to {output_path}")
 
+        # 読み込み側がJSON全体をデコードしなくて済むよう、列指向のストアも作成する
+        columnar_dir = write_columnar_companion(output_path)
+        if columnar_dir:
+            print(f"Wrote columnar store: {columnar_dir}")
+
     except FileNotFoundError:
         print(f"Error: File not found at {input_path}")
     except (json.JSONDecodeError, ValueError) as e:
@@ -232,10 +280,22 @@ def _process_and_save(config):
     finally:
         print(f"--- Finished: {name} ---\n")
 
-def main(config_name: str = None):
+def _process_and_save_captured(config, max_processes: int) -> str:
+    """別プロセスで_process_and_saveを実行し、ログを文字列で返します（並列実行時にログが混ざらないようにする）。"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        _process_and_save(config, max_processes)
+    return output.getvalue()
+
+def main(config_name: str = None, max_processes: int = 1):
     """
     データ処理のエントリーポイント。
     引数で設定名が指定された場合はその設定のみを、指定されない場合は全ての設定を処理します。
+    max_processesが2以上の場合、複数の設定はプロセスプールで同時に処理します（各設定は互いに独立しているため）。
+
+    Args:
+        config_name: 処理する設定名（省略時は全ての設定）
+        max_processes: 使用するプロセス数の合計（既定の1は全て逐次処理。APIのバックグラウンドタスクもこの既定値で実行する）
     """
     configs_to_run = []
     if config_name:
@@ -255,12 +315,28 @@ def main(config_name: str = None):
     title = f"'{config_name}'" if config_name else 'all configs'
     print(f"--- Starting data processing for: {title} ---")
     
-    for config in configs_to_run:
-        if config:
-            _process_and_save(config)
+    if max_processes > 1 and len(configs_to_run) > 1:
+        # プロセス数の合計がmax_processesを超えないよう、設定ごとのプロセスに残りを割り当てる
+        config_processes = min(len(configs_to_run), max_processes)
+        processes_per_config = max(1, max_processes // config_processes)
+        with ProcessPoolExecutor(max_workers=config_processes) as executor:
+            futures = [
+                executor.submit(_process_and_save_captured, config, processes_per_config)
+                for config in configs_to_run
+            ]
+            # ログは設定の順に表示する
+            for config, future in zip(configs_to_run, futures):
+                try:
+                    print(future.result(), end="")
+                except Exception as e:
+                    print(f"An unexpected error occurred processing '{config.name}': {e}")
+    else:
+        for config in configs_to_run:
+            _process_and_save(config, max_processes)
             
     print("--- All processing finished ---")
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    # コマンドラインから実行する場合のみ、CPUコア数まで並列に処理する
+    main(max_processes=os.cpu_count() or 1)
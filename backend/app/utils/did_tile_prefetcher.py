@@ -0,0 +1,269 @@
+"""
+人口集中地区（DID）タイルの事前取得モジュール
+- 日本全域のバウンディングボックスに含まれるDIDタイル（ズーム9〜15）を一括取得
+- MBTiles互換のSQLiteタイルストアに保存し、/api/mlit/did はこのストアを優先して配信
+- トークンバケットによるレート制限付き、取得済みタイルはスキップして再開可能
+
+実行方法（プロジェクトルートから）:
+    python -m backend.app.utils.did_tile_prefetcher --format geojson --min-zoom 9 --max-zoom 15
+"""
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from .mbtiles_store import MBTilesStore
+from .mlit_api import MLIT_API_BASE_URL, MLIT_API_KEY
+from .rate_limiter import TokenBucket, parse_retry_after
+from .xyz_utils import lon_lat_to_xyz
+
+logger = logging.getLogger(__name__)
+
+# タイルストアの保存先（環境変数で上書き可能）
+DID_TILE_STORE_DIR = os.getenv('DID_TILE_STORE_DIR', str(Path(__file__).parents[2] / "data/tiles"))
+
+# XKT031（人口集中地区）APIが対応するズームレベル
+DID_MIN_ZOOM = 9
+DID_MAX_ZOOM = 15
+
+# 日本全域のバウンディングボックス [west, south, east, north]
+JAPAN_BOUNDING_BOXES: Dict[str, Tuple[float, float, float, float]] = {
+    "hokkaido": (139.3, 41.3, 145.9, 45.6),
+    "honshu_shikoku_kyushu": (128.5, 30.9, 142.1, 41.6),
+    "nansei_islands": (122.9, 24.0, 131.4, 30.9),
+}
+
+# リトライ設定
+MAX_RETRIES = 3
+RETRY_BASE_DELAY_SECONDS = 2.0
+# Retry-Afterに従って待機する最大秒数
+RETRY_AFTER_MAX_SECONDS = 300.0
+
+# 開いているタイルストア（レスポンス形式ごと）
+_did_tile_stores: Dict[str, MBTilesStore] = {}
+
+
+def did_tile_store_path(response_format: str) -> str:
+    """レスポンス形式ごとのタイルストアのパスを返す"""
+    return os.path.join(DID_TILE_STORE_DIR, f"did_{response_format}.mbtiles")
+
+
+def get_did_tile_store(response_format: str) -> Optional[MBTilesStore]:
+    """事前取得済みのタイルストアを返す（まだ作成されていなければNone）"""
+    store = _did_tile_stores.get(response_format)
+    if store is None:
+        path = did_tile_store_path(response_format)
+        if not os.path.exists(path):
+            return None
+        store = _did_tile_stores.setdefault(response_format, MBTilesStore(path))
+    return store
+
+
+def _tile_range(bbox: Tuple[float, float, float, float], z: int) -> Tuple[int, int, int, int]:
+    west, south, east, north = bbox
+    north_west = lon_lat_to_xyz(west, north, z)
+    south_east = lon_lat_to_xyz(east, south, z)
+    return north_west["x"], north_west["y"], south_east["x"], south_east["y"]
+
+
+def iter_did_tiles(
+    bboxes: Sequence[Tuple[float, float, float, float]], min_zoom: int, max_zoom: int
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    バウンディングボックスを覆うタイル (z, x, y) を順に返す
+    複数のボックスが重なる部分のタイルは1回だけ返す
+    """
+    for z in range(min_zoom, max_zoom + 1):
+        ranges: List[Tuple[int, int, int, int]] = []
+        for bbox in bboxes:
+            min_x, min_y, max_x, max_y = _tile_range(bbox, z)
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    if any(r[0] <= x <= r[2] and r[1] <= y <= r[3] for r in ranges):
+                        continue
+                    yield z, x, y
+            ranges.append((min_x, min_y, max_x, max_y))
+
+
+async def _fetch_did_tile(
+    client: httpx.AsyncClient,
+    limiter: TokenBucket,
+    store: MBTilesStore,
+    response_format: str,
+    tile: Tuple[int, int, int],
+    stats: Dict[str, int],
+    abort: asyncio.Event,
+    max_retries: int,
+    retry_base_delay: float
+):
+    z, x, y = tile
+    params = {"response_format": response_format, "z": z, "x": x, "y": y}
+
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        try:
+            response = await client.get("/XKT031", params=params)
+        except httpx.HTTPError as e:
+            logger.warning(f"Request error for DID tile {z}/{x}/{y} (attempt {attempt + 1}/{max_retries}): {e}")
+            await asyncio.sleep(retry_base_delay * (2 ** attempt))
+            continue
+
+        if response.status_code == 200:
+            store.put_tile(z, x, y, response.content)
+            stats["fetched"] += 1
+            return
+        if response.status_code in (204, 404):
+            store.mark_missing(z, x, y)
+            stats["missing"] += 1
+            return
+        if response.status_code == 401:
+            logger.error("MLIT API returned 401. Check MLIT_API_KEY. Aborting prefetch.")
+            abort.set()
+            stats["failed"] += 1
+            return
+        if response.status_code == 429 or response.status_code >= 500:
+            delay = retry_base_delay * (2 ** attempt)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(min(retry_after, RETRY_AFTER_MAX_SECONDS), delay)
+            if response.status_code == 429 or retry_after is not None:
+                # 共有のトークンバケットを止めて、他のワーカーのリクエストも同じだけ待たせる
+                limiter.pause(delay)
+            logger.warning(
+                f"MLIT API returned {response.status_code} for DID tile {z}/{x}/{y} "
+                f"(attempt {attempt + 1}/{max_retries}), retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        logger.error(f"MLIT API returned {response.status_code} for DID tile {z}/{x}/{y}: {response.text}")
+        break
+
+    stats["failed"] += 1
+
+
+async def prefetch_did_tiles(
+    store: MBTilesStore,
+    response_format: str = "geojson",
+    bboxes: Sequence[Tuple[float, float, float, float]] = tuple(JAPAN_BOUNDING_BOXES.values()),
+    min_zoom: int = DID_MIN_ZOOM,
+    max_zoom: int = DID_MAX_ZOOM,
+    base_url: str = MLIT_API_BASE_URL,
+    api_key: Optional[str] = MLIT_API_KEY,
+    rate: float = 2.0,
+    burst: int = 1,
+    concurrency: int = 4,
+    max_retries: int = MAX_RETRIES,
+    retry_base_delay: float = RETRY_BASE_DELAY_SECONDS,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Dict[str, int]:
+    """
+    DIDタイルを一括取得してタイルストアに保存する
+    取得済み（保存済み・存在しないことを確認済み）のタイルはスキップするため、中断後に再実行すると続きから再開する
+
+    Returns:
+        dict: 取得件数などの統計情報
+    """
+    stats = {"fetched": 0, "missing": 0, "skipped": 0, "failed": 0}
+    limiter = TokenBucket(rate=rate, burst=burst)
+    abort = asyncio.Event()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    headers = {"Ocp-Apim-Subscription-Key": api_key} if api_key else {}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30.0, transport=transport) as client:
+        async def worker():
+            while True:
+                tile = await queue.get()
+                try:
+                    if tile is None:
+                        return
+                    if not abort.is_set():
+                        await _fetch_did_tile(
+                            client, limiter, store, response_format, tile, stats,
+                            abort, max_retries, retry_base_delay
+                        )
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+        for index, tile in enumerate(iter_did_tiles(bboxes, min_zoom, max_zoom)):
+            if abort.is_set():
+                break
+            if store.is_done(*tile):
+                stats["skipped"] += 1
+                continue
+            await queue.put(tile)
+            if index % 1000 == 0:
+                logger.info(f"DID prefetch progress: at {tile}, stats={stats}")
+
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    west = min(bbox[0] for bbox in bboxes)
+    south = min(bbox[1] for bbox in bboxes)
+    east = max(bbox[2] for bbox in bboxes)
+    north = max(bbox[3] for bbox in bboxes)
+    store.set_metadata({
+        "name": f"MLIT XKT031 DID ({response_format})",
+        "format": "pbf" if response_format == "pbf" else "geojson",
+        "type": "overlay",
+        "version": "1",
+        "minzoom": min_zoom,
+        "maxzoom": max_zoom,
+        "bounds": f"{west},{south},{east},{north}",
+        "tile_compression": "gzip",
+    })
+
+    logger.info(f"DID prefetch finished: {stats}")
+    return stats
+
+
+def _parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("bbox must be 'west,south,east,north'")
+    return parts[0], parts[1], parts[2], parts[3]
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """DIDタイル事前取得のエントリーポイント"""
+    parser = argparse.ArgumentParser(description="人口集中地区（DID）タイルを事前取得してタイルストアに保存します。")
+    parser.add_argument("--format", dest="response_format", default="geojson", choices=["geojson", "pbf"])
+    parser.add_argument("--min-zoom", type=int, default=DID_MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=DID_MAX_ZOOM)
+    parser.add_argument("--bbox", type=_parse_bbox, action="append", help="west,south,east,north（複数指定可、省略時は日本全域）")
+    parser.add_argument("--rate", type=float, default=2.0, help="1秒あたりのリクエスト数")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-url", default=MLIT_API_BASE_URL)
+    parser.add_argument("--output", default=None, help="タイルストアのパス（省略時は DID_TILE_STORE_DIR 配下）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    min_zoom = max(DID_MIN_ZOOM, args.min_zoom)
+    max_zoom = min(DID_MAX_ZOOM, args.max_zoom)
+    store = MBTilesStore(args.output or did_tile_store_path(args.response_format))
+    try:
+        asyncio.run(prefetch_did_tiles(
+            store,
+            response_format=args.response_format,
+            bboxes=args.bbox or tuple(JAPAN_BOUNDING_BOXES.values()),
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            base_url=args.base_url,
+            rate=args.rate,
+            burst=args.burst,
+            concurrency=args.concurrency
+        ))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+GeoJSONの逐次読み込みモジュール
+- FeatureCollectionのファイルを一定サイズずつ読み込み、featuresの要素を1つずつデコードして返す
+- ファイル全体をjson.loadしないため、メモリ使用量は入力ファイルの大きさによらず一定（最大のフィーチャー程度）
+"""
+import json
+from typing import IO, Any, Iterator
+
+# 一度に読み込む文字数
+GEOJSON_READ_CHUNK_CHARS = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+# 値の直後に現れる文字
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+class _StreamReader:
+    """ファイルを少しずつ読み込みながら、JSONの値を先頭から順にデコードする"""
+    def __init__(self, f: IO[str], chunk_chars: int):
+        self._f = f
+        self._chunk_chars = chunk_chars
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read_more(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_chars)
+        if not chunk:
+            self._eof = True
+            return False
+        # 処理済みの部分を捨て、バッファが大きくなり続けないようにする
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """空白を読み飛ばして次の1文字を返す（ファイルの終わりでは空文字）"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read_more():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at character {self._pos} of the current buffer")
+        self._pos += 1
+
+    def decode_value(self) -> Any:
+        """次のJSONの値を1つデコードして返す（値が途中で途切れている場合は読み足して再試行する）"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # 数値はバッファの末尾で途切れていてもデコードできてしまうため、値の区切りまで読めているか確認する
+                if self._eof or (end < len(self._buf) and self._buf[end] in _DELIMITERS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._read_more():
+                # ファイルの終わりに達したので、バッファの残りだけでもう一度デコードする
+                continue
+
+
+def _iter_member_keys(reader: _StreamReader) -> Iterator[str]:
+    """トップレベルのオブジェクトのキーを順に返す（値は呼び出し側が読む）"""
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.decode_value()
+        reader.expect(":")
+        yield key
+        if reader.peek() == ",":
+            reader.expect(",")
+            continue
+        reader.expect("}")
+        return
+
+
+def iter_geojson_features(f: IO[str], chunk_chars: int = GEOJSON_READ_CHUNK_CHARS) -> Iterator[Any]:
+    """
+    FeatureCollectionのfeaturesの要素を先頭から1つずつ返す
+
+    Args:
+        f: テキストモードで開いたGeoJSONファイル
+        chunk_chars: 一度に読み込む文字数
+
+    Raises:
+        ValueError: トップレベルがオブジェクトでない場合、または'features'が配列でない場合
+        json.JSONDecodeError: JSONとして不正な場合
+    """
+    reader = _StreamReader(f, chunk_chars)
+    if reader.peek() != "{":
+        raise ValueError("GeoJSON top-level value is not an object.")
+
+    for key in _iter_member_keys(reader):
+        if key != "features":
+            # features以外のメンバー（type, name, crsなど）は小さいため、そのままデコードして捨てる
+            reader.decode_value()
+            continue
+        if reader.peek() != "[":
+            raise ValueError("'features' is not a list.")
+        reader.expect("[")
+        if reader.peek() == "]":
+            reader.expect("]")
+            continue
+        while True:
+            yield reader.decode_value()
+            if reader.peek() == ",":
+                reader.expect(",")
+                continue
+            reader.expect("]")
+            break
@@ -0,0 +1,229 @@
+"""
+ジオメトリの中心点計算モジュール
+- 複数フィーチャーの座標を、フラットなNumPy配列（経度・緯度）と各フィーチャーの開始位置（offsets）にまとめる
+- 全フィーチャーの平均座標（中心点）を1回のベクトル演算で計算する
+- 不正な座標は点ごとに出力せず、GeometryDiagnosticsに集計する
+
+中心点は、フィーチャー内の有効な点の経度・緯度を先頭から順に足し合わせて点の数で割ったもの
+（np.bincountは要素を順に加算するため、Pythonのループで合計した場合と同じ値になる）
+"""
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# まとめて変換できなかった場合に、これ以下のフィーチャー数になったら分割をやめて1つずつ処理する
+MIN_BATCH_SPLIT_FEATURES = 16
+
+# 診断情報に残す例の数（理由ごと）
+DIAGNOSTICS_MAX_EXAMPLES = 5
+
+# 診断の理由と説明
+DIAGNOSTIC_REASONS = {
+    "empty_coordinates": "coordinates is empty or not a list (feature skipped)",
+    "no_points": "no [lon, lat] points found in coordinates (feature skipped)",
+    "invalid_point": "point is not a list of two numbers (point skipped)",
+    "no_valid_points": "no valid points left to average (feature skipped)",
+}
+
+
+@dataclass
+class GeometryDiagnostics:
+    """不正なジオメトリの集計"""
+    counts: Dict[str, int] = field(default_factory=dict)
+    examples: Dict[str, List[str]] = field(default_factory=dict)
+
+    def record(self, reason: str, feature_id: str, detail: Optional[str] = None):
+        self.counts[reason] = self.counts.get(reason, 0) + 1
+        examples = self.examples.setdefault(reason, [])
+        if len(examples) < DIAGNOSTICS_MAX_EXAMPLES:
+            examples.append(f"'{feature_id}'" + (f" {detail}" if detail else ""))
+
+    def merge(self, other: "GeometryDiagnostics"):
+        """別のバッチの集計を加える（バッチの順に加えれば、まとめて処理した場合と同じ結果になる）"""
+        for reason, count in other.counts.items():
+            self.counts[reason] = self.counts.get(reason, 0) + count
+            examples = self.examples.setdefault(reason, [])
+            examples.extend(other.examples.get(reason, [])[:DIAGNOSTICS_MAX_EXAMPLES - len(examples)])
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def summary_lines(self) -> List[str]:
+        """集計結果を表示用の行のリストで返す"""
+        lines = []
+        for reason, count in self.counts.items():
+            lines.append(f"{reason}: {count} ({DIAGNOSTIC_REASONS.get(reason, '')})")
+            lines.extend(f"    e.g. {example}" for example in self.examples.get(reason, []))
+        return lines
+
+
+@dataclass
+class PackedCoordinates:
+    """フィーチャーごとの有効な点をまとめた配列（i番目のフィーチャーの点は offsets[i]:offsets[i+1]）"""
+    lons: np.ndarray
+    lats: np.ndarray
+    offsets: np.ndarray
+
+    @property
+    def feature_count(self) -> int:
+        return len(self.offsets) - 1
+
+
+def _flatten_points(coordinates, flat_points: list):
+    """ネストされた座標リストから点（先頭の要素が数値のリスト）を取り出す"""
+    if isinstance(coordinates, list) and len(coordinates) > 0 and isinstance(coordinates[0], (int, float)):
+        flat_points.append(coordinates)
+    elif isinstance(coordinates, list):
+        for item in coordinates:
+            _flatten_points(item, flat_points)
+
+
+_NUMBER_TYPES = {int, float}
+
+
+def _line_points_array(points: list) -> Optional[np.ndarray]:
+    """
+    [[経度, 緯度], ...] を (点の数, 2) の配列に変換する
+    全ての点が同じ長さ（2以上）で、値が全てint / floatの場合のみ変換し、それ以外はNoneを返す
+    """
+    try:
+        widths = set(map(len, points))
+    except TypeError:
+        return None
+    if len(widths) != 1:
+        return None
+    width = widths.pop()
+    if width < 2 or not set(map(type, chain.from_iterable(points))) <= _NUMBER_TYPES:
+        return None
+    values = np.fromiter(chain.from_iterable(points), dtype=np.float64, count=len(points) * width)
+    return values.reshape(-1, width)[:, :2]
+
+
+def _nested_points_array(coordinates: list) -> Optional[np.ndarray]:
+    """ネストされた座標リスト（MultiLineStringなど）を、形が揃っている場合のみ (点の数, 2) の配列に変換する"""
+    try:
+        array = np.array(coordinates)
+    except (ValueError, TypeError):
+        return None
+    if array.ndim < 2 or array.size == 0 or array.shape[-1] < 2 or array.dtype.kind not in "biuf":
+        return None
+    return array.reshape(-1, array.shape[-1])[:, :2].astype(np.float64)
+
+
+def _feature_points(coordinates: list, feature_id: str, diagnostics: GeometryDiagnostics) -> np.ndarray:
+    """1つのフィーチャーの有効な点を (点の数, 2) の配列で返す（不正な点は診断情報に記録して除く）"""
+    array = _line_points_array(coordinates) if _is_line_string_shaped(coordinates) else None
+    if array is None:
+        array = _nested_points_array(coordinates)
+    if array is not None:
+        return array
+
+    flat_points = []
+    _flatten_points(coordinates, flat_points)
+    if not flat_points:
+        diagnostics.record("no_points", feature_id)
+        return np.empty((0, 2))
+
+    valid_points = []
+    for point in flat_points:
+        try:
+            if len(point) < 2:
+                raise TypeError("Point is not a list of two numbers")
+            valid_points.append((float(point[0]), float(point[1])))
+        except (ValueError, TypeError) as e:
+            diagnostics.record("invalid_point", feature_id, f"{point!r}: {e}")
+    if not valid_points:
+        diagnostics.record("no_valid_points", feature_id)
+        return np.empty((0, 2))
+    return np.array(valid_points, dtype=np.float64)
+
+
+def _is_line_string_shaped(coordinates: list) -> bool:
+    """[[経度, 緯度], ...] の形（LineString）に見えるかを返す（まとめて配列に変換する対象）"""
+    first = coordinates[0]
+    return isinstance(first, list) and len(first) > 0 and isinstance(first[0], (int, float))
+
+
+def _batch_points_array(coordinates_list: Sequence) -> Optional[Tuple[np.ndarray, List[int]]]:
+    """
+    LineStringの座標リストをまとめて (点の数, 2) の配列に変換し、フィーチャーごとの点の数とともに返す
+    1つでも形の違う座標（ネスト、数値でない値、長さの違う点など）があればNoneを返す
+    """
+    try:
+        counts = list(map(len, coordinates_list))
+        points = list(chain.from_iterable(coordinates_list))
+    except TypeError:
+        return None
+    array = _line_points_array(points)
+    return None if array is None else (array, counts)
+
+
+def pack_coordinates(
+    coordinates_list: Sequence, feature_ids: Sequence[str], diagnostics: GeometryDiagnostics
+) -> PackedCoordinates:
+    """
+    フィーチャーごとの座標リストを、有効な点だけのフラットな配列にまとめる
+    まず全フィーチャーをまとめて1回で配列に変換し、変換できない場合は半分ずつに分けて、
+    変換できないフィーチャーだけをフィーチャーごとの処理に回す
+    """
+    counts = np.zeros(len(coordinates_list), dtype=np.int64)
+    segments: List[np.ndarray] = []
+
+    def convert(start: int, stop: int):
+        packed = _batch_points_array(coordinates_list[start:stop])
+        if packed is not None:
+            array, batch_counts = packed
+            segments.append(array)
+            counts[start:stop] = batch_counts
+            for i in np.flatnonzero(counts[start:stop] == 0):
+                diagnostics.record("empty_coordinates", feature_ids[start + i])
+        elif stop - start > MIN_BATCH_SPLIT_FEATURES:
+            middle = (start + stop) // 2
+            convert(start, middle)
+            convert(middle, stop)
+        else:
+            for i in range(start, stop):
+                coordinates = coordinates_list[i]
+                if not coordinates or not isinstance(coordinates, list):
+                    diagnostics.record("empty_coordinates", feature_ids[i])
+                    continue
+                points = _feature_points(coordinates, feature_ids[i], diagnostics)
+                segments.append(points)
+                counts[i] = len(points)
+
+    if len(coordinates_list):
+        convert(0, len(coordinates_list))
+
+    points = np.concatenate(segments) if segments else np.empty((0, 2))
+    offsets = np.zeros(len(coordinates_list) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return PackedCoordinates(lons=points[:, 0], lats=points[:, 1], offsets=offsets)
+
+
+def compute_centroids(packed: PackedCoordinates) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    全フィーチャーの平均座標を計算する
+
+    Returns:
+        tuple: ((フィーチャー数, 2) の [経度, 緯度] の配列, 有効な点が1つ以上あるフィーチャーのマスク)
+    """
+    counts = np.diff(packed.offsets)
+    feature_index = np.repeat(np.arange(packed.feature_count), counts)
+    sum_lons = np.bincount(feature_index, weights=packed.lons, minlength=packed.feature_count)
+    sum_lats = np.bincount(feature_index, weights=packed.lats, minlength=packed.feature_count)
+    valid = counts > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centroids = np.column_stack((sum_lons / counts, sum_lats / counts))
+    return centroids, valid
+
+
+def calculate_centroids(
+    coordinates_list: Sequence, feature_ids: Sequence[str], diagnostics: GeometryDiagnostics
+) -> List[Optional[List[float]]]:
+    """フィーチャーごとの平均座標 [経度, 緯度] のリストを返す（有効な点がないフィーチャーはNone）"""
+    packed = pack_coordinates(coordinates_list, feature_ids, diagnostics)
+    centroids, valid = compute_centroids(packed)
+    return [centroid if is_valid else None for centroid, is_valid in zip(centroids.tolist(), valid.tolist())]
@@ -0,0 +1,143 @@
+"""
+取得したHTMLのアーカイブモジュール
+- ページ本文をSHA-256で内容アドレス化し、gzip圧縮して保存（同じ内容は1回だけ保存）
+- URL・取得時刻・ページの種類・文字コードをSQLiteの索引に記録
+- URLごとの最新（または指定時刻時点）のページを取り出し、ネットワークなしで再解析できる
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+
+@dataclass(frozen=True)
+class ArchivedPage:
+    """アーカイブされたページの索引情報"""
+    url: str
+    page_kind: str
+    fetched_at: float
+    content_hash: str
+    encoding: Optional[str]
+
+
+class HtmlArchive:
+    """内容アドレス化されたHTMLアーカイブ"""
+    def __init__(self, root_dir: str):
+        self.root_dir = Path(root_dir)
+        self.objects_dir = self.root_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.root_dir / "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fetches (
+                url TEXT NOT NULL,
+                page_kind TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                encoding TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fetches_url_time ON fetches (url, fetched_at)")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _object_path(self, content_hash: str) -> Path:
+        return self.objects_dir / content_hash[:2] / f"{content_hash[2:]}.html.gz"
+
+    def put(self, url: str, page_kind: str, content: bytes, encoding: Optional[str] = None) -> str:
+        """
+        ページ本文を保存し、取得記録を索引に追加する
+
+        Returns:
+            str: 本文のハッシュ（SHA-256）
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(content_hash)
+        if not object_path.exists():
+            # 書き込み途中のファイルが読まれないよう、一時ファイルに書いてから置き換える
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=object_path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(gzip.compress(content))
+                os.replace(tmp_path, object_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO fetches (url, page_kind, fetched_at, content_hash, encoding) VALUES (?, ?, ?, ?, ?)",
+                (url, page_kind, time.time(), content_hash, encoding)
+            )
+            self._conn.commit()
+        return content_hash
+
+    def latest_page(self, url: str) -> Optional[ArchivedPage]:
+        """URLの最新のページを返す（アーカイブにない場合はNone）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, page_kind, fetched_at, content_hash, encoding FROM fetches "
+                "WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+                (url,)
+            ).fetchone()
+        return ArchivedPage(*row) if row else None
+
+    def relink(self, page: ArchivedPage) -> ArchivedPage:
+        """
+        保存済みの本文を現在時刻の取得記録として追加する
+        本文を受け取らなかった取得（304など）でも、その時点のページとして再解析できるようにする
+        """
+        relinked = ArchivedPage(page.url, page.page_kind, time.time(), page.content_hash, page.encoding)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO fetches (url, page_kind, fetched_at, content_hash, encoding) VALUES (?, ?, ?, ?, ?)",
+                (relinked.url, relinked.page_kind, relinked.fetched_at, relinked.content_hash, relinked.encoding)
+            )
+            self._conn.commit()
+        return relinked
+
+    def read_content(self, content_hash: str) -> bytes:
+        """ハッシュに対応するページ本文を返す"""
+        return gzip.decompress(self._object_path(content_hash).read_bytes())
+
+    def read_text(self, page: ArchivedPage) -> str:
+        """取得時の文字コードでページ本文をデコードして返す"""
+        return self.read_content(page.content_hash).decode(page.encoding or "utf-8", errors="replace")
+
+    def latest_pages(self, as_of: Optional[float] = None, page_kind: Optional[str] = None) -> List[ArchivedPage]:
+        """
+        URLごとに最新のページを返す
+
+        Args:
+            as_of: この時刻（UNIX時間）以前に取得したページに限る
+            page_kind: ページの種類で絞り込む
+        """
+        query = """
+            SELECT f.url, f.page_kind, f.fetched_at, f.content_hash, f.encoding
+            FROM fetches f
+            JOIN (
+                SELECT url, MAX(fetched_at) AS fetched_at FROM fetches WHERE fetched_at <= ? GROUP BY url
+            ) latest ON f.url = latest.url AND f.fetched_at = latest.fetched_at
+        """
+        params: list = [as_of if as_of is not None else float("inf")]
+        if page_kind is not None:
+            query += " WHERE f.page_kind = ?"
+            params.append(page_kind)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY f.url", params).fetchall()
+        return [ArchivedPage(*row) for row in rows]
@@ -0,0 +1,144 @@
+"""
+HTML抽出バックエンドのベンチマークモジュール
+- 保存済みのSUUMOページ（フィクスチャ）を各バックエンドで解析し、1秒あたりの処理ページ数を計測
+- 全バックエンドの抽出結果が従来の処理（bs4）と一致することも確認する
+- フィクスチャの代わりにスクレイピング時のHTMLアーカイブ（--archive）も使える
+
+フィクスチャはファイル名の接頭辞でページの種類を判定する
+    soba_*.html  : 都道府県一覧ページ
+    ensen_*.html : 路線一覧ページ
+    line_*.html  : 路線ページ（駅ごとの家賃）
+
+実行方法（プロジェクトルートから）:
+    python -m backend.app.utils.html_extractor_benchmark --iterations 20
+"""
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .html_archive import HtmlArchive
+from .html_extractors import HTML_EXTRACTORS, HtmlExtractor, get_html_extractor
+
+# フィクスチャの既定の保存先
+DEFAULT_FIXTURE_DIR = Path(__file__).parents[2] / "tests/fixtures/suumo"
+
+# フィクスチャの接頭辞ごとのページの種類
+FIXTURE_PAGE_KINDS = {
+    "soba_": "prefectures",
+    "ensen_": "lines",
+    "line_": "station_rents",
+}
+
+# フィクスチャのURLの基準（相対リンクの解決に使う）
+FIXTURE_BASE_URL = "https://suumo.jp/chintai/soba/"
+
+
+def load_fixture_pages(fixture_dir: Path) -> List[Tuple[str, str, str]]:
+    """
+    フィクスチャを読み込む
+
+    Returns:
+        list: [(URL, ページの種類, HTML), ...]（URLは基準URLにファイル名をつなげたもの）
+    """
+    pages = []
+    for path in sorted(Path(fixture_dir).glob("*.html")):
+        page_kind = next((kind for prefix, kind in FIXTURE_PAGE_KINDS.items() if path.name.startswith(prefix)), None)
+        if page_kind is None:
+            continue
+        pages.append((FIXTURE_BASE_URL + path.name, page_kind, path.read_text(encoding="utf-8")))
+    return pages
+
+
+def load_archive_pages(archive_dir: Path, limit: Optional[int] = None) -> List[Tuple[str, str, str]]:
+    """
+    HTMLアーカイブからURLごとの最新のページを読み込む
+
+    Returns:
+        list: [(URL, ページの種類, HTML), ...]
+    """
+    archive = HtmlArchive(str(archive_dir))
+    try:
+        pages = archive.latest_pages()[:limit]
+        return [(page.url, page.page_kind, archive.read_text(page)) for page in pages]
+    finally:
+        archive.close()
+
+
+def extract_all(extractor: HtmlExtractor, pages: Sequence[Tuple[str, str, str]]) -> List:
+    """全ページを解析して結果を返す"""
+    return [extractor.extract(page_kind, html, url) for url, page_kind, html in pages]
+
+
+def benchmark_extractor(
+    extractor: HtmlExtractor, pages: Sequence[Tuple[str, str, str]], iterations: int
+) -> Dict[str, float]:
+    """全ページをiterations回解析し、処理時間と1秒あたりの処理ページ数を返す"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        extract_all(extractor, pages)
+    elapsed = time.perf_counter() - start
+    page_count = len(pages) * iterations
+    return {
+        "pages": page_count,
+        "seconds": elapsed,
+        "pages_per_second": page_count / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+def run_benchmark(
+    pages: Sequence[Tuple[str, str, str]],
+    backends: Optional[Sequence[str]] = None,
+    iterations: int = 10
+) -> Dict[str, Dict[str, float]]:
+    """
+    各バックエンドのベンチマークを実行する
+
+    Raises:
+        ValueError: ページがない場合、またはバックエンド間で抽出結果が一致しない場合
+    """
+    if not pages:
+        raise ValueError("No pages to benchmark")
+
+    reference = extract_all(get_html_extractor("bs4"), pages)
+    results = {}
+    for name in backends or list(HTML_EXTRACTORS):
+        extractor = get_html_extractor(name)
+        if extract_all(extractor, pages) != reference:
+            raise ValueError(f"Extractor '{name}' produced different results from 'bs4'")
+        results[name] = benchmark_extractor(extractor, pages, iterations)
+        results[name]["parser"] = extractor.parser
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """ベンチマークのエントリーポイント"""
+    parser = argparse.ArgumentParser(description="SUUMOページのHTML抽出バックエンドのベンチマークを実行します。")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURE_DIR, help="フィクスチャのディレクトリ")
+    parser.add_argument("--archive", type=Path, help="フィクスチャの代わりに使うHTMLアーカイブのディレクトリ")
+    parser.add_argument("--limit", type=int, help="アーカイブから読み込むページ数の上限")
+    parser.add_argument("--backend", action="append", choices=list(HTML_EXTRACTORS), help="計測するバックエンド（複数指定可、省略時は全て）")
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    # フィクスチャの注記ログで結果が埋もれないようにする
+    logging.getLogger("backend.app.utils.html_extractors").setLevel(logging.WARNING)
+
+    if args.archive:
+        pages = load_archive_pages(args.archive, args.limit)
+    else:
+        pages = load_fixture_pages(args.fixtures)
+    results = run_benchmark(pages, args.backend, args.iterations)
+    baseline = results.get("bs4", {}).get("pages_per_second")
+    print(f"{'backend':<10} {'parser':<12} {'pages':>7} {'seconds':>9} {'pages/sec':>10} {'speedup':>8}")
+    for name, result in results.items():
+        speedup = f"{result['pages_per_second'] / baseline:.2f}x" if baseline else "-"
+        print(
+            f"{name:<10} {result['parser']:<12} {result['pages']:>7} {result['seconds']:>9.3f} "
+            f"{result['pages_per_second']:>10.1f} {speedup:>8}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+SUUMO家賃相場ページのHTML抽出モジュール
+- 都道府県一覧・路線一覧・路線ページから必要な要素だけを抽出する
+- 抽出処理を差し替え可能なバックエンドとして提供
+  - bs4: ページ全体のツリーを構築する（従来の処理）
+  - targeted: 必要な要素（リンク、searchtable、js-graph-data行）の部分木だけを構築する。
+    lxmlがインストールされていればlxmlで解析する
+- どのバックエンドでも同じPrefecture / Line / StationRentInfoを返す
+"""
+import logging
+import os
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib.parse import urljoin
+from .rent_models import Line, Prefecture, StationRentInfo
+
+logger = logging.getLogger(__name__)
+
+# 使用する抽出バックエンド（環境変数で上書き可能）
+SUUMO_HTML_EXTRACTOR = os.getenv('SUUMO_HTML_EXTRACTOR', 'targeted')
+
+# ページの種類ごとの抽出メソッド名
+PAGE_KIND_METHODS = {
+    "prefectures": "extract_prefectures",
+    "lines": "extract_lines",
+    "station_rents": "extract_station_rents",
+}
+
+try:
+    import lxml  # noqa: F401
+    FAST_HTML_PARSER = "lxml"
+except ImportError:
+    FAST_HTML_PARSER = "html.parser"
+
+
+class HtmlExtractor:
+    """抽出バックエンドの基底クラス（ページ全体のツリーを構築する従来の処理）"""
+    name = "bs4"
+
+    def __init__(self, parser: str = "html.parser"):
+        self.parser = parser
+
+    def _soup(self, html: str, parse_only: Optional[SoupStrainer]) -> BeautifulSoup:
+        return BeautifulSoup(html, self.parser)
+
+    def extract(self, page_kind: str, html: str, url: str):
+        """ページの種類（PAGE_KIND_METHODSのキー）に応じた抽出を行う"""
+        return getattr(self, PAGE_KIND_METHODS[page_kind])(html, url)
+
+    def extract_prefectures(self, html: str, base_url: str) -> List[Prefecture]:
+        """都道府県一覧ページのHTMLから都道府県名と路線一覧ページURLを抽出する"""
+        soup = self._soup(html, SoupStrainer("a", class_="areamenu_detail-btn"))
+        prefecture_links = soup.find_all("a", class_="areamenu_detail-btn")
+
+        prefecture_info_list = []
+        for tag in prefecture_links:
+            href = tag.get("href")
+            name = tag.text.strip()
+            if href:
+                full_url = urljoin(base_url, href)
+                full_url = f"{full_url}ensen/"
+                prefecture_info_list.append(Prefecture(name=name, url=full_url))
+
+        return prefecture_info_list
+
+    def extract_lines(self, html: str, base_url: str) -> Dict[str, List[Line]]:
+        """路線一覧ページのHTMLから鉄道会社ごとの路線情報を抽出する"""
+        soup = self._soup(html, SoupStrainer("table", class_="searchtable"))
+        search_table = soup.find("table", class_="searchtable")
+        if not search_table:
+            logger.info(f"💡 注意: 路線情報テーブル (searchtable) が見つかりませんでした ({base_url})")
+            return {}
+
+        search_table_list = search_table.find_all("tr")
+        company_to_lines_map = {}
+
+        for railway_company_row in search_table_list:
+            railway_company_th = railway_company_row.find("th", class_="searchtable-title")
+            if not railway_company_th:
+                continue
+            railway_company_name = railway_company_th.text.strip()
+            company_to_lines_map[railway_company_name] = []
+
+            for searchitem_td in railway_company_th.find_next_siblings("td"):
+                line_links = searchitem_td.find_all("a")
+                for link in line_links:
+                    href = link.get("href")
+                    line_name = link.text.strip()
+                    if href:
+                        full_url = urljoin(base_url, href)
+                        company_to_lines_map[railway_company_name].append(Line(name=line_name, url=full_url))
+                    else:
+                        logger.info(f"💡 注意: 路線リンクの href が見つかりませんでした: {line_name} ({base_url})")
+
+        return company_to_lines_map
+
+    def extract_station_rents(self, html: str, line_url: str) -> List[StationRentInfo]:
+        """路線ページのHTMLから駅ごとの家賃データを抽出する"""
+        soup = self._soup(html, SoupStrainer("tr", class_="js-graph-data"))
+        station_rows = soup.find_all("tr", class_="js-graph-data")
+        results = []
+
+        if not station_rows:
+            logger.info(f"💡 注意: 駅データ行 (js-graph-data) が見つかりませんでした ({line_url})")
+            return []
+
+        for row in station_rows:
+            first_td_tag = row.find("td")
+            station_name = first_td_tag.text.strip() if first_td_tag else "不明"
+
+            price_tag_element = row.find("span", class_="graphpanel_matrix-td_graphinfo-strong")
+            price_text = price_tag_element.text.strip() if price_tag_element else "不明"
+
+            results.append(StationRentInfo(station=station_name, rent=price_text))
+
+        return results
+
+
+class TargetedHtmlExtractor(HtmlExtractor):
+    """必要な要素の部分木だけを構築する抽出バックエンド"""
+    name = "targeted"
+
+    def __init__(self, parser: str = FAST_HTML_PARSER):
+        super().__init__(parser)
+
+    def _soup(self, html: str, parse_only: Optional[SoupStrainer]) -> BeautifulSoup:
+        return BeautifulSoup(html, self.parser, parse_only=parse_only)
+
+
+HTML_EXTRACTORS = {
+    HtmlExtractor.name: HtmlExtractor,
+    TargetedHtmlExtractor.name: TargetedHtmlExtractor,
+}
+
+
+def get_html_extractor(name: str = SUUMO_HTML_EXTRACTOR) -> HtmlExtractor:
+    """名前から抽出バックエンドを作成する"""
+    try:
+        return HTML_EXTRACTORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown HTML extractor: {name} (available: {', '.join(HTML_EXTRACTORS)})")
@@ -0,0 +1,118 @@
+"""
+MBTiles形式のタイルストアモジュール
+- 1ファイルのSQLiteにタイルピラミッドを保存（MBTiles 1.3互換のスキーマ）
+- タイルはgzip圧縮して保存し、行番号はTMS方式（y軸反転）で格納
+- 上流に存在しなかったタイルを記録し、再取得を防ぐ
+"""
+import gzip
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+
+def xyz_to_tms_row(z: int, y: int) -> int:
+    """XYZ方式のタイルY座標をMBTilesのtile_row（TMS方式）に変換"""
+    return (2 ** z - 1) - y
+
+
+class MBTilesStore:
+    """MBTiles互換のSQLiteタイルストア"""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        output_dir = os.path.dirname(path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER NOT NULL,
+                tile_column INTEGER NOT NULL,
+                tile_row INTEGER NOT NULL,
+                tile_data BLOB NOT NULL,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            )
+            """
+        )
+        # MBTilesの仕様外の補助テーブル（上流に存在しなかったタイル）
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS missing_tiles (
+                zoom_level INTEGER NOT NULL,
+                tile_column INTEGER NOT NULL,
+                tile_row INTEGER NOT NULL,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def set_metadata(self, metadata: Dict[str, str]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+                [(name, str(value)) for name, value in metadata.items()]
+            )
+            self._conn.commit()
+
+    def get_metadata(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM metadata").fetchall())
+
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """gzip圧縮されたタイルデータを返す（存在しなければNone）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, xyz_to_tms_row(z, y))
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put_tile(self, z: int, x: int, y: int, content: bytes):
+        """未圧縮のタイルデータをgzip圧縮して保存する"""
+        tile_data = gzip.compress(content)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+                (z, x, xyz_to_tms_row(z, y), tile_data)
+            )
+            self._conn.commit()
+
+    def mark_missing(self, z: int, x: int, y: int):
+        """上流に存在しなかったタイルを記録する"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO missing_tiles (zoom_level, tile_column, tile_row) VALUES (?, ?, ?)",
+                (z, x, xyz_to_tms_row(z, y))
+            )
+            self._conn.commit()
+
+    def _exists(self, table: str, z: int, x: int, y: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM {table} WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, xyz_to_tms_row(z, y))
+            ).fetchone()
+        return row is not None
+
+    def is_missing(self, z: int, x: int, y: int) -> bool:
+        """上流に存在しないことを確認済みのタイルかを返す"""
+        return self._exists("missing_tiles", z, x, y)
+
+    def is_done(self, z: int, x: int, y: int) -> bool:
+        """タイルが取得済み（保存済み、または存在しないことを確認済み）かを返す"""
+        return self._exists("tiles", z, x, y) or self.is_missing(z, x, y)
+
+    def count_tiles(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
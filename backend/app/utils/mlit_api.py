@@ -1,58 +1,423 @@
-import requests
+"""
+国土交通省（MLIT）APIクライアントモジュール
+- アプリケーション全体で共有する非同期HTTPクライアント（keep-alive / HTTP/2 / コネクションプール）
+- タイルキャッシュを経由したタイル取得
+- 同一タイルへの同時リクエストの集約（single-flight）
+- 上流レスポンスをバッファリングせずに中継するストリーミング取得
+"""
+import asyncio
+import gzip
+import json
+import logging
 import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+
+import httpx
 from dotenv import load_dotenv
+from .tile_cache import CachedTile, TileKey, get_tile_cache
 from ..exceptions.station import (
     MLITUnauthorizedError,
     MLITBadRequestError,
     MLITNotFoundError,
-    MLITServerError
+    MLITServerError,
+    MLITGatewayTimeoutError
 )
 
 # 環境変数の読み込み
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # 定数
-MLIT_API_BASE_URL = "https://www.reinfolib.mlit.go.jp/ex-api/external"
+MLIT_API_BASE_URL = os.getenv('MLIT_API_BASE_URL', "https://www.reinfolib.mlit.go.jp/ex-api/external")
 MLIT_API_KEY = os.getenv('MLIT_API_KEY')
+# APIキーが未設定でもリクエストするAPI（人口集中地区タイルは従来からキーなしでも問い合わせていた）
+MLIT_KEY_OPTIONAL_APIS = {"XKT031"}
+
+# コネクションプールとタイムアウトの設定（環境変数で上書き可能）
+MLIT_HTTP2 = os.getenv('MLIT_HTTP2', 'true').lower() == 'true'
+MLIT_MAX_CONNECTIONS = int(os.getenv('MLIT_MAX_CONNECTIONS', 100))
+MLIT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('MLIT_MAX_KEEPALIVE_CONNECTIONS', 20))
+MLIT_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('MLIT_KEEPALIVE_EXPIRY_SECONDS', 30.0))
+MLIT_TIMEOUT_SECONDS = float(os.getenv('MLIT_TIMEOUT_SECONDS', 30.0))
+MLIT_CONNECT_TIMEOUT_SECONDS = float(os.getenv('MLIT_CONNECT_TIMEOUT_SECONDS', 5.0))
+# ストリーミング中継で一度に転送する最大サイズ
+MLIT_STREAM_CHUNK_BYTES = int(os.getenv('MLIT_STREAM_CHUNK_BYTES', 64 * 1024))
+# ストリーミング中継したタイルをキャッシュに保存する最大サイズ
+# これを超えるタイルはキャッシュせず、中継中に待機しているリクエストにだけ本文を共有する
+MLIT_STREAM_CACHE_MAX_BYTES = int(os.getenv('MLIT_STREAM_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# ストリーミング中継の本文がこの時間内に読み始められなければ、上流のレスポンスを閉じて中継を中断する
+MLIT_STREAM_START_TIMEOUT_SECONDS = float(os.getenv('MLIT_STREAM_START_TIMEOUT_SECONDS', 30.0))
+
+
+class TileStreamAbortedError(Exception):
+    """ストリーミング中継が完了しなかったことを待機中のリクエストに通知する例外"""
+
+
+@dataclass
+class TileStream:
+    """
+    上流のレスポンスをバッファリングせずに中継するためのストリーム
+    本文を最後まで読んだかどうかにかかわらず、使い終わったら必ずacloseを呼ぶこと
+    """
+    media_type: str
+    content_encoding: Optional[str]
+    chunks: AsyncIterator[bytes]
+    # 中継を終了する（上流のレスポンスを閉じ、完了していなければ待機中のリクエストに中断を通知する）
+    aclose: Callable[[], Awaitable[None]]
+
+
+def decode_tile_content(tile: CachedTile) -> bytes:
+    """圧縮されたまま保持しているタイルを展開して返す"""
+    encoding = (tile.content_encoding or "identity").lower()
+    if encoding == "gzip":
+        return gzip.decompress(tile.content)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(tile.content)
+        except zlib.error:
+            return zlib.decompress(tile.content, -zlib.MAX_WBITS)
+    return tile.content
+
+
+def raise_for_mlit_status(response: httpx.Response):
+    """
+    国土数値情報APIのレスポンスのステータスコードを検査する関数
+
+    Raises:
+        MLITUnauthorizedError: 認証エラーの場合
+        MLITBadRequestError: リクエストが不正な場合
+        MLITNotFoundError: データが見つからない場合
+        MLITServerError: サーバーエラーの場合
+    """
+    if response.status_code == 401:
+        raise MLITUnauthorizedError()
+    elif response.status_code == 400:
+        raise MLITBadRequestError(f"リクエストパラメータが不正です: {response.text}")
+    elif response.status_code == 404:
+        raise MLITNotFoundError()
+    elif response.status_code >= 400:
+        raise MLITServerError()
+
 
 class MLITAPIClient:
+    """国土数値情報APIへの全リクエストで共有する非同期クライアント"""
     def __init__(self):
-        self.session = requests.Session()
+        self._client: Optional[httpx.AsyncClient] = None
+        # 上流へ問い合わせ中のタイル（同じキーのリクエストはこの結果を共有する）
+        self._in_flight: Dict[TileKey, asyncio.Future] = {}
+        # 取得中のタイルの結果を待っているリクエストの数
+        self._followers: Dict[TileKey, int] = {}
 
-    def fetch_stations(self, z: int, x: int, y: int):
-        """国土数値情報APIから駅データを取得"""
-        url = f"{MLIT_API_BASE_URL}/XKT015"
-        params = {
-            "response_format": "geojson",
-            "z": z,
-            "x": x,
-            "y": y
-        }
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=MLIT_API_BASE_URL,
+            http2=MLIT_HTTP2,
+            # 圧縮されたまま中継・キャッシュしても標準ライブラリで展開できる形式に限定する
+            headers={"Accept-Encoding": "gzip, deflate"},
+            limits=httpx.Limits(
+                max_connections=MLIT_MAX_CONNECTIONS,
+                max_keepalive_connections=MLIT_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=MLIT_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            timeout=httpx.Timeout(MLIT_TIMEOUT_SECONDS, connect=MLIT_CONNECT_TIMEOUT_SECONDS)
+        )
+
+    async def start(self):
+        """アプリケーション起動時にクライアントを作成する"""
+        if self._client is None:
+            self._client = self._create_client()
+            logger.info(
+                f"MLIT API client started: http2={MLIT_HTTP2}, "
+                f"max_connections={MLIT_MAX_CONNECTIONS}, max_keepalive={MLIT_MAX_KEEPALIVE_CONNECTIONS}"
+            )
+
+    async def close(self):
+        """アプリケーション終了時にコネクションプールを閉じる"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # lifespan外（バッチ処理など）から利用された場合は遅延作成する
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _headers(self, api: str) -> dict:
         if not MLIT_API_KEY:
+            if api in MLIT_KEY_OPTIONAL_APIS:
+                return {}
             raise MLITUnauthorizedError()
+        return {"Ocp-Apim-Subscription-Key": MLIT_API_KEY}
 
-        headers = {
-            "Ocp-Apim-Subscription-Key": MLIT_API_KEY
-        }
+    async def get(
+        self, api: str, params: dict, timeout: Optional[float] = None, stream: bool = False
+    ) -> httpx.Response:
+        """
+        国土数値情報APIにGETリクエストを送信する
+
+        Args:
+            api (str): APIの識別子（例: XKT015）
+            params (dict): クエリパラメータ
+            timeout (float, optional): このリクエストのタイムアウト（秒）
+            stream (bool): Trueの場合は本文を読み込まずにレスポンスを返す（呼び出し側で閉じること）
 
+        Raises:
+            MLITUnauthorizedError: APIキーが設定されていない（MLIT_KEY_OPTIONAL_APISを除く）、または認証エラーの場合
+            MLITGatewayTimeoutError: タイムアウトした場合
+            MLITServerError: 通信エラーやサーバーエラーの場合
+        """
+        request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        request = self.client.build_request(
+            "GET", f"/{api}", params=params, headers=self._headers(api), timeout=request_timeout
+        )
         try:
-            response = self.session.get(url, params=params, headers=headers)
-
-            # エラーハンドリング
-            if response.status_code == 401:
-                raise MLITUnauthorizedError()
-            elif response.status_code == 400:
-                raise MLITBadRequestError(f"リクエストパラメータが不正です: {response.text}")
-            elif response.status_code == 404:
-                raise MLITNotFoundError()
-            elif response.status_code >= 500:
-                raise MLITServerError()
-
-            response.raise_for_status()
-            return response.json()
-
-        except requests.RequestException as e:
+            response = await self.client.send(request, stream=stream)
+        except httpx.TimeoutException:
+            logger.error(f"Timeout when requesting MLIT API: {api} {params}")
+            raise MLITGatewayTimeoutError()
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error when requesting MLIT API: {api} {params} - {e}")
             raise MLITServerError()
 
+        if response.status_code != 200:
+            if stream:
+                await response.aread()
+                await response.aclose()
+            logger.error(f"MLIT API error response: {response.status_code} - {response.text}")
+        raise_for_mlit_status(response)
+        return response
+
+    async def fetch_tile(self, key: TileKey, timeout: Optional[float] = None) -> CachedTile:
+        """
+        タイルキャッシュを経由してタイルを取得する
+        同じタイルへの同時リクエストは1回の上流リクエストに集約する
+        """
+        cached_tile = await get_tile_cache().aget(key)
+        if cached_tile is not None:
+            return cached_tile
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            return await self._await_in_flight(key, in_flight, timeout)
+
+        task = asyncio.ensure_future(self._fetch_tile_from_upstream(key, timeout))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda done_task: self._on_fetch_done(key, done_task))
+
+        # 呼び出し元がキャンセルされても、他の待機者のために上流リクエストは継続する
+        return await asyncio.shield(task)
+
+    async def stream_tile(
+        self, key: TileKey, timeout: Optional[float] = None, decode: bool = False
+    ) -> Union[CachedTile, TileStream]:
+        """
+        タイルを取得する。キャッシュ済み、または他のリクエストが取得中の場合はCachedTileを返し、
+        それ以外は上流のレスポンスをバッファリングせずに中継するTileStreamを返す
+
+        Args:
+            key (TileKey): タイルのキー
+            timeout (float, optional): このリクエストのタイムアウト（秒）
+            decode (bool): Trueの場合は上流の圧縮を展開して中継する
+        """
+        cached_tile = await get_tile_cache().aget(key)
+        if cached_tile is not None:
+            return cached_tile
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            return await self._await_in_flight(key, in_flight, timeout)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await self.get(key.api, self._tile_params(key), timeout=timeout, stream=True)
+        except Exception as e:
+            self._finish_in_flight(key, future, exception=e)
+            raise
+        except BaseException:
+            self._finish_in_flight(key, future, exception=TileStreamAbortedError(key.to_string()))
+            raise
+
+        media_type = response.headers.get("content-type", "application/octet-stream")
+        content_encoding = None if decode else response.headers.get("content-encoding")
+        if decode:
+            chunks = response.aiter_bytes(chunk_size=MLIT_STREAM_CHUNK_BYTES)
+        else:
+            chunks = response.aiter_raw(chunk_size=MLIT_STREAM_CHUNK_BYTES)
+        relay = _TileRelay(self, key, future, response, chunks, media_type, content_encoding)
+        return TileStream(
+            media_type=media_type,
+            content_encoding=content_encoding,
+            chunks=relay.chunks,
+            aclose=relay.aclose
+        )
+
+    async def _await_in_flight(
+        self, key: TileKey, in_flight: asyncio.Future, timeout: Optional[float]
+    ) -> CachedTile:
+        logger.debug(f"Coalesced MLIT tile request: {key.to_string()}")
+        wait_seconds = timeout if timeout is not None else MLIT_TIMEOUT_SECONDS
+        self._followers[key] = self._followers.get(key, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(in_flight), wait_seconds)
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout when waiting for in-flight MLIT tile: {key.to_string()}")
+            raise MLITGatewayTimeoutError()
+        except TileStreamAbortedError:
+            # 中継中のリクエストが完了しなかった場合は改めて取得する
+            return await self.fetch_tile(key, timeout)
+        finally:
+            self._followers[key] -= 1
+            if not self._followers[key]:
+                self._followers.pop(key)
+
+    def _on_fetch_done(self, key: TileKey, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            self._in_flight.pop(key)
+        # 待機者が全てキャンセルされた場合に未回収の例外がログに出ないようにする
+        if not task.cancelled():
+            task.exception()
+
+    def _detach_in_flight(self, key: TileKey, future: asyncio.Future):
+        """以降のリクエストがこの取得を待たないようにする"""
+        if self._in_flight.get(key) is future:
+            self._in_flight.pop(key)
+
+    def _finish_in_flight(
+        self,
+        key: TileKey,
+        future: asyncio.Future,
+        result: Optional[CachedTile] = None,
+        exception: Optional[Exception] = None
+    ):
+        self._detach_in_flight(key, future)
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+            future.exception()
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def _tile_params(key: TileKey) -> dict:
+        params = {
+            "response_format": key.response_format,
+            "z": key.z,
+            "x": key.x,
+            "y": key.y
+        }
+        if key.administrative_area_code:
+            params["administrativeAreaCode"] = key.administrative_area_code
+        return params
+
+    async def _fetch_tile_from_upstream(self, key: TileKey, timeout: Optional[float]) -> CachedTile:
+        response = await self.get(key.api, self._tile_params(key), timeout=timeout)
+        media_type = response.headers.get("content-type", "application/octet-stream")
+        return await get_tile_cache().aset(key, response.content, media_type)
+
+    async def fetch_stations(self, z: int, x: int, y: int, timeout: Optional[float] = None) -> dict:
+        """国土数値情報API（XKT015）から駅データを取得"""
+        tile = await self.fetch_tile(TileKey(api="XKT015", z=z, x=x, y=y, response_format="geojson"), timeout=timeout)
+        return json.loads(decode_tile_content(tile))
+
+class _TileRelay:
+    """
+    上流のレスポンスを中継し、終了時に取得中のタイルの待機者へ結果を通知する
+    本文が読まれずに終わった場合（クライアントの切断など）もacloseで、
+    読み始められないまま放置された場合もMLIT_STREAM_START_TIMEOUT_SECONDS後に、上流のレスポンスを閉じる
+    """
+    def __init__(
+        self,
+        client: MLITAPIClient,
+        key: TileKey,
+        future: asyncio.Future,
+        response: httpx.Response,
+        chunks: AsyncIterator[bytes],
+        media_type: str,
+        content_encoding: Optional[str]
+    ):
+        self._client = client
+        self._key = key
+        self._future = future
+        self._response = response
+        self._source = chunks
+        self._media_type = media_type
+        self._content_encoding = content_encoding
+        self._started = False
+        self._closed = False
+        self._start_timer = asyncio.get_running_loop().call_later(
+            MLIT_STREAM_START_TIMEOUT_SECONDS, self._on_start_timeout
+        )
+        self.chunks = self._relay()
+
+    async def _relay(self) -> AsyncIterator[bytes]:
+        self._started = True
+        self._start_timer.cancel()
+        # 中継しながら、キャッシュ保存と待機中のリクエストへの共有のために本文を保持する
+        buffer: Optional[bytearray] = bytearray()
+        cacheable = True
+        completed = False
+        try:
+            async for chunk in self._source:
+                if buffer is not None:
+                    buffer.extend(chunk)
+                    if cacheable and len(buffer) > MLIT_STREAM_CACHE_MAX_BYTES:
+                        cacheable = False
+                        if not self._client._followers.get(self._key):
+                            # 待機中のリクエストがなければ本文を保持せず、以降のリクエストは個別に取得させる
+                            buffer = None
+                            self._client._detach_in_flight(self._key, self._future)
+                yield chunk
+            completed = True
+        finally:
+            await self._response.aclose()
+            if completed and buffer is not None:
+                if cacheable:
+                    tile = await get_tile_cache().aset(
+                        self._key, bytes(buffer), self._media_type, self._content_encoding
+                    )
+                else:
+                    # 上限を超えたタイルはキャッシュせず、待機中のリクエストにだけ返す
+                    tile = CachedTile(
+                        content=bytes(buffer),
+                        media_type=self._media_type,
+                        stored_at=time.time(),
+                        content_encoding=self._content_encoding
+                    )
+                self._client._finish_in_flight(self._key, self._future, result=tile)
+            else:
+                self._abort()
+
+    async def aclose(self):
+        """中継を終了する（何度呼んでもよい）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._start_timer.cancel()
+        # 中継の途中であればfinallyを実行させる（読み始める前なら何もしない）
+        try:
+            await self.chunks.aclose()
+        except RuntimeError:
+            # 別のタスクが中継中の場合は、そのタスクのfinallyに任せる
+            pass
+        await self._response.aclose()
+        self._abort()
+
+    def _abort(self):
+        # 既に結果を通知済みの場合は何もしない
+        self._client._finish_in_flight(self._key, self._future, exception=TileStreamAbortedError(self._key.to_string()))
+
+    def _on_start_timeout(self):
+        if not self._started and not self._closed:
+            logger.warning(f"MLIT tile stream was not consumed, closing upstream response: {self._key.to_string()}")
+            asyncio.ensure_future(self.aclose())
+
 # シングルトンインスタンスを作成
 mlit_api_client = MLITAPIClient()
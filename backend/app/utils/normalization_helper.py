@@ -2,6 +2,9 @@ import pandas as pd
 import logging
 import mojimoji
 import os
+import threading
+
+from .columnar_store import file_fingerprint, read_records
 
 # ロギングの基本設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -31,6 +34,9 @@ LINE_MAPPING_TABLE = {
     "JR山手線": "山手線", "JR京浜東北線": "京浜東北線", "JR中央線快速": "中央線", "中央本線": "中央線", "丸ノ内線(方南町支線)": "丸ノ内線",
 }
 
+# 比較・結合に使うキー
+COMMON_KEYS = ['company', 'line', 'station']
+
 def normalize_string(text: str) -> str:
     if not isinstance(text, str): return ""
     text = mojimoji.zen_to_han(text, kana=False)
@@ -48,7 +54,8 @@ def apply_normalization_mapping(df: pd.DataFrame, company_map: dict = None, line
 
 def preprocess_data(data_path: str, keys: list) -> pd.DataFrame:
     try:
-        df_orig = pd.read_json(data_path)
+        # 最新の列指向のストアがあればそれを読み込む（pd.read_jsonと同じ結果になる）
+        df_orig = read_records(data_path)
         logger.info(f"【読込】 {data_path} -> {len(df_orig)}件")
     except Exception as e:
         logger.error(f"ファイルの読み込みに失敗しました: {data_path} - {e}")
@@ -63,6 +70,69 @@ def preprocess_data(data_path: str, keys: list) -> pd.DataFrame:
         df_unique[f'norm_{key}'] = df_unique[key].apply(normalize_string)
     return df_unique
 
+class NormalizationContext:
+    """
+    2つのデータ（main / lookup）を一度だけ読込・重複除去・正規化し、比較ファイルの生成とデータ結合で共有する
+    保持するDataFrameは複数の処理で共有するため、変更しないこと
+    """
+    def __init__(self, main_data_path: str, lookup_data_path: str, keys: list = COMMON_KEYS):
+        self.main_data_path = main_data_path
+        self.lookup_data_path = lookup_data_path
+        self.keys = list(keys)
+        self.df_main = preprocess_data(main_data_path, self.keys)
+        self.df_lookup = preprocess_data(lookup_data_path, self.keys)
+        self._normalized = {}
+        self._lock = threading.Lock()
+
+    @property
+    def empty(self) -> bool:
+        """どちらかのデータの読込・前処理に失敗したか"""
+        return self.df_main.empty or self.df_lookup.empty
+
+    def normalized(self, map_lines: bool = False) -> tuple:
+        """
+        正規化テーブルを適用した (main, lookup) を返す（結果はキャッシュする）
+
+        Args:
+            map_lines: Trueの場合は会社名に加えて路線名の正規化テーブルも適用する
+        """
+        with self._lock:
+            if map_lines not in self._normalized:
+                line_map = LINE_MAPPING_TABLE if map_lines else None
+                self._normalized[map_lines] = (
+                    apply_normalization_mapping(self.df_main, company_map=COMPANY_MAPPING_TABLE, line_map=line_map),
+                    apply_normalization_mapping(self.df_lookup, company_map=COMPANY_MAPPING_TABLE, line_map=line_map),
+                )
+            return self._normalized[map_lines]
+
+# 入力ファイルの組み合わせごとの最新のコンテキスト {(main, lookup, keys): (ファイルのフィンガープリント, コンテキスト)}
+_context_cache = {}
+_context_cache_lock = threading.Lock()
+
+def get_normalization_context(main_data_path: str, lookup_data_path: str, keys: list = COMMON_KEYS) -> NormalizationContext:
+    """
+    正規化コンテキストを返す
+    入力ファイルが前回から変わっていなければ（サイズと更新時刻が同じなら）前回のコンテキストを再利用する
+    """
+    cache_key = (os.path.abspath(main_data_path), os.path.abspath(lookup_data_path), tuple(keys))
+    try:
+        fingerprint = (file_fingerprint(main_data_path), file_fingerprint(lookup_data_path))
+    except OSError:
+        # ファイルがない場合はキャッシュせず、preprocess_dataでエラーを記録する
+        return NormalizationContext(main_data_path, lookup_data_path, keys)
+
+    with _context_cache_lock:
+        cached = _context_cache.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            logger.info(f"【キャッシュ】 {main_data_path}, {lookup_data_path} の前処理済みデータを再利用します。")
+            return cached[1]
+
+        context = NormalizationContext(main_data_path, lookup_data_path, keys)
+        # 読込に失敗した結果はキャッシュしない
+        if not context.empty:
+            _context_cache[cache_key] = (fingerprint, context)
+        return context
+
 def _write_comparison_files(main_only: list, lookup_only: list, prefix: str, output_dir: str):
     os.makedirs(output_dir, exist_ok=True)
     main_only_sorted = sorted([str(i) for i in main_only])
@@ -77,30 +147,24 @@ def _write_comparison_files(main_only: list, lookup_only: list, prefix: str, out
     df_comparison.to_csv(os.path.join(output_dir, f'{prefix}_comparison.csv'), index=False, encoding='utf-8-sig')
     logger.info(f"「{prefix}」の比較CSVファイルを '{output_dir}' に保存しました。")
 
-def generate_company_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str):
+def generate_company_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str, context: NormalizationContext = None):
     logger.info("会社名の比較ファイル生成を開始します。")
-    common_keys = ['company', 'line', 'station']
-    df_main = preprocess_data(main_data_path, common_keys)
-    df_lookup = preprocess_data(lookup_data_path, common_keys)
-    if df_main.empty or df_lookup.empty: return
+    context = context or get_normalization_context(main_data_path, lookup_data_path)
+    if context.empty: return
 
-    df_main_norm = apply_normalization_mapping(df_main, company_map=COMPANY_MAPPING_TABLE)
-    df_lookup_norm = apply_normalization_mapping(df_lookup, company_map=COMPANY_MAPPING_TABLE)
+    df_main_norm, df_lookup_norm = context.normalized()
 
     main_set = set(df_main_norm['norm_company'].dropna().unique())
     lookup_set = set(df_lookup_norm['norm_company'].dropna().unique())
     _write_comparison_files(list(main_set - lookup_set), list(lookup_set - main_set), 'company_normalized', output_dir)
     logger.info(f"会社名の比較ファイルが '{output_dir}' に正常に生成されました。")
 
-def generate_line_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str):
+def generate_line_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str, context: NormalizationContext = None):
     logger.info("路線名の比較ファイル生成を開始します。")
-    common_keys = ['company', 'line', 'station']
-    df_main = preprocess_data(main_data_path, common_keys)
-    df_lookup = preprocess_data(lookup_data_path, common_keys)
-    if df_main.empty or df_lookup.empty: return
+    context = context or get_normalization_context(main_data_path, lookup_data_path)
+    if context.empty: return
 
-    df_main_norm = apply_normalization_mapping(df_main, company_map=COMPANY_MAPPING_TABLE)
-    df_lookup_norm = apply_normalization_mapping(df_lookup, company_map=COMPANY_MAPPING_TABLE)
+    df_main_norm, df_lookup_norm = context.normalized()
 
     common_companies = set(df_main_norm['norm_company'].dropna().unique()).intersection(set(df_lookup_norm['norm_company'].dropna().unique()))
     
@@ -110,15 +174,12 @@ def generate_line_comparison_files(main_data_path: str, lookup_data_path: str, o
     _write_comparison_files(list(main_tuples - lookup_tuples), list(lookup_tuples - main_tuples), 'line_in_common_company', output_dir)
     logger.info(f"路線名の比較ファイルが '{output_dir}' に正常に生成されました。")
 
-def generate_station_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str):
+def generate_station_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str, context: NormalizationContext = None):
     logger.info("駅名の比較ファイル生成を開始します。")
-    common_keys = ['company', 'line', 'station']
-    df_main = preprocess_data(main_data_path, common_keys)
-    df_lookup = preprocess_data(lookup_data_path, common_keys)
-    if df_main.empty or df_lookup.empty: return
+    context = context or get_normalization_context(main_data_path, lookup_data_path)
+    if context.empty: return
 
-    df_main_norm = apply_normalization_mapping(df_main, company_map=COMPANY_MAPPING_TABLE, line_map=LINE_MAPPING_TABLE)
-    df_lookup_norm = apply_normalization_mapping(df_lookup, company_map=COMPANY_MAPPING_TABLE, line_map=LINE_MAPPING_TABLE)
+    df_main_norm, df_lookup_norm = context.normalized(map_lines=True)
 
     merge_keys = ['norm_company', 'norm_line']
     merged = pd.merge(df_main_norm[merge_keys].drop_duplicates(), df_lookup_norm[merge_keys].drop_duplicates(), on=merge_keys, how='inner')
@@ -132,10 +193,13 @@ def generate_station_comparison_files(main_data_path: str, lookup_data_path: str
 def generate_all_comparison_files(main_data_path: str, lookup_data_path: str, output_dir: str):
     logger.info("全てのレベルの比較ファイル生成を開始します。")
     
+    # 読込・重複除去・正規化は一度だけ行い、各レベルの比較で共有する
+    context = get_normalization_context(main_data_path, lookup_data_path)
+
     # 各レベルの比較関数を呼び出す (出力先は同じディレクトリ)
-    generate_company_comparison_files(main_data_path, lookup_data_path, output_dir)
-    generate_line_comparison_files(main_data_path, lookup_data_path, output_dir)
-    generate_station_comparison_files(main_data_path, lookup_data_path, output_dir)
+    generate_company_comparison_files(main_data_path, lookup_data_path, output_dir, context=context)
+    generate_line_comparison_files(main_data_path, lookup_data_path, output_dir, context=context)
+    generate_station_comparison_files(main_data_path, lookup_data_path, output_dir, context=context)
     
     logger.info(f"全ての比較ファイルが '{output_dir}' に正常に生成されました。")
 
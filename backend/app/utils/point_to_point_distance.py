@@ -1,4 +1,9 @@
 import math
+import numpy as np
+from numpy.typing import ArrayLike
+
+# 距離行列を分割して計算する際の1ブロックあたりの要素数の目安
+DISTANCE_MATRIX_CHUNK_ELEMENTS = 4_000_000
 
 def calculate_distance(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
     """2点間の距離をキロメートルで計算（ヒュベニの公式）"""
@@ -18,3 +23,54 @@ def calculate_distance(lon1: float, lat1: float, lon2: float, lat2: float) -> fl
     a = (math.sin(dlat / 2))**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * (math.sin(dlon / 2))**2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return radius * c
+
+
+def calculate_distances(lon: ArrayLike, lat: ArrayLike, lons: ArrayLike, lats: ArrayLike) -> np.ndarray:
+    """
+    1点から複数点への距離をキロメートルでまとめて計算（calculate_distanceの配列版）
+    lon, lat に lons, lats と同じ長さの配列を渡すと、要素ごとの2点間の距離を計算する
+    """
+    radius = 6371  # 地球の半径(km)
+
+    lat1_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    lon1_rad = np.radians(np.asarray(lon, dtype=np.float64))
+    lat2_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2_rad = np.radians(np.asarray(lons, dtype=np.float64))
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return radius * c
+
+def calculate_distance_matrix(
+    lons1: ArrayLike, lats1: ArrayLike, lons2: ArrayLike, lats2: ArrayLike,
+    chunk_elements: int = DISTANCE_MATRIX_CHUNK_ELEMENTS
+) -> np.ndarray:
+    """
+    N点×M点の距離行列をキロメートルで計算
+    中間配列のメモリを抑えるため、行方向に分割して計算する
+    """
+    radius = 6371  # 地球の半径(km)
+
+    lat1_rad = np.radians(np.asarray(lats1, dtype=np.float64))[:, np.newaxis]
+    lon1_rad = np.radians(np.asarray(lons1, dtype=np.float64))[:, np.newaxis]
+    lat2_rad = np.radians(np.asarray(lats2, dtype=np.float64))[np.newaxis, :]
+    lon2_rad = np.radians(np.asarray(lons2, dtype=np.float64))[np.newaxis, :]
+    cos_lat2 = np.cos(lat2_rad)
+
+    n, m = lat1_rad.shape[0], lat2_rad.shape[1]
+    result = np.empty((n, m), dtype=np.float64)
+    rows_per_chunk = max(1, chunk_elements // max(1, m))
+
+    for start in range(0, n, rows_per_chunk):
+        end = min(n, start + rows_per_chunk)
+        dlat = lat2_rad - lat1_rad[start:end]
+        dlon = lon2_rad - lon1_rad[start:end]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1_rad[start:end]) * cos_lat2 * np.sin(dlon / 2) ** 2
+        a = np.clip(a, 0.0, 1.0)
+        result[start:end] = radius * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return result
@@ -0,0 +1,92 @@
+"""
+レートリミッターモジュール
+- asyncio用のトークンバケット（毎秒のリクエスト数 + バースト）
+- 接続先ホストごとにトークンバケットを持つレートリミッター
+- Retry-Afterヘッダーの解析
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を待機秒数に変換する"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッター"""
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 1秒あたりに補充されるトークン数（リクエスト数/秒）
+            burst: 貯められるトークンの最大数
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def pause(self, seconds: float):
+        """指定秒数の間、トークンの払い出しを止める（429のRetry-Afterなどに合わせる）"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """トークンを1つ消費する（不足している場合は補充されるまで待機）"""
+        async with self._lock:
+            while (wait := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class HostRateLimiter:
+    """接続先ホストごとにトークンバケットを割り当てるレートリミッター"""
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: ホストごとの1秒あたりのリクエスト数
+            burst: ホストごとのバースト数
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """URLのホストに対応するトークンバケットを返す"""
+        host = urlsplit(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(rate=self.rate, burst=self.burst)
+        return bucket
+
+    async def acquire(self, url: str):
+        """URLのホストのトークンを1つ消費する"""
+        await self.bucket_for(url).acquire()
@@ -0,0 +1,32 @@
+"""
+家賃相場スクレイピングのデータモデルモジュール
+"""
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class Prefecture:
+    """都道府県情報を保持するデータクラス"""
+    name: str
+    url: str
+
+@dataclass(frozen=True)
+class Line:
+    """路線情報を保持するデータクラス"""
+    name: str
+    url: str
+
+@dataclass(frozen=True)
+class StationRentInfo:
+    """収集した生の駅家賃情報を保持するデータクラス"""
+    station: str
+    rent: str
+
+@dataclass
+class StationData:
+    """処理済みの駅家賃データを保持するデータクラス"""
+    prefecture: str
+    railway_company: str
+    line_name: str
+    station_name: str
+    rent: float
+    lastupdate: str | None = None
@@ -1,14 +1,29 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import asyncio
+import charset_normalizer
+import hashlib
+import httpx
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import json
 from datetime import datetime
 import os
 import time
 import random
 import logging
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
+from typing import Callable, Iterable, Iterator
+from .columnar_store import write_columnar_companion
+from .html_archive import ArchivedPage, HtmlArchive
+from .html_extractors import SUUMO_HTML_EXTRACTOR, HtmlExtractor, get_html_extractor
+from .rate_limiter import HostRateLimiter, parse_retry_after
+from .rent_models import Line, Prefecture, StationData, StationRentInfo
+from .scrape_metrics import ScrapeMetrics, scrape_metrics
+from .scrape_shards import ShardSpec, merge_shard_files, parse_shard_spec, shard_file_path, shard_suffixed_path
+from .scrape_state import PageState, ScrapeStateStore
+from .station_data_writer import SortedSpool, write_json_array_atomic, write_jsonl_atomic
+from .url_frontier import UrlFrontier
 
 # Configuration classes moved from config.py
 class PathConfig:
@@ -17,6 +32,14 @@ class PathConfig:
     OUTPUT_FILE = 'data/processed/rent_marketprice.json'
     # 都道府県コードのマッピングファイルのパス
     PREFECTURE_CODE_MAP_FILE = 'backend/app/const/prefecture_codes.json'
+    # URLごとの取得状態（ETag・ハッシュ・解析結果）と再開用チェックポイントを保存するファイルのパス
+    SCRAPE_STATE_FILE = 'data/cache/scrape_state.sqlite3'
+    # 取得したHTMLを保存するアーカイブのディレクトリ（--archive 指定時の既定値）
+    HTML_ARCHIVE_DIR = 'data/cache/html_archive'
+    # 収集中の駅データを並べ替えて溜めておく一時領域
+    SPOOL_DIR = 'data/cache/spool'
+    # シャードごとの出力（--shard 指定時）を保存するディレクトリ
+    SHARD_DIR = 'data/cache/shards'
 
 class ScrapingConfig:
     """スクレイピン対象サイトやヘッダーに関する設定"""
@@ -34,165 +57,324 @@ class ScrapingConfig:
 class RequestConfig:
     """リクエストのタイミングやリトライに関する設定"""
     MAX_RETRIES = 3                 # 最大リトライ回数
-    RETRY_DELAY_SECONDS = 5         # リトライ時の待機時間（秒）
-    REQUEST_MIN_DELAY = 1.0         # 各リクエスト前の最小待機時間（秒）
-    REQUEST_MAX_DELAY = 3.0         # 各リクエスト前の最大待機時間（秒）
+    RETRY_BASE_DELAY_SECONDS = 2.0  # リトライ時の待機時間の基準値（秒、試行ごとに倍増）
+    RETRY_MAX_DELAY_SECONDS = 60.0  # リトライ時の待機時間の上限（秒）
+    RETRY_AFTER_MAX_SECONDS = 300.0 # Retry-Afterヘッダーに従って待機する時間の上限（秒）
+    REQUESTS_PER_SECOND_PER_HOST = 3.0  # ホストごとの1秒あたりのリクエスト数
+    BURST_PER_HOST = 3              # ホストごとのバースト数
     REQUEST_TIMEOUT_SECONDS = 15    # リクエストのタイムアウト時間（秒）
 
 class ParallelConfig:
     """並列処理に関する設定"""
-    MAX_WORKERS = 10                # 並列処理のワーカースレッド数 
+    MAX_WORKERS = 10                # 同時に実行するリクエスト数の上限
+    FRONTIER_QUEUE_SIZE = 20        # 路線URLキューの上限（ワーカーが追いつくまで投入を待たせる）
 
 # logging の基本設定
 # INFOレベル以上のログを出力し、タイムスタンプ、ログレベル、メッセージの形式で表示
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- データモデル定義 ---
-@dataclass(frozen=True)
-class Prefecture:
-    """都道府県情報を保持するデータクラス"""
-    name: str
-    url: str
-
-@dataclass(frozen=True)
-class Line:
-    """路線情報を保持するデータクラス"""
-    name: str
-    url: str
-
-@dataclass(frozen=True)
-class StationRentInfo:
-    """収集した生の駅家賃情報を保持するデータクラス"""
-    station: str
-    rent: str
-
-@dataclass
-class StationData:
-    """処理済みの駅家賃データを保持するデータクラス"""
-    prefecture: str
-    railway_company: str
-    line_name: str
-    station_name: str
-    rent: float
-    lastupdate: str | None = None
+def retry_delay_seconds(attempt: int, retry_after: float | None = None) -> float:
+    """リトライまでの待機秒数を返す（Retry-Afterがあればそれに従い、なければ指数バックオフ + ジッター）"""
+    if retry_after is not None:
+        return min(retry_after, RequestConfig.RETRY_AFTER_MAX_SECONDS)
+    delay = RequestConfig.RETRY_BASE_DELAY_SECONDS * (2 ** attempt)
+    return min(RequestConfig.RETRY_MAX_DELAY_SECONDS, delay + random.uniform(0, RequestConfig.RETRY_BASE_DELAY_SECONDS))
+
+
+def detect_encoding(content: bytes) -> str:
+    """ページ本文から文字コードを推定する（requestsの apparent_encoding と同じ charset_normalizer による推定）"""
+    return charset_normalizer.detect(content)["encoding"] or "utf-8"
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """リトライ対象のHTTPステータスかを返す（429と5xx）"""
+    return status_code == 429 or status_code >= 500
 
 
 class SuumoScraper:
     """SUUMOのウェブサイトから家賃相場データを取得するためのスクレイパークラス"""
-    def __init__(self, headers: dict):
+    def __init__(
+        self,
+        headers: dict,
+        client: httpx.AsyncClient | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        state_store: ScrapeStateStore | None = None,
+        extractor: HtmlExtractor | None = None,
+        archive: HtmlArchive | None = None,
+        metrics: ScrapeMetrics | None = None
+    ):
+        """
+        Args:
+            headers: 全リクエスト共通のヘッダー
+            client: 使用するHTTPクライアント（省略時はコネクションプール付きのクライアントを作成）
+            rate_limiter: ホストごとのレートリミッター（省略時はRequestConfigの設定で作成）
+            state_store: URLごとの取得状態ストア（指定時は変更のないページの取得・解析を省く）
+            extractor: HTML抽出バックエンド（省略時は SUUMO_HTML_EXTRACTOR の設定で作成）
+            archive: 取得したページ本文を保存するHTMLアーカイブ
+            metrics: リクエスト・解析の計測値の記録先（省略時はこのスクレイパー専用）
+        """
         self.headers = headers
-
-    def make_request_with_retry(self, url: str, error_context: str) -> requests.Response | None:
-        """指定されたURLに対してリトライ付きのGETリクエストを送信する"""
+        self.state_store = state_store
+        self.extractor = extractor or get_html_extractor()
+        self.archive = archive
+        # ページ取得結果の内訳（parsed: 解析した / not_modified: 304 / unchanged: 本文のハッシュが一致 / resumed: 再開時に取得を省略）
+        self.page_stats = {"parsed": 0, "not_modified": 0, "unchanged": 0, "resumed": 0}
+        self.metrics = metrics or ScrapeMetrics()
+        self._client = client
+        self._owns_client = client is None
+        self.rate_limiter = rate_limiter or HostRateLimiter(
+            rate=RequestConfig.REQUESTS_PER_SECOND_PER_HOST, burst=RequestConfig.BURST_PER_HOST
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """全リクエストで共有するHTTPクライアント（Keep-Aliveで接続を再利用する）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=RequestConfig.REQUEST_TIMEOUT_SECONDS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=ParallelConfig.MAX_WORKERS,
+                    max_keepalive_connections=ParallelConfig.MAX_WORKERS
+                )
+            )
+        return self._client
+
+    async def close(self):
+        """自身で作成したHTTPクライアントを閉じる"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "SuumoScraper":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _record_page(self, page_kind: str, outcome: str):
+        """ページの取得結果をpage_statsと計測値に記録する"""
+        self.page_stats[outcome] += 1
+        self.metrics.record_page(page_kind, outcome)
+
+    async def make_request_with_retry(
+        self, url: str, error_context: str, extra_headers: dict | None = None, stage: str = "other"
+    ) -> httpx.Response | None:
+        """
+        指定されたURLに対してレート制限とリトライ付きのGETリクエストを送信する
+        条件付きリクエストのヘッダーを渡した場合は、304のレスポンスもそのまま返す
+
+        Args:
+            stage: 計測値を記録するステージ名（ページの種類）
+        """
         for attempt in range(RequestConfig.MAX_RETRIES):
-            time.sleep(random.uniform(RequestConfig.REQUEST_MIN_DELAY, RequestConfig.REQUEST_MAX_DELAY))
-            request_specific_headers = self.headers.copy()
+            wait_start = time.perf_counter()
+            await self.rate_limiter.acquire(url)
+            self.metrics.observe_throttle_wait(stage, time.perf_counter() - wait_start)
+            request_specific_headers = dict(extra_headers or {})
             if ScrapingConfig.USER_AGENTS:
                 request_specific_headers["User-Agent"] = random.choice(ScrapingConfig.USER_AGENTS)
-            
+
+            retry_after = None
+            request_start = time.perf_counter()
             try:
-                response = requests.get(url, headers=request_specific_headers, timeout=RequestConfig.REQUEST_TIMEOUT_SECONDS)
-                response.raise_for_status()
-                response.encoding = response.apparent_encoding
-                return response
-            except requests.RequestException as e:
-                logger.warning(f"❌ リクエストエラー ({error_context}, 試行 {attempt + 1}/{RequestConfig.MAX_RETRIES}): {e} ({url})")
-                if attempt + 1 == RequestConfig.MAX_RETRIES:
-                    logger.error(f"🚨 最大リトライ回数に達しました。{error_context} の取得に失敗しました: {url}")
+                response = await self.client.get(url, headers=request_specific_headers)
+                self.metrics.observe_request(
+                    stage, time.perf_counter() - request_start, response.status_code, response.num_bytes_downloaded
+                )
+                if response.is_success or response.status_code == 304:
+                    return response
+                if not is_retryable_status(response.status_code):
+                    logger.error(f"🚨 {error_context} の取得に失敗しました (HTTP {response.status_code}): {url}")
                     return None
-                time.sleep(RequestConfig.RETRY_DELAY_SECONDS)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429 and retry_after is not None:
+                    # 同じホストへの他のリクエストも含めて待機させる
+                    self.rate_limiter.bucket_for(url).pause(min(retry_after, RequestConfig.RETRY_AFTER_MAX_SECONDS))
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                self.metrics.observe_request(stage, time.perf_counter() - request_start, None)
+                error = e
+
+            logger.warning(f"❌ リクエストエラー ({error_context}, 試行 {attempt + 1}/{RequestConfig.MAX_RETRIES}): {error} ({url})")
+            if attempt + 1 == RequestConfig.MAX_RETRIES:
+                logger.error(f"🚨 最大リトライ回数に達しました。{error_context} の取得に失敗しました: {url}")
+                return None
+            delay = retry_delay_seconds(attempt, retry_after)
+            self.metrics.record_retry(stage, delay)
+            await asyncio.sleep(delay)
         return None
 
-    def get_prefecture_info_list(self, base_url: str) -> list[Prefecture]:
+    async def fetch_and_parse(self, url: str, error_context: str, page_kind: str, encode, decode):
+        """
+        ページを取得して解析する
+        状態ストアがある場合は、条件付きリクエストと本文のハッシュ比較で変更のないページの解析を省き、
+        現在の実行で確認済みのページは取得せずに前回の解析結果を返す
+        アーカイブがある場合は、取得したページ本文を全て保存する
+        （304や再開で本文を受け取らなかったページは、最後に保存した本文をこの取得の記録として追加する。
+          前回の本文がアーカイブにないページは、条件付きリクエストや再開を使わずに本文を取得する）
+
+        Args:
+            page_kind: ページの種類（html_extractors.PAGE_KIND_METHODSのキー）
+            encode: 解析結果をJSONに変換できる値にする関数
+            decode: encodeの逆変換を行う関数
+
+        Returns:
+            解析結果（取得に失敗した場合はNone）
+        """
+        state: PageState | None = self.state_store.get(url) if self.state_store else None
+        archived_page: ArchivedPage | None = None
+        if state and self.archive:
+            archived_page = self.archive.latest_page(url)
+            if archived_page is None or archived_page.content_hash != state.content_hash:
+                archived_page, state = None, None
+
+        if state and self.state_store.is_checked_in_current_run(state):
+            if archived_page:
+                self.archive.relink(archived_page)
+            self._record_page(page_kind, "resumed")
+            return decode(json.loads(state.parse_result))
+
+        conditional_headers = {}
+        if state and state.etag:
+            conditional_headers["If-None-Match"] = state.etag
+        if state and state.last_modified:
+            conditional_headers["If-Modified-Since"] = state.last_modified
+
+        response = await self.make_request_with_retry(url, error_context, conditional_headers, stage=page_kind)
+        if response is None:
+            self.metrics.record_failure(page_kind)
+            return None
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 304:
+            if state is None:
+                logger.warning(f"⚠️ 前回の取得状態がないURLで304が返されました: {url}")
+                return None
+            if archived_page:
+                self.archive.relink(archived_page)
+            self.state_store.mark_checked(url, etag, last_modified)
+            self._record_page(page_kind, "not_modified")
+            return decode(json.loads(state.parse_result))
+
+        # Content-Typeのcharsetが省略・誤っているページもあるため、文字コードは本文から推定する
+        response.encoding = detect_encoding(response.content)
+        if self.archive:
+            self.archive.put(url, page_kind, response.content, response.encoding)
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if state and state.content_hash == content_hash:
+            self.state_store.mark_checked(url, etag, last_modified)
+            self._record_page(page_kind, "unchanged")
+            return decode(json.loads(state.parse_result))
+
+        parse_start = time.perf_counter()
+        result = self.extractor.extract(page_kind, response.text, url)
+        self.metrics.observe_parse(page_kind, time.perf_counter() - parse_start)
+        self._record_page(page_kind, "parsed")
+        if self.state_store:
+            self.state_store.save(
+                url, etag, last_modified, content_hash, json.dumps(encode(result), ensure_ascii=False)
+            )
+        return result
+
+    async def get_prefecture_info_list(self, base_url: str) -> list[Prefecture]:
         """都道府県名と路線一覧ページURLのリストを取得する"""
-        response = self.make_request_with_retry(base_url, "都道府県リスト取得")
-        if not response:
-            return []
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        prefecture_links = soup.find_all("a", class_="areamenu_detail-btn")
-
-        prefecture_info_list = []
-        for tag in prefecture_links:
-            href = tag.get("href")
-            name = tag.text.strip()
-            if href:
-                full_url = urljoin(base_url, href)
-                full_url = f"{full_url}ensen/" 
-                prefecture_info_list.append(Prefecture(name=name, url=full_url))
-                
-        return prefecture_info_list
-
-    def get_line_info_list(self, base_url: str) -> dict[str, list[Line]]:
+        result = await self.fetch_and_parse(
+            base_url, "都道府県リスト取得", "prefectures",
+            encode=lambda prefectures: [asdict(prefecture) for prefecture in prefectures],
+            decode=lambda items: [Prefecture(**item) for item in items]
+        )
+        return result if result is not None else []
+
+    async def get_line_info_list(self, base_url: str) -> dict[str, list[Line]]:
         """指定された都道府県の路線情報を取得する"""
-        response = self.make_request_with_retry(base_url, "路線リスト取得")
-        if not response:
-            return {}
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        search_table = soup.find("table", class_="searchtable")
-        if not search_table:
-            logger.info(f"💡 注意: 路線情報テーブル (searchtable) が見つかりませんでした ({base_url})")
-            return {} 
-
-        search_table_list = search_table.find_all("tr")
-        company_to_lines_map = {}
-
-        for railway_company_row in search_table_list:
-            railway_company_th = railway_company_row.find("th" , class_="searchtable-title")
-            if not railway_company_th:
-                continue
-            railway_company_name = railway_company_th.text.strip()
-            company_to_lines_map[railway_company_name] = []
-
-            for searchitem_td in railway_company_th.find_next_siblings("td"):
-                line_links = searchitem_td.find_all("a")
-                for link in line_links:
-                    href = link.get("href")
-                    line_name = link.text.strip()
-                    if href:
-                        full_url = urljoin(base_url, href)
-                        company_to_lines_map[railway_company_name].append(Line(name=line_name, url=full_url))
-                    else:
-                        logger.info(f"💡 注意: 路線リンクの href が見つかりませんでした: {line_name} ({base_url})")
-        
-        return company_to_lines_map
-    
-    def get_station_rent_list(self, line_url: str) -> list[StationRentInfo]:
+        result = await self.fetch_and_parse(
+            base_url, "路線リスト取得", "lines",
+            encode=lambda company_to_lines: {
+                company: [asdict(line) for line in lines] for company, lines in company_to_lines.items()
+            },
+            decode=lambda items: {
+                company: [Line(**line) for line in lines] for company, lines in items.items()
+            }
+        )
+        return result if result is not None else {}
+
+    async def get_station_rent_list(self, line_url: str) -> list[StationRentInfo]:
         """指定された路線の駅ごとの家賃データを取得する"""
-        response = self.make_request_with_retry(line_url, "駅家賃データ取得")
-        if not response:
-            return []
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        station_rows = soup.find_all("tr", class_="js-graph-data")
-        results = []
-
-        if not station_rows:
-            logger.info(f"💡 注意: 駅データ行 (js-graph-data) が見つかりませんでした ({line_url})")
-            return []
-
-        for row in station_rows:
-            first_td_tag = row.find("td")
-            station_name = first_td_tag.text.strip() if first_td_tag else "不明"
-            
-            price_tag_element = row.find("span", class_="graphpanel_matrix-td_graphinfo-strong")
-            price_text = price_tag_element.text.strip() if price_tag_element else "不明"
-            
-            results.append(StationRentInfo(station=station_name, rent=price_text))
-        
-        return results
+        result = await self.fetch_and_parse(
+            line_url, "駅家賃データ取得", "station_rents",
+            encode=lambda rent_list: [asdict(rent_info) for rent_info in rent_list],
+            decode=lambda items: [StationRentInfo(**item) for item in items]
+        )
+        return result if result is not None else []
+
+class ArchiveReplayScraper(SuumoScraper):
+    """HTMLアーカイブを解析済みの結果を返すスクレイパー（ネットワークには接続しない）"""
+    def __init__(self, parsed_pages: dict, metrics: ScrapeMetrics | None = None):
+        """
+        Args:
+            parsed_pages: {URL: 解析結果} の辞書
+            metrics: 計測値の記録先（SuumoScraperを参照）
+        """
+        super().__init__(headers={}, metrics=metrics)
+        self.parsed_pages = parsed_pages
+
+    async def fetch_and_parse(self, url: str, error_context: str, page_kind: str, encode, decode):
+        result = self.parsed_pages.get(url)
+        if result is None:
+            logger.warning(f"⚠️ アーカイブにページがありません ({error_context}): {url}")
+            return None
+        self._record_page(page_kind, "parsed")
+        return result
+
+async def _iter_completed(task_map: dict):
+    """タスクを完了した順に (タスク, 付随情報) として返す"""
+    pending = set(task_map)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task, task_map[task]
 
 class ScrapingOrchestrator:
     """スクレイピング処理全体を管理し、並列実行を制御するクラス"""
-    def __init__(self, scraper: SuumoScraper, max_workers: int):
+    def __init__(
+        self,
+        scraper: SuumoScraper,
+        max_workers: int,
+        queue_size: int = ParallelConfig.FRONTIER_QUEUE_SIZE,
+        shard: ShardSpec | None = None
+    ):
+        """
+        Args:
+            shard: 指定した場合、路線ページはこのシャードに属するものだけを取得する
+                   （都道府県一覧・路線一覧のページはシャードの振り分けに使うため全て取得する）
+        """
         self.scraper = scraper
         self.max_workers = max_workers
-
-    def execute(self, base_url: str) -> tuple[list[StationData], dict]:
-        """スクレイピング処理を実行し、収集したデータと統計情報を返す"""
-        prefectures = self.scraper.get_prefecture_info_list(base_url)
+        self.queue_size = queue_size
+        self.shard = shard
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def _limited(self, coro):
+        """同時実行数の上限を守ってコルーチンを実行する"""
+        async with self._semaphore:
+            return await coro
+
+    async def execute(
+        self, base_url: str, sink: Callable[[StationData], None] | None = None
+    ) -> tuple[list[StationData], dict]:
+        """
+        スクレイピング処理を実行し、収集したデータと統計情報を返す
+
+        Args:
+            sink: 駅データを1件ずつ受け取る関数。指定した場合は路線ごとに取得した時点で渡し、
+                  戻り値のリストには溜めない
+        """
+        prefectures = await self.scraper.get_prefecture_info_list(base_url)
         prefecture_total_count = len(prefectures)
 
         if not prefectures:
@@ -200,71 +382,109 @@ class ScrapingOrchestrator:
             stats = {"prefecture_total": 0, "processed_prefectures_with_lines": 0, "station_data_count": 0}
             return [], stats
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_station_data_result, processed_prefectures_with_lines = self._submit_line_tasks(executor, prefectures)
-            all_station_data = self._collect_station_data(future_to_station_data_result)
-        
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        line_frontier, processed_prefectures_with_lines = await self._build_line_frontier(prefectures)
+        line_url_total, line_url_unique = line_frontier.added_count, len(line_frontier)
+        if self.shard:
+            line_frontier = line_frontier.select_shard(self.shard.index, self.shard.count)
+            logger.info(f"🧩 シャード {self.shard}: 路線URL {line_url_unique}件中 {len(line_frontier)}件を担当します")
+        self.scraper.metrics.set_lines_total(len(line_frontier))
+        all_station_data = []
+        station_data_count = await self._collect_station_data(line_frontier, sink or all_station_data.append)
+
         stats = {
             "prefecture_total": prefecture_total_count,
             "processed_prefectures_with_lines": processed_prefectures_with_lines,
-            "station_data_count": len(all_station_data)
+            "line_url_total": line_url_total,
+            "line_url_unique": line_url_unique,
+            "line_url_in_shard": len(line_frontier),
+            "station_data_count": station_data_count
         }
         return all_station_data, stats
 
-    def _submit_line_tasks(self, executor: ThreadPoolExecutor, prefectures: list[Prefecture]) -> tuple[dict, int]:
-        future_to_lines_result = {
-            executor.submit(self.scraper.get_line_info_list, pref.url): pref
+    async def _build_line_frontier(self, prefectures: list[Prefecture]) -> tuple[UrlFrontier, int]:
+        """
+        全都道府県の路線一覧を取得し、路線URLのフロンティアを作成する
+        複数の都道府県にまたがる路線のURLは1つにまとめ、所有者として各都道府県を記録する
+        """
+        task_to_lines_result = {
+            asyncio.create_task(self._limited(self.scraper.get_line_info_list(pref.url))): pref
             for pref in prefectures
         }
 
-        future_to_station_data_result = {}
+        line_frontier: UrlFrontier[tuple[str, str, str]] = UrlFrontier()
         processed_prefectures_count = 0
 
-        for future in as_completed(future_to_lines_result):
-            prefecture = future_to_lines_result[future]
+        async for task, prefecture in _iter_completed(task_to_lines_result):
             try:
-                company_to_lines_map_result = future.result()
+                company_to_lines_map_result = task.result()
                 if company_to_lines_map_result:
                     processed_prefectures_count += 1
                     for railway_company, lines in company_to_lines_map_result.items():
                         for line in lines:
-                            future_to_station_data_result[executor.submit(self.scraper.get_station_rent_list, line.url)] = \
-                                (prefecture.name, railway_company, line.name, line.url)
+                            line_frontier.add(line.url, (prefecture.name, railway_company, line.name))
                 else:
                     logger.info(f"💡 注意: {prefecture.name} ({prefecture.url}) の路線一覧が空でした（データなしとして処理）。")
             except Exception as exc:
                 logger.error(f'{prefecture.name} ({prefecture.url}) の路線一覧取得中にエラーが発生しました: {exc}')
-        return future_to_station_data_result, processed_prefectures_count
 
-    def _collect_station_data(self, future_to_station_data_result: dict) -> list[StationData]:
-        all_station_data = []
-        for future in as_completed(future_to_station_data_result):
-            pref_name, railway_company, line_name, line_url = future_to_station_data_result[future]
+        logger.info(
+            f"🧭 路線URL: {line_frontier.added_count}件中 {len(line_frontier)}件を取得対象とします "
+            f"(重複 {line_frontier.duplicate_count}件)"
+        )
+        return line_frontier, processed_prefectures_count
+
+    async def _collect_station_data(self, line_frontier: UrlFrontier, sink: Callable[[StationData], None]) -> int:
+        """路線ページを上限付きキュー経由で取得し、結果を路線の所有者ごとに振り分けてsinkに渡す（渡した件数を返す）"""
+        station_data_count = 0
+
+        async def handle_line(line_url: str, owners: list[tuple[str, str, str]]):
             try:
-                station_data_list = future.result()
-                if station_data_list:
-                    for station_info in station_data_list:
-                        station_name = station_info.station
-                        rent_str = station_info.rent
-                        
-                        if station_name and rent_str and rent_str not in ["不明", "---"]: 
-                            try:
-                                rent_float = float(rent_str)
-                                all_station_data.append(StationData(
-                                    prefecture=pref_name,
-                                    railway_company=railway_company,
-                                    line_name=line_name,
-                                    station_name=station_name,
-                                    rent=rent_float
-                                ))
-                            except (ValueError, TypeError):
-                                logger.warning(f"⚠️ 家賃データ '{rent_str}' を数値に変換できませんでした。スキップします。({pref_name}, {line_name}, {station_name})")
-                else:
-                    logger.info(f"💡 {pref_name} の {line_name} ({line_url}) の駅データは空でした。")
+                station_data_list = await self.scraper.get_station_rent_list(line_url)
             except Exception as exc:
-                logger.error(f'駅家賃データ処理中にエラーが発生しました ({pref_name}, {line_name}): {exc}', exc_info=True)
+                logger.error(f'駅家賃データ取得中にエラーが発生しました ({line_url}): {exc}', exc_info=True)
+                return
+            finally:
+                self.scraper.metrics.record_line_done(line_frontier.queue_depth)
+            nonlocal station_data_count
+            for pref_name, railway_company, line_name in owners:
+                for station_data in self._to_station_data(station_data_list, pref_name, railway_company, line_name, line_url):
+                    sink(station_data)
+                    station_data_count += 1
+
+        await line_frontier.drain(handle_line, concurrency=self.max_workers, queue_size=self.queue_size)
+        return station_data_count
+
+    @staticmethod
+    def _to_station_data(
+        station_data_list: list[StationRentInfo], pref_name: str, railway_company: str, line_name: str, line_url: str
+    ) -> list[StationData]:
+        """駅ごとの家賃データを、家賃を数値に変換したStationDataのリストにする"""
+        results = []
+        try:
+            if station_data_list:
+                for station_info in station_data_list:
+                    station_name = station_info.station
+                    rent_str = station_info.rent
+                    
+                    if station_name and rent_str and rent_str not in ["不明", "---"]: 
+                        try:
+                            rent_float = float(rent_str)
+                            results.append(StationData(
+                                prefecture=pref_name,
+                                railway_company=railway_company,
+                                line_name=line_name,
+                                station_name=station_name,
+                                rent=rent_float
+                            ))
+                        except (ValueError, TypeError):
+                            logger.warning(f"⚠️ 家賃データ '{rent_str}' を数値に変換できませんでした。スキップします。({pref_name}, {line_name}, {station_name})")
+            else:
+                logger.info(f"💡 {pref_name} の {line_name} ({line_url}) の駅データは空でした。")
+        except Exception as exc:
+            logger.error(f'駅家賃データ処理中にエラーが発生しました ({pref_name}, {line_name}): {exc}', exc_info=True)
                 
-        return all_station_data
+        return results
 
 def load_prefecture_code_map(file_path: str) -> dict:
     """都道府県コードマップファイルを読み込む"""
@@ -279,6 +499,34 @@ def load_prefecture_code_map(file_path: str) -> dict:
         return {}
 
 
+def prefecture_code_sort_key(prefecture: str, prefecture_codes_map: dict) -> int | float:
+    """ソート用のキーを返す（都道府県コード、見つからなければ無限大）"""
+    # マップから都道府県コードを取得（文字列）。見つからなければNone
+    code_str = prefecture_codes_map.get(prefecture)
+    # コードを整数に変換しようと試みる。変換できない、またはNoneの場合はfloat('inf')を返す
+    try:
+        return int(code_str) if code_str is not None else float('inf')
+    except (ValueError, TypeError):
+        return float('inf')
+
+
+def station_record_sort_key(prefecture_codes_map: dict) -> Callable[[dict], tuple]:
+    """
+    駅データ（辞書）の並べ替えキー関数を返す
+    都道府県コード順に並べ、同じ都道府県の中は鉄道会社・路線名の順にする（路線内の駅は取得した順のまま）
+    取得の完了順によらず並びが決まるため、シャードの出力をマージしても同じ結果になる
+    """
+    def sort_key(record: dict) -> tuple:
+        return (
+            prefecture_code_sort_key(record["prefecture"], prefecture_codes_map),
+            record["prefecture"],
+            record["railway_company"],
+            record["line_name"],
+        )
+
+    return sort_key
+
+
 def sort_data_by_prefecture_code(station_data_list: list[StationData], prefecture_codes_map: dict) -> list[StationData]:
     """都道府県コードに基づいて駅データをソートする"""
     if not prefecture_codes_map:
@@ -286,14 +534,7 @@ def sort_data_by_prefecture_code(station_data_list: list[StationData], prefectur
         return station_data_list
 
     def get_sort_key(item: StationData) -> int | float:
-        """ソート用のキーを返す（都道府県コード、見つからなければ無限大）"""
-        # マップから都道府県コードを取得（文字列）。見つからなければNone
-        code_str = prefecture_codes_map.get(item.prefecture)
-        # コードを整数に変換しようと試みる。変換できない、またはNoneの場合はfloat('inf')を返す
-        try:
-            return int(code_str) if code_str is not None else float('inf')
-        except (ValueError, TypeError):
-            return float('inf')
+        return prefecture_code_sort_key(item.prefecture, prefecture_codes_map)
 
     # ソートキー関数を使ってリストをソート
     sorted_list = sorted(station_data_list, key=get_sort_key)
@@ -306,50 +547,279 @@ def sort_data_by_prefecture_code(station_data_list: list[StationData], prefectur
     return sorted_list
 
 
-def save_data_to_json(station_data_list: list[StationData], filename: str):
-    """収集・処理した駅データをJSONファイルに保存する"""
+def save_records_to_json(records: Iterable[dict], filename: str) -> bool:
+    """
+    駅データの辞書を逐次JSONファイルに書き出す（保存できたかを返す）
+    一時ファイルに書き込んでから置き換えるため、途中で失敗しても前回のファイルは壊れない
+    """
     output_dir = os.path.dirname(filename)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
         logger.info(f"📁 出力ディレクトリを作成しました: {output_dir}")
 
-    # StationDataオブジェクトを辞書のリストに変換
-    data_to_save = [asdict(data) for data in station_data_list]
-
     # 現在時刻を'lastupdate'キーとして各辞書に追加
     current_time_iso = datetime.now().isoformat()
-    for item in data_to_save:
-        item['lastupdate'] = current_time_iso
-    
+
+    def with_lastupdate() -> Iterator[dict]:
+        for item in records:
+            item['lastupdate'] = current_time_iso
+            yield item
+
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-        logger.info(f"✅ データをJSONファイルに保存しました: {filename} ({len(data_to_save)}件)")
-    except IOError as e:
+        count = write_json_array_atomic(with_lastupdate(), filename)
+        logger.info(f"✅ データをJSONファイルに保存しました: {filename} ({count}件)")
+    except OSError as e:
         logger.error(f"🚨 ファイルの書き込み中にエラーが発生しました: {e}")
+        return False
+
+    # 読み込み側がJSON全体をデコードしなくて済むよう、列指向のストアも作成する（失敗してもJSONは使える）
+    columnar_dir = write_columnar_companion(filename)
+    if columnar_dir:
+        logger.info(f"🗃️ 列指向のストアを作成しました: {columnar_dir}")
+    return True
+
+
+def save_data_to_json(station_data_list: list[StationData], filename: str) -> bool:
+    """収集・処理した駅データをJSONファイルに保存する（保存できたかを返す）"""
+    return save_records_to_json((asdict(data) for data in station_data_list), filename)
+
+async def run_scraping(
+    base_url: str,
+    state_store: ScrapeStateStore | None = None,
+    archive: HtmlArchive | None = None,
+    sink: Callable[[StationData], None] | None = None,
+    shard: ShardSpec | None = None,
+    metrics: ScrapeMetrics | None = None
+) -> tuple[list[StationData], dict]:
+    """コネクションプールを共有するスクレイパーで全国（shard指定時はそのシャード）の家賃データを収集する"""
+    async with SuumoScraper(
+        headers=ScrapingConfig.HEADERS, state_store=state_store, archive=archive, metrics=metrics
+    ) as scraper:
+        orchestrator = ScrapingOrchestrator(scraper=scraper, max_workers=ParallelConfig.MAX_WORKERS, shard=shard)
+        all_station_data, stats = await orchestrator.execute(base_url=base_url, sink=sink)
+        stats["pages"] = dict(scraper.page_stats)
+        return all_station_data, stats
+
+def _parse_archived_pages(
+    archive_dir: str, pages: list[ArchivedPage], extractor_name: str
+) -> list[tuple[str, str, object, float]]:
+    """
+    アーカイブのページをまとめて解析する（プロセスプールのワーカーで実行）
+
+    Returns:
+        list: [(URL, ページの種類, 解析結果, 解析時間（秒）), ...]
+    """
+    archive = HtmlArchive(archive_dir)
+    extractor = get_html_extractor(extractor_name)
+    results = []
+    try:
+        for page in pages:
+            html = archive.read_text(page)
+            parse_start = time.perf_counter()
+            result = extractor.extract(page.page_kind, html, page.url)
+            results.append((page.url, page.page_kind, result, time.perf_counter() - parse_start))
+        return results
+    finally:
+        archive.close()
+
+def replay_archive(
+    archive_dir: str,
+    base_url: str,
+    max_processes: int | None = None,
+    as_of: float | None = None,
+    sink: Callable[[StationData], None] | None = None,
+    shard: ShardSpec | None = None,
+    metrics: ScrapeMetrics | None = None
+) -> tuple[list[StationData], dict]:
+    """
+    HTMLアーカイブのページを複数プロセスで並列に解析し、ネットワークに接続せずにデータを再構築する
+
+    Args:
+        archive_dir: HTMLアーカイブのディレクトリ
+        base_url: 都道府県一覧ページのURL（スクレイピング時と同じもの）
+        max_processes: 解析に使うプロセス数（省略時はCPUコア数）
+        as_of: この時刻（UNIX時間）以前に取得したページを使う（省略時は最新）
+        sink: 駅データを1件ずつ受け取る関数（ScrapingOrchestrator.executeを参照）
+        shard: 指定した場合、このシャードに属する路線だけを再構築する
+        metrics: 解析時間などの計測値の記録先
+    """
+    archive = HtmlArchive(archive_dir)
+    try:
+        pages = archive.latest_pages(as_of=as_of)
+    finally:
+        archive.close()
+
+    metrics = metrics or ScrapeMetrics()
+    max_processes = max_processes or os.cpu_count() or 1
+    chunk_size = max(1, math.ceil(len(pages) / (max_processes * 4)))
+    parsed_pages = {}
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = [
+            executor.submit(_parse_archived_pages, archive_dir, pages[i:i + chunk_size], SUUMO_HTML_EXTRACTOR)
+            for i in range(0, len(pages), chunk_size)
+        ]
+        for future in as_completed(futures):
+            for url, page_kind, result, parse_seconds in future.result():
+                parsed_pages[url] = result
+                metrics.observe_parse(page_kind, parse_seconds)
+    logger.info(f"🗄️ アーカイブの {len(parsed_pages)} ページを {max_processes} プロセスで解析しました")
+
+    scraper = ArchiveReplayScraper(parsed_pages, metrics=metrics)
+    orchestrator = ScrapingOrchestrator(scraper=scraper, max_workers=ParallelConfig.MAX_WORKERS, shard=shard)
+    all_station_data, stats = asyncio.run(orchestrator.execute(base_url=base_url, sink=sink))
+    stats["pages"] = dict(scraper.page_stats)
+    return all_station_data, stats
+
+def create_station_data_spool(prefecture_code_map: dict) -> SortedSpool:
+    """駅データを都道府県コード順（station_record_sort_keyを参照）に並べ替えながら溜める一時領域を作成する"""
+    return SortedSpool(sort_key=station_record_sort_key(prefecture_code_map), directory=PathConfig.SPOOL_DIR)
+
+def publish_station_data(records: Iterable[dict], output_file: str, prefecture_code_map: dict) -> bool:
+    """並べ替え済みの駅データをJSONファイルへ書き出して公開する（保存できたかを返す）"""
+    unknown_prefectures = set()
+
+    def checked_records() -> Iterator[dict]:
+        for record in records:
+            if prefecture_code_sort_key(record["prefecture"], prefecture_code_map) == float('inf'):
+                unknown_prefectures.add(record["prefecture"])
+            yield record
+
+    saved = save_records_to_json(checked_records(), output_file)
+    # ソートできなかった項目（コード不明）があればログで通知
+    if unknown_prefectures:
+        logger.info(f"💡 注意: 次の都道府県はコードが不明なため、ソート順が保証されません: {sorted(unknown_prefectures)}")
+    return saved
+
+def publish_shard_data(records: Iterable[dict], shard_dir: str, shard: ShardSpec) -> bool:
+    """並べ替え済みのシャードの駅データをJSON Linesファイルへ書き出して公開する（保存できたかを返す）"""
+    filename = shard_file_path(shard_dir, shard)
+    try:
+        count = write_jsonl_atomic(records, filename)
+        logger.info(f"✅ シャード {shard} のデータを保存しました: {filename} ({count}件)")
+        return True
+    except OSError as e:
+        logger.error(f"🚨 シャード {shard} のファイルの書き込み中にエラーが発生しました: {e}")
+        return False
+
+def merge_shards(shard_dir: str, shard_count: int, output_file: str) -> bool:
+    """全シャードの出力をマージしてJSONファイルに保存する（保存できたかを返す）"""
+    prefecture_code_map = load_prefecture_code_map(PathConfig.PREFECTURE_CODE_MAP_FILE)
+    try:
+        records = merge_shard_files(shard_dir, shard_count, station_record_sort_key(prefecture_code_map))
+    except FileNotFoundError as e:
+        logger.error(f"🚨 未完了のシャードがあるためマージできません: {e}")
+        return False
+    return publish_station_data(records, output_file, prefecture_code_map)
+
+def _format_seconds(seconds: float | None) -> str:
+    return f"{seconds:.2f}秒" if seconds is not None else "-"
+
+def parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SUUMOの家賃相場データをスクレイピングします。")
+    parser.add_argument("--archive", nargs="?", const=PathConfig.HTML_ARCHIVE_DIR, help="取得したHTMLを保存するアーカイブのディレクトリ")
+    parser.add_argument("--replay", nargs="?", const=PathConfig.HTML_ARCHIVE_DIR, help="ネットワークに接続せず、アーカイブのHTMLを再解析する")
+    parser.add_argument("--processes", type=int, help="再解析に使うプロセス数（省略時はCPUコア数）")
+    parser.add_argument("--output", default=PathConfig.OUTPUT_FILE, help="出力するJSONファイルのパス")
+    parser.add_argument("--shard", type=parse_shard_spec, help="路線をN個に分けたうちi番目だけを処理し、シャードの出力ディレクトリに保存する（i/N）")
+    parser.add_argument("--merge", type=int, metavar="N", help="N個のシャードの出力をマージして --output に保存する（スクレイピングは行わない）")
+    parser.add_argument("--shard-dir", default=PathConfig.SHARD_DIR, help="シャードの出力ディレクトリ")
+    args = parser.parse_args(argv or [])
+    if args.merge is not None and (args.shard or args.replay or args.archive):
+        parser.error("--merge cannot be combined with --shard, --replay or --archive")
+    return args
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    スクレイピング処理のメイン関数（引数なしで呼ばれた場合は全国をスクレイピングする）
+    APIのバックグラウンドタスクからも呼ばれるため、プロセスは終了させずに終了コードを返す
+
+    Returns:
+        int: 終了コード（保存まで完了した場合は0、失敗した場合は1）
+    """
+    args = parse_args(argv)
+    if args.merge is not None:
+        logger.info(f"🧩 {args.merge}個のシャードの出力をマージします...")
+        return 0 if merge_shards(args.shard_dir, args.merge, args.output) else 1
 
-def main():
-    """スクレイピング処理のメイン関数"""
     logger.info("🚀 スクレイピング処理を開始します...")
     start_time = time.time()
-    
-    scraper = SuumoScraper(headers=ScrapingConfig.HEADERS)
-    orchestrator = ScrapingOrchestrator(scraper=scraper, max_workers=ParallelConfig.MAX_WORKERS)
-    
-    all_station_data, stats = orchestrator.execute(base_url=ScrapingConfig.BASE_URL)
-    
     prefecture_code_map = load_prefecture_code_map(PathConfig.PREFECTURE_CODE_MAP_FILE)
-    sorted_station_data = sort_data_by_prefecture_code(all_station_data, prefecture_code_map)
-    
-    save_data_to_json(sorted_station_data, PathConfig.OUTPUT_FILE)
-    
+    if not prefecture_code_map:
+        logger.warning("都道府県コードマップが空のため、都道府県名の順に並べます。")
+
+    def publish(records: Iterable[dict]) -> bool:
+        if args.shard:
+            return publish_shard_data(records, args.shard_dir, args.shard)
+        return publish_station_data(records, args.output, prefecture_code_map)
+
+    # 実行中の進捗は /run-scraping/status から参照できる
+    scrape_metrics.start(shard=str(args.shard) if args.shard else None)
+    published = False
+    try:
+        # 駅データは取得した時点で一時領域に書き出し、全件をメモリに溜めない
+        with create_station_data_spool(prefecture_code_map) as spool:
+            def sink(station_data: StationData):
+                spool.write(asdict(station_data))
+
+            if args.replay:
+                _, stats = replay_archive(
+                    args.replay, ScrapingConfig.BASE_URL, args.processes, sink=sink, shard=args.shard, metrics=scrape_metrics
+                )
+                published = publish(spool.iter_sorted())
+            else:
+                # 前回の実行が中断していた場合は、確認済みのページを取得せずに再開する
+                # シャードごとに実行の状態を分け、同じマシンで複数のシャードを実行しても干渉しないようにする
+                state_file = shard_suffixed_path(PathConfig.SCRAPE_STATE_FILE, args.shard) if args.shard else PathConfig.SCRAPE_STATE_FILE
+                state_store = ScrapeStateStore(state_file)
+                run_id = state_store.begin_run()
+                logger.info(f"🔖 実行ID: {run_id} (確認済みページ: {state_store.count_pages()['checked_in_current_run']}件)")
+                archive = HtmlArchive(args.archive) if args.archive else None
+
+                try:
+                    _, stats = asyncio.run(
+                        run_scraping(
+                            base_url=ScrapingConfig.BASE_URL, state_store=state_store, archive=archive,
+                            sink=sink, shard=args.shard, metrics=scrape_metrics
+                        )
+                    )
+
+                    # 保存まで完了した場合のみ実行を完了とし、次回は新しい実行として全ページを確認する
+                    published = publish(spool.iter_sorted())
+                    if published:
+                        state_store.finish_run()
+                finally:
+                    state_store.close()
+                    if archive:
+                        archive.close()
+    finally:
+        scrape_metrics.finish(error=None if published else "Scraping or publishing the station data failed")
+
     end_time = time.time()
+    metrics_snapshot = scrape_metrics.snapshot()
     logger.info(f"🎉 スクレイピング処理が完了しました。")
     logger.info(f"📊 --- 統計情報 ---")
+    if args.shard:
+        logger.info(f"   - シャード: {args.shard} (担当の路線URL数: {stats.get('line_url_in_shard', 0)})")
     logger.info(f"   - 全都道府県数: {stats['prefecture_total']}")
     logger.info(f"   - データ取得対象の都道府県数: {stats['processed_prefectures_with_lines']}")
+    logger.info(f"   - 路線URL数（重複除外後/前）: {stats.get('line_url_unique', 0)}/{stats.get('line_url_total', 0)}")
     logger.info(f"   - 収集した駅データ総数: {stats['station_data_count']}")
+    logger.info(f"   - ページ取得結果: {stats['pages']}")
+    logger.info(f"   - ダウンロード量: {metrics_snapshot['bytes_downloaded']:,} bytes")
+    # ステージごとに、ネットワーク・レート制限・リトライ・解析のどこに時間を使ったかを出す
+    for stage, stage_metrics in metrics_snapshot["stages"].items():
+        latency = stage_metrics["request_latency_seconds"]
+        logger.info(
+            f"   - [{stage}] リクエスト: {stage_metrics['requests']}件 "
+            f"(p50 {_format_seconds(latency['p50'])} / p90 {_format_seconds(latency['p90'])} / 最大 {latency['max']:.2f}秒), "
+            f"レート制限の待機: {stage_metrics['throttle_wait_seconds']['sum']:.2f}秒, "
+            f"リトライ: {stage_metrics['retries']}件 ({stage_metrics['backoff_seconds']:.2f}秒), "
+            f"失敗: {stage_metrics['failures']}件, 解析: {stage_metrics['parse_time_seconds']['sum']:.2f}秒"
+        )
+    logger.info(f"   - 処理速度: {metrics_snapshot['pages_per_second'] or 0:.1f}ページ/秒")
     logger.info(f"   - 処理時間: {end_time - start_time:.2f}秒")
+    # 保存に失敗した場合は終了コードで知らせる（失敗したシャードだけを再実行できるように）
+    return 0 if published else 1
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,260 @@
+"""
+スクレイピングの計測モジュール
+- ステージ（ページの種類）ごとのリクエスト遅延・レート制限の待機時間・解析時間のヒストグラム
+- リトライ・失敗・HTTPステータス・ダウンロードしたバイト数の集計
+- 路線ページの進捗（キューの長さ、処理済み件数、1秒あたりのページ数、残り時間の見積もり）
+- 実行中のジョブの状態はスナップショット（辞書）として取り出し、APIから参照できる
+
+遅い実行が、ネットワーク待ち（request_latency）・解析（parse_time）・レート制限（throttle_wait, backoff）の
+どれに時間を使っているかを見分けられるようにする
+"""
+import bisect
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+# リクエスト遅延・待機時間のヒストグラムの境界（秒）
+LATENCY_BUCKETS_SECONDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 解析時間のヒストグラムの境界（秒）
+PARSE_TIME_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """固定の境界で値を数えるヒストグラム"""
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q分位点を返す（値を含むバケットの上限で近似、最後のバケットは最大値）"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        """集計値と累積のバケット数を返す"""
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(list(self.buckets) + [float("inf")], self.bucket_counts):
+            cumulative += bucket_count
+            buckets[f"le_{bound:g}"] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class StageMetrics:
+    """1つのステージ（ページの種類）の計測値"""
+    def __init__(self):
+        self.request_latency = Histogram(LATENCY_BUCKETS_SECONDS)
+        self.throttle_wait = Histogram(LATENCY_BUCKETS_SECONDS)
+        self.parse_time = Histogram(PARSE_TIME_BUCKETS_SECONDS)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.bytes_downloaded = 0
+        self.backoff_seconds = 0.0
+        self.status_counts: Dict[str, int] = {}
+        # ページ取得結果の内訳（SuumoScraper.page_statsと同じキー）
+        self.pages: Dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "bytes_downloaded": self.bytes_downloaded,
+            "backoff_seconds": self.backoff_seconds,
+            "status_counts": dict(self.status_counts),
+            "pages": dict(self.pages),
+            "request_latency_seconds": self.request_latency.to_dict(),
+            "throttle_wait_seconds": self.throttle_wait.to_dict(),
+            "parse_time_seconds": self.parse_time.to_dict(),
+        }
+
+
+class ScrapeMetrics:
+    """
+    スクレイピングの実行1回分の計測値
+    スクレイピングはバックグラウンドのスレッドで動き、APIは別のスレッドから参照するためロックで保護する
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.status = "idle"
+        self.shard: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._started_monotonic: Optional[float] = None
+        self._finished_monotonic: Optional[float] = None
+        self._lines_started_monotonic: Optional[float] = None
+        self.stages: Dict[str, StageMetrics] = {}
+        self.lines_total = 0
+        self.lines_done = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+
+    def _stage(self, stage: str) -> StageMetrics:
+        metrics = self.stages.get(stage)
+        if metrics is None:
+            metrics = self.stages[stage] = StageMetrics()
+        return metrics
+
+    def _start(self, shard: Optional[str]):
+        self._reset()
+        self.status = "running"
+        self.shard = shard
+        self.started_at = time.time()
+        self._started_monotonic = time.monotonic()
+
+    def start(self, shard: Optional[str] = None):
+        """計測値を初期化して実行中にする"""
+        with self._lock:
+            self._start(shard)
+
+    def try_start(self, shard: Optional[str] = None) -> bool:
+        """
+        実行中でなければ計測値を初期化して実行中にする
+        確認と更新を1回のロックで行うため、同時に呼ばれても実行中にできるのは1回だけ
+
+        Returns:
+            bool: 実行中にできた場合はTrue（既に実行中の場合はFalse）
+        """
+        with self._lock:
+            if self.status == "running":
+                return False
+            self._start(shard)
+            return True
+
+    def finish(self, error: Optional[str] = None):
+        """実行を終了する（errorを指定した場合は失敗とする）"""
+        with self._lock:
+            self.status = "failed" if error else "finished"
+            self.error = error
+            self.finished_at = time.time()
+            self._finished_monotonic = time.monotonic()
+
+    def observe_request(self, stage: str, seconds: float, status_code: Optional[int], num_bytes: int = 0):
+        """1回のリクエストの遅延とステータス（例外の場合はNone）を記録する"""
+        with self._lock:
+            metrics = self._stage(stage)
+            metrics.requests += 1
+            metrics.request_latency.observe(seconds)
+            metrics.bytes_downloaded += num_bytes
+            key = str(status_code) if status_code is not None else "error"
+            metrics.status_counts[key] = metrics.status_counts.get(key, 0) + 1
+
+    def observe_throttle_wait(self, stage: str, seconds: float):
+        """レート制限による待機時間を記録する"""
+        with self._lock:
+            self._stage(stage).throttle_wait.observe(seconds)
+
+    def record_retry(self, stage: str, backoff_seconds: float):
+        """リトライと、その前の待機時間を記録する"""
+        with self._lock:
+            metrics = self._stage(stage)
+            metrics.retries += 1
+            metrics.backoff_seconds += backoff_seconds
+
+    def record_failure(self, stage: str):
+        """取得に失敗したページを記録する"""
+        with self._lock:
+            self._stage(stage).failures += 1
+
+    def observe_parse(self, stage: str, seconds: float):
+        """1ページの解析時間を記録する"""
+        with self._lock:
+            self._stage(stage).parse_time.observe(seconds)
+
+    def record_page(self, stage: str, outcome: str):
+        """ページの取得結果（parsed / not_modified / unchanged / resumed）を記録する"""
+        with self._lock:
+            pages = self._stage(stage).pages
+            pages[outcome] = pages.get(outcome, 0) + 1
+
+    def set_lines_total(self, lines_total: int):
+        """取得対象の路線ページ数を設定し、路線ページの取得を開始する"""
+        with self._lock:
+            self.lines_total = lines_total
+            self._lines_started_monotonic = time.monotonic()
+
+    def record_line_done(self, queue_depth: int):
+        """路線ページ1件の処理完了と、その時点のキューの長さを記録する"""
+        with self._lock:
+            self.lines_done += 1
+            self.queue_depth = queue_depth
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def _elapsed(self, since: Optional[float]) -> float:
+        if since is None:
+            return 0.0
+        end = self._finished_monotonic if self._finished_monotonic is not None else time.monotonic()
+        return max(0.0, end - since)
+
+    def snapshot(self) -> dict:
+        """現在の計測値を辞書で返す"""
+        with self._lock:
+            elapsed = self._elapsed(self._started_monotonic)
+            pages_total = sum(sum(stage.pages.values()) for stage in self.stages.values())
+
+            # 残り時間は路線ページの処理速度から見積もる（都道府県・路線一覧のページは先に全て取得するため）
+            lines_elapsed = self._elapsed(self._lines_started_monotonic)
+            lines_per_second = self.lines_done / lines_elapsed if lines_elapsed > 0 else None
+            lines_remaining = max(0, self.lines_total - self.lines_done)
+            eta_seconds = None
+            if self.status == "running" and lines_per_second:
+                eta_seconds = lines_remaining / lines_per_second
+
+            return {
+                "status": self.status,
+                "shard": self.shard,
+                "error": self.error,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": elapsed,
+                "progress": {
+                    "lines_total": self.lines_total,
+                    "lines_done": self.lines_done,
+                    "percent": 100.0 * self.lines_done / self.lines_total if self.lines_total else None,
+                    "eta_seconds": eta_seconds,
+                    "queue_depth": self.queue_depth,
+                    "max_queue_depth": self.max_queue_depth,
+                },
+                "pages_total": pages_total,
+                "pages_per_second": pages_total / elapsed if elapsed > 0 else None,
+                "bytes_downloaded": sum(stage.bytes_downloaded for stage in self.stages.values()),
+                "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+            }
+
+
+# 現在（または直前）のスクレイピングの計測値（APIのステータス表示で参照する）
+scrape_metrics = ScrapeMetrics()
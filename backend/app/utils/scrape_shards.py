@@ -0,0 +1,73 @@
+"""
+スクレイピングのシャード分割モジュール
+- 路線URLのハッシュで取得対象をN個のシャードに決定的に振り分ける（--shard i/N）
+- 各シャードは並べ替え済みのJSON Linesファイルを出力し、全シャードが揃ったらマージして最終データを作る
+- シャードのファイルは完了時にのみ作成されるため、ファイルがないシャードだけを再実行すればよい
+"""
+import heapq
+import os
+from dataclasses import dataclass
+from typing import Callable, Iterator, List
+
+from .station_data_writer import iter_jsonl
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """シャードの指定（numberは1始まり）"""
+    number: int
+    count: int
+
+    def __post_init__(self):
+        if self.count < 1 or not 1 <= self.number <= self.count:
+            raise ValueError(f"Invalid shard {self.number}/{self.count}: expected 1 <= i <= N")
+
+    @property
+    def index(self) -> int:
+        """0始まりのシャード番号"""
+        return self.number - 1
+
+    def __str__(self) -> str:
+        return f"{self.number}/{self.count}"
+
+
+def parse_shard_spec(value: str) -> ShardSpec:
+    """'i/N' 形式の文字列をShardSpecに変換する"""
+    number, sep, count = value.partition("/")
+    if not sep:
+        raise ValueError(f"Invalid shard '{value}': expected 'i/N'")
+    return ShardSpec(int(number), int(count))
+
+
+def shard_file_path(shard_dir: str, shard: ShardSpec) -> str:
+    """シャードの出力ファイルのパスを返す"""
+    return os.path.join(shard_dir, f"shard-{shard.number:04d}-of-{shard.count:04d}.jsonl")
+
+
+def shard_suffixed_path(path: str, shard: ShardSpec) -> str:
+    """シャードごとに分けるファイルのパスを返す（例: state.sqlite3 -> state.shard-0001-of-0004.sqlite3）"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.shard-{shard.number:04d}-of-{shard.count:04d}{ext}"
+
+
+def find_missing_shards(shard_dir: str, shard_count: int) -> List[ShardSpec]:
+    """出力ファイルがない（未完了の）シャードを返す"""
+    shards = [ShardSpec(number, shard_count) for number in range(1, shard_count + 1)]
+    return [shard for shard in shards if not os.path.exists(shard_file_path(shard_dir, shard))]
+
+
+def merge_shard_files(shard_dir: str, shard_count: int, sort_key: Callable[[dict], object]) -> Iterator[dict]:
+    """
+    全シャードの出力を並べ替えキーの順にマージして返す
+    同じキーのレコードはシャード番号順に並ぶため、何度マージしても同じ結果になる
+
+    Raises:
+        FileNotFoundError: 出力ファイルがないシャードがある場合
+    """
+    missing = find_missing_shards(shard_dir, shard_count)
+    if missing:
+        raise FileNotFoundError(
+            f"Missing shard outputs in {shard_dir}: {', '.join(str(shard) for shard in missing)}"
+        )
+    paths = [shard_file_path(shard_dir, ShardSpec(number, shard_count)) for number in range(1, shard_count + 1)]
+    return heapq.merge(*(iter_jsonl(path) for path in paths), key=sort_key)
@@ -0,0 +1,144 @@
+"""
+スクレイピング状態ストアモジュール
+- URLごとにETag・Last-Modified・本文のハッシュ・前回の解析結果をSQLiteに保存
+- 条件付きリクエストやハッシュ比較で、変更のないページの再解析を省く
+- 実行（run）単位のチェックポイントを持ち、中断した実行を途中から再開できる
+"""
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class PageState:
+    """URLごとの前回取得時の状態"""
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    # 前回の解析結果（JSON文字列）
+    parse_result: str
+    fetched_at: float
+    # このページを最後に確認した実行のID
+    checked_run: Optional[int]
+
+
+class ScrapeStateStore:
+    """URLごとの取得状態と実行チェックポイントを保持するSQLiteストア"""
+    def __init__(self, path: str):
+        self.path = path
+        self.current_run: Optional[int] = None
+        self._lock = threading.Lock()
+
+        output_dir = os.path.dirname(path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                parse_result TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                checked_run INTEGER
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def begin_run(self) -> int:
+        """
+        実行を開始する
+        完了していない実行があればそれを再開し、そのIDを返す
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NULL ORDER BY run_id DESC LIMIT 1"
+            ).fetchone()
+            if row:
+                self.current_run = row[0]
+            else:
+                cursor = self._conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+                self.current_run = cursor.lastrowid
+            self._conn.commit()
+        return self.current_run
+
+    def finish_run(self):
+        """現在の実行を完了として記録する（次回は新しい実行として開始する）"""
+        if self.current_run is None:
+            return
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.current_run))
+            self._conn.commit()
+        self.current_run = None
+
+    def get(self, url: str) -> Optional[PageState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, parse_result, fetched_at, checked_run "
+                "FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+        return PageState(*row) if row else None
+
+    def is_checked_in_current_run(self, state: PageState) -> bool:
+        """現在の実行ですでに確認済みのページかを返す（再開時はこのページを取得しない）"""
+        return self.current_run is not None and state.checked_run == self.current_run
+
+    def save(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        content_hash: str,
+        parse_result: str
+    ):
+        """ページの取得結果と解析結果を保存し、現在の実行で確認済みとする"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, etag, last_modified, content_hash, parse_result, fetched_at, checked_run) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash, parse_result, time.time(), self.current_run)
+            )
+            self._conn.commit()
+
+    def mark_checked(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """変更がなかったページを現在の実行で確認済みとする（新しい検証子があれば更新する）"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET checked_run = ?, fetched_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (self.current_run, time.time(), etag, last_modified, url)
+            )
+            self._conn.commit()
+
+    def count_pages(self) -> Dict[str, int]:
+        """保存済みのページ数と、現在の実行で確認済みのページ数を返す"""
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            checked = self._conn.execute(
+                "SELECT COUNT(*) FROM pages WHERE checked_run = ?", (self.current_run,)
+            ).fetchone()[0]
+        return {"total": total, "checked_in_current_run": checked}
@@ -0,0 +1,122 @@
+"""
+空間インデックスモジュール
+- 経度緯度の点群を一様グリッドに分割して保持
+- 半径検索（指定地点から半径N km以内の点）をメモリ上で高速に処理
+- 複数地点の半径検索を1回の距離計算でまとめて処理
+"""
+import math
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from .point_to_point_distance import calculate_distances
+
+# 経線方向の1度あたりの距離(km)（calculate_distanceの地球半径6371kmに合わせる）
+KM_PER_DEGREE = 2 * math.pi * 6371 / 360
+
+# 検索範囲の余裕率（大円距離と緯線に沿った距離の差を吸収する）
+SEARCH_MARGIN = 1.01
+
+
+class GridSpatialIndex:
+    """一様グリッドによる点群の空間インデックス"""
+    def __init__(self, points: Sequence[Tuple[float, float]], cell_size_deg: float = 0.05):
+        """
+        Args:
+            points: [(経度, 緯度), ...] の形式の点群
+            cell_size_deg: グリッドセルの一辺の大きさ（度）
+        """
+        self.points = list(points)
+        self.cell_size_deg = cell_size_deg
+        coordinates = np.asarray(self.points, dtype=np.float64).reshape(-1, 2)
+        self._lons = coordinates[:, 0]
+        self._lats = coordinates[:, 1]
+
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for index, (lon, lat) in enumerate(self.points):
+            cells.setdefault(self._cell_of(lon, lat), []).append(index)
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {
+            cell: np.asarray(indices, dtype=np.int64) for cell, indices in cells.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell_of(self, lon: float, lat: float) -> Tuple[int, int]:
+        return math.floor(lon / self.cell_size_deg), math.floor(lat / self.cell_size_deg)
+
+    def _search_span(self, lat: float, radius_km: float) -> Tuple[float, float]:
+        """検索円を囲む経度方向・緯度方向の幅（度）を返す"""
+        lat_span = radius_km / KM_PER_DEGREE * SEARCH_MARGIN
+        # 検索範囲内で最も極に近い緯度で経度方向の幅を見積もる
+        extreme_lat = min(89.9, max(abs(lat - lat_span), abs(lat + lat_span)))
+        lon_span = lat_span / math.cos(math.radians(extreme_lat))
+        return lon_span, lat_span
+
+    def _candidate_cells(self, lon: float, lat: float, radius_km: float) -> List[np.ndarray]:
+        """検索円と重なりうるセルに含まれる点のインデックス配列を返す"""
+        lon_span, lat_span = self._search_span(lat, radius_km)
+        min_cx, min_cy = self._cell_of(lon - lon_span, lat - lat_span)
+        max_cx, max_cy = self._cell_of(lon + lon_span, lat + lat_span)
+        return [
+            self._cells[(cx, cy)]
+            for cx in range(min_cx, max_cx + 1)
+            for cy in range(min_cy, max_cy + 1)
+            if (cx, cy) in self._cells
+        ]
+
+    def query_radius(self, lon: float, lat: float, radius_km: float) -> List[Tuple[int, float]]:
+        """
+        指定地点から半径radius_km以内にある点を返す
+
+        Returns:
+            list: [(点のインデックス, 距離km), ...] 距離の昇順
+        """
+        candidate_cells = self._candidate_cells(lon, lat, radius_km)
+        if not candidate_cells:
+            return []
+
+        # 候補点の距離をまとめて計算し、半径内のものを距離順に並べる
+        candidates = np.concatenate(candidate_cells)
+        distances = calculate_distances(lon, lat, self._lons[candidates], self._lats[candidates])
+        within = distances <= radius_km
+        candidates, distances = candidates[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+
+        return [(int(candidates[i]), float(distances[i])) for i in order]
+
+    def query_radius_many(self, queries: Sequence[Tuple[float, float, float]]) -> List[List[Tuple[int, float]]]:
+        """
+        複数地点の半径検索をまとめて行う
+        全クエリの候補点を1つの配列に集め、距離を1回で計算する
+
+        Args:
+            queries: [(経度, 緯度, 半径km), ...]
+
+        Returns:
+            list: クエリと同じ順序で、query_radiusと同じ形式の結果のリスト
+        """
+        query_indices, candidate_chunks = [], []
+        for query_index, (lon, lat, radius_km) in enumerate(queries):
+            for cell in self._candidate_cells(lon, lat, radius_km):
+                candidate_chunks.append(cell)
+                query_indices.append(np.full(len(cell), query_index, dtype=np.int64))
+
+        results: List[List[Tuple[int, float]]] = [[] for _ in queries]
+        if not candidate_chunks:
+            return results
+
+        query_array = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        owners = np.concatenate(query_indices)
+        candidates = np.concatenate(candidate_chunks)
+
+        # 候補点ごとに対応するクエリの中心からの距離を計算
+        distances = calculate_distances(
+            query_array[owners, 0], query_array[owners, 1], self._lons[candidates], self._lats[candidates]
+        )
+        within = distances <= query_array[owners, 2]
+        owners, candidates, distances = owners[within], candidates[within], distances[within]
+
+        # クエリごと・距離の昇順に並べて振り分ける
+        order = np.lexsort((distances, owners))
+        for i in order:
+            results[owners[i]].append((int(candidates[i]), float(distances[i])))
+        return results
@@ -0,0 +1,164 @@
+"""
+スクレイピング結果のストリーミング書き出しモジュール
+- 収集したレコードを一定件数ごとに並べ替えてJSON Linesの一時ファイル（ラン）に書き出す
+- 公開時は各ランを逐次マージして並べ替え済みのレコードを順に取り出す（全件をメモリに載せない）
+- JSONファイルは一時ファイルに書き込んでから置き換え、書き込み途中のファイルが読まれないようにする
+"""
+import heapq
+import json
+import os
+import shutil
+import tempfile
+from typing import Callable, IO, Iterable, Iterator, List, Optional
+
+# 1つのランに含めるレコード数（並べ替え時にメモリに載る件数の上限）
+SPOOL_RUN_SIZE = 50_000
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """JSON Linesファイルのレコードを順に返す"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class SortedSpool:
+    """レコードをJSON Linesのランに書き出し、並べ替え済みの順に取り出す一時領域"""
+    def __init__(
+        self,
+        sort_key: Callable[[dict], object],
+        directory: Optional[str] = None,
+        run_size: int = SPOOL_RUN_SIZE
+    ):
+        """
+        Args:
+            sort_key: レコードの並べ替えキーを返す関数（同じキーのレコードは書き込み順を保つ）
+            directory: 一時領域を作成するディレクトリ（省略時はシステムの一時ディレクトリ）
+            run_size: 1つのランに含めるレコード数
+        """
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.sort_key = sort_key
+        self.run_size = run_size
+        self.count = 0
+        self._dir = tempfile.mkdtemp(prefix=".spool-", dir=directory)
+        self._buffer: List[dict] = []
+        self._runs: List[str] = []
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "SortedSpool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record: dict):
+        """レコードを追加する（ランの件数に達したら並べ替えてファイルに書き出す）"""
+        self._buffer.append(record)
+        self.count += 1
+        if len(self._buffer) >= self.run_size:
+            self._flush_run()
+
+    def _flush_run(self):
+        if not self._buffer:
+            return
+        self._buffer.sort(key=self.sort_key)
+        path = os.path.join(self._dir, f"run-{len(self._runs):06d}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            _write_jsonl(self._buffer, f)
+        self._runs.append(path)
+        self._buffer = []
+
+    def iter_sorted(self) -> Iterator[dict]:
+        """全レコードを並べ替えキーの順に返す（ランを逐次マージする）"""
+        self._flush_run()
+        # 同じキーのレコードは前のランのものが先に出るため、書き込み順が保たれる
+        return heapq.merge(*(iter_jsonl(path) for path in self._runs), key=self.sort_key)
+
+    def close(self):
+        """一時領域を削除する"""
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def render_json_array_item(record: dict) -> str:
+    """json.dump(list, indent=4) の配列の要素1つ分の文字列を返す（別プロセスで整形する場合に使う）"""
+    return json.dumps(record, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+
+
+def _write_rendered_json_array(items: Iterable[str], f: IO[str]) -> int:
+    """render_json_array_itemで整形済みの要素を配列として書き出す"""
+    count = 0
+    for item in items:
+        f.write("[\n    " if count == 0 else ",\n    ")
+        f.write(item)
+        count += 1
+    f.write("\n]" if count else "[]")
+    return count
+
+
+def _write_json_array(records: Iterable[dict], f: IO[str]) -> int:
+    """json.dump(list, indent=4) と同じ書式で配列を書き出す"""
+    return _write_rendered_json_array(map(render_json_array_item, records), f)
+
+
+def _write_jsonl(records: Iterable[dict], f: IO[str]) -> int:
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def _write_atomic(filename: str, write: Callable[[IO[str]], int]) -> int:
+    """一時ファイルに書き込み、完了後にfilenameへ置き換える（writeの戻り値を返す）"""
+    output_dir = os.path.dirname(filename) or "."
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=output_dir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            count = write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstempは所有者のみ読み書き可能なファイルを作るため、通常のファイルと同じ権限にする
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def write_json_array_atomic(records: Iterable[dict], filename: str) -> int:
+    """
+    レコードを逐次JSON配列としてファイルに書き出し、完了後に置き換えて公開する
+
+    Returns:
+        int: 書き出したレコード数
+    """
+    return _write_atomic(filename, lambda f: _write_json_array(records, f))
+
+
+def write_rendered_json_array_atomic(items: Iterable[str], filename: str) -> int:
+    """
+    render_json_array_itemで整形済みの要素を逐次JSON配列としてファイルに書き出し、完了後に置き換えて公開する
+    （write_json_array_atomicと同じ内容になる）
+
+    Returns:
+        int: 書き出したレコード数
+    """
+    return _write_atomic(filename, lambda f: _write_rendered_json_array(items, f))
+
+
+def write_jsonl_atomic(records: Iterable[dict], filename: str) -> int:
+    """
+    レコードを逐次JSON Linesとしてファイルに書き出し、完了後に置き換えて公開する
+
+    Returns:
+        int: 書き出したレコード数
+    """
+    return _write_atomic(filename, lambda f: _write_jsonl(records, f))
@@ -0,0 +1,121 @@
+"""
+駅データリポジトリモジュール
+- S12（駅別乗降客数）GeoJSONを一度だけ読み込み、メモリ上に常駐させる
+- 駅ごとの重心座標を事前計算して保持
+- 駅ID（S12_001c）と（路線名, 運営会社）のハッシュインデックスを提供
+- 重心座標のグリッド空間インデックスによる半径検索を提供
+"""
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import geopandas as gpd
+import shapely
+from .spatial_index import GridSpatialIndex
+
+logger = logging.getLogger(__name__)
+
+# GeoJSONファイルのパス
+STATION_GEOJSON_PATH = Path(__file__).parents[2] / "data/raw/geojson/S12-22_NumberOfPassengers.geojson"
+
+
+@dataclass(frozen=True)
+class StationRecord:
+    """重心座標を事前計算済みの駅情報を保持するデータクラス"""
+    station_code: str
+    name: str
+    line_name: str
+    company: str
+    lng: float
+    lat: float
+
+
+class StationRepository:
+    """駅データをメモリ上に保持し、インデックス経由で検索するクラス"""
+    def __init__(self, records: List[StationRecord]):
+        self.records = records
+        self._by_station_id: Dict[str, StationRecord] = {}
+        self._by_line_and_company: Dict[Tuple[str, str], List[StationRecord]] = {}
+
+        for record in records:
+            # 同じ駅IDが複数ある場合は最初の行を採用（従来の iloc[0] と同じ挙動）
+            self._by_station_id.setdefault(record.station_code, record)
+            self._by_line_and_company.setdefault((record.line_name, record.company), []).append(record)
+
+        self._spatial_index = GridSpatialIndex([(record.lng, record.lat) for record in records])
+
+    @classmethod
+    def from_geojson(cls, path: Path) -> "StationRepository":
+        """GeoJSONファイルを読み込み、重心座標を一括計算してリポジトリを構築する"""
+        if not Path(path).exists():
+            raise FileNotFoundError(f"GeoJSONファイルが見つかりません: {path}")
+
+        gdf = gpd.read_file(path, encoding='utf-8')
+        # 重心は行ごとではなく全ジオメトリでまとめて計算する
+        # GeoSeries.centroid は地理座標系で警告を出すため、従来の各エンドポイントの
+        # row.geometry.centroid と同じshapelyの計算を経緯度のまま一括で行う
+        centroids = shapely.centroid(gdf.geometry.to_numpy())
+
+        records = [
+            StationRecord(
+                station_code=str(station_code),
+                name=name,
+                line_name=line_name,
+                company=company,
+                lng=float(lng),
+                lat=float(lat)
+            )
+            for station_code, name, line_name, company, lng, lat in zip(
+                gdf["S12_001c"], gdf["S12_001"], gdf["S12_003"], gdf["S12_002"],
+                shapely.get_x(centroids), shapely.get_y(centroids)
+            )
+        ]
+        return cls(records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get_by_station_id(self, station_id: str) -> Optional[StationRecord]:
+        """駅IDに一致する駅を返す（見つからなければNone）"""
+        return self._by_station_id.get(station_id)
+
+    def find_by_line_and_company(self, line_name: str, company: str) -> List[StationRecord]:
+        """路線名と運営会社に一致する駅のリストを返す"""
+        return self._by_line_and_company.get((line_name, company), [])
+
+    def find_nearby(self, lon: float, lat: float, radius_km: float) -> List[Tuple[StationRecord, float]]:
+        """指定地点から半径radius_km以内の駅を（駅, 距離km）のリストで距離順に返す"""
+        return [
+            (self.records[index], distance)
+            for index, distance in self._spatial_index.query_radius(lon, lat, radius_km)
+        ]
+
+    def find_nearby_many(
+        self, queries: Sequence[Tuple[float, float, float]]
+    ) -> List[List[Tuple[StationRecord, float]]]:
+        """複数地点 [(経度, 緯度, 半径km), ...] の周辺駅をまとめて検索し、クエリと同じ順序で返す"""
+        return [
+            [(self.records[index], distance) for index, distance in matches]
+            for matches in self._spatial_index.query_radius_many(queries)
+        ]
+
+
+@lru_cache()
+def get_station_repository() -> StationRepository:
+    """駅データリポジトリを返す（初回呼び出し時にのみ読み込む）"""
+    repository = StationRepository.from_geojson(STATION_GEOJSON_PATH)
+    logger.info(f"Station repository loaded: {len(repository)} stations from {STATION_GEOJSON_PATH}")
+    return repository
+
+
+def warm_up_station_repository():
+    """
+    アプリケーション起動時に駅データを読み込んでおく。
+    ファイルが存在しない場合も起動は継続し、各エンドポイントでエラーを返す。
+    """
+    try:
+        get_station_repository()
+    except FileNotFoundError as e:
+        logger.warning(f"Station repository was not loaded at startup: {e}")
@@ -0,0 +1,310 @@
+"""
+タイルキャッシュモジュール
+- 国土交通省（MLIT）タイルAPIのレスポンスを2段階でキャッシュ
+  - 1段目: プロセス内のLRU（件数・バイト数の上限付き）
+  - 2段目: SQLiteファイルによる永続ストア（バイト数の上限付き）
+- TTLによる有効期限とヒット/ミスの統計情報を提供
+- 永続ストアの読み書きはブロッキングのため、非同期の処理からは aget / aset でスレッドプール上で実行する
+- 永続ストアの最終アクセス時刻の更新はまとめて書き込む（ヒットのたびにコミットしない）
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# キャッシュ設定（環境変数で上書き可能）
+TILE_CACHE_PATH = os.getenv(
+    'TILE_CACHE_PATH',
+    str(Path(__file__).parents[2] / "data/cache/mlit_tiles.sqlite3")
+)
+TILE_CACHE_TTL_SECONDS = float(os.getenv('TILE_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60))
+TILE_CACHE_MEMORY_MAX_ENTRIES = int(os.getenv('TILE_CACHE_MEMORY_MAX_ENTRIES', 1024))
+TILE_CACHE_MEMORY_MAX_BYTES = int(os.getenv('TILE_CACHE_MEMORY_MAX_BYTES', 128 * 1024 * 1024))
+TILE_CACHE_DISK_MAX_BYTES = int(os.getenv('TILE_CACHE_DISK_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+# 最終アクセス時刻の更新をまとめて書き込む件数
+TILE_CACHE_ACCESS_FLUSH_ENTRIES = int(os.getenv('TILE_CACHE_ACCESS_FLUSH_ENTRIES', 256))
+
+
+@dataclass(frozen=True)
+class TileKey:
+    """タイルキャッシュのキー"""
+    api: str
+    z: int
+    x: int
+    y: int
+    response_format: str
+    administrative_area_code: Optional[str] = None
+
+    def to_string(self) -> str:
+        return f"{self.api}/{self.response_format}/{self.z}/{self.x}/{self.y}/{self.administrative_area_code or '-'}"
+
+
+@dataclass(frozen=True)
+class CachedTile:
+    """キャッシュされたタイルのレスポンス"""
+    content: bytes
+    media_type: str
+    stored_at: float
+    # 上流のContent-Encoding（圧縮されたまま保持している場合のみ設定）
+    content_encoding: Optional[str] = None
+
+
+class TileCache:
+    """プロセス内LRUと永続ストアからなる2段階のタイルキャッシュ"""
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: float = TILE_CACHE_TTL_SECONDS,
+        memory_max_entries: int = TILE_CACHE_MEMORY_MAX_ENTRIES,
+        memory_max_bytes: int = TILE_CACHE_MEMORY_MAX_BYTES,
+        disk_max_bytes: int = TILE_CACHE_DISK_MAX_BYTES,
+        access_flush_entries: int = TILE_CACHE_ACCESS_FLUSH_ENTRIES
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_max_entries = memory_max_entries
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.access_flush_entries = access_flush_entries
+
+        # _lockはプロセス内LRUと統計、_db_lockは永続ストアを保護する
+        # （永続ストアの読み書き中もプロセス内LRUの参照はブロックしない）
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        # 永続ストアに未反映の最終アクセス時刻 {key: accessed_at}
+        self._pending_access: Dict[str, float] = {}
+        self._memory: "OrderedDict[str, CachedTile]" = OrderedDict()
+        self._memory_bytes = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+        output_dir = os.path.dirname(db_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tiles (
+                key TEXT PRIMARY KEY,
+                content BLOB NOT NULL,
+                media_type TEXT NOT NULL,
+                content_encoding TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        # content_encoding列が追加される前に作成されたストアを移行
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tiles)")}
+        if "content_encoding" not in columns:
+            self._conn.execute("ALTER TABLE tiles ADD COLUMN content_encoding TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_accessed_at ON tiles (accessed_at)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key: TileKey) -> Optional[CachedTile]:
+        """キャッシュからタイルを取得する（見つからない・期限切れの場合はNone）"""
+        tile = self.get_from_memory(key)
+        if tile is not None:
+            return tile
+        return self._get_from_disk(key)
+
+    async def aget(self, key: TileKey) -> Optional[CachedTile]:
+        """getの非同期版（プロセス内LRUにない場合のみ、永続ストアをスレッドプールで参照する）"""
+        tile = self.get_from_memory(key)
+        if tile is not None:
+            return tile
+        return await asyncio.to_thread(self._get_from_disk, key)
+
+    def get_from_memory(self, key: TileKey) -> Optional[CachedTile]:
+        """1段目（プロセス内LRU）からタイルを取得する（ブロッキングしない）"""
+        key_str = key.to_string()
+        with self._lock:
+            tile = self._memory.get(key_str)
+            if tile is None:
+                return None
+            if self._is_expired(tile.stored_at, time.time()):
+                self._remove_from_memory(key_str)
+                return None
+            self._memory.move_to_end(key_str)
+            self._counters["memory_hits"] += 1
+            return tile
+
+    def _get_from_disk(self, key: TileKey) -> Optional[CachedTile]:
+        """2段目（永続ストア）からタイルを取得し、プロセス内LRUにも載せる"""
+        key_str = key.to_string()
+        now = time.time()
+
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT content, media_type, stored_at, content_encoding FROM tiles WHERE key = ?", (key_str,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+
+            content, media_type, stored_at, content_encoding = row
+            if self._is_expired(stored_at, now):
+                self._delete_from_disk(key_str)
+                self._count("expired", "misses")
+                return None
+
+            # 最終アクセス時刻は一定件数ごとにまとめて書き込む
+            self._pending_access[key_str] = now
+            if len(self._pending_access) >= self.access_flush_entries:
+                self._flush_access_times()
+                self._conn.commit()
+
+        tile = CachedTile(
+            content=bytes(content), media_type=media_type,
+            stored_at=stored_at, content_encoding=content_encoding
+        )
+        with self._lock:
+            self._put_in_memory(key_str, tile)
+            self._counters["disk_hits"] += 1
+        return tile
+
+    def set(self, key: TileKey, content: bytes, media_type: str, content_encoding: Optional[str] = None) -> CachedTile:
+        """タイルを両方のキャッシュに保存し、保存したタイルを返す"""
+        key_str = key.to_string()
+        now = time.time()
+        tile = CachedTile(content=content, media_type=media_type, stored_at=now, content_encoding=content_encoding)
+
+        with self._lock:
+            self._put_in_memory(key_str, tile)
+
+        with self._db_lock:
+            self._delete_from_disk(key_str, commit=False)
+            self._conn.execute(
+                "INSERT INTO tiles (key, content, media_type, content_encoding, stored_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key_str, content, media_type, content_encoding, now, now, len(content))
+            )
+            self._disk_bytes += len(content)
+            self._evict_disk()
+            self._conn.commit()
+        self._count("stores")
+        return tile
+
+    async def aset(
+        self, key: TileKey, content: bytes, media_type: str, content_encoding: Optional[str] = None
+    ) -> CachedTile:
+        """setの非同期版（永続ストアへの書き込みをスレッドプールで実行する）"""
+        return await asyncio.to_thread(self.set, key, content, media_type, content_encoding)
+
+    def flush(self):
+        """未反映の最終アクセス時刻を永続ストアに書き込む"""
+        with self._db_lock:
+            self._flush_access_times()
+            self._conn.commit()
+
+    def clear(self):
+        """全てのキャッシュを削除する"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        with self._db_lock:
+            self._pending_access.clear()
+            self._conn.execute("DELETE FROM tiles")
+            self._conn.commit()
+            self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """ヒット/ミスなどの統計情報を返す"""
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _count(self, *names: str):
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def _flush_access_times(self):
+        if not self._pending_access:
+            return
+        self._conn.executemany(
+            "UPDATE tiles SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key_str) for key_str, accessed_at in self._pending_access.items()]
+        )
+        self._pending_access.clear()
+
+    def _put_in_memory(self, key_str: str, tile: CachedTile):
+        if len(tile.content) > self.memory_max_bytes:
+            return
+        self._remove_from_memory(key_str)
+        self._memory[key_str] = tile
+        self._memory_bytes += len(tile.content)
+
+        # 件数またはバイト数の上限を超えたら古いものから削除
+        while len(self._memory) > self.memory_max_entries or self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.content)
+            self._counters["memory_evictions"] += 1
+
+    def _remove_from_memory(self, key_str: str):
+        tile = self._memory.pop(key_str, None)
+        if tile is not None:
+            self._memory_bytes -= len(tile.content)
+
+    def _delete_from_disk(self, key_str: str, commit: bool = True):
+        self._pending_access.pop(key_str, None)
+        row = self._conn.execute("SELECT size FROM tiles WHERE key = ?", (key_str,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM tiles WHERE key = ?", (key_str,))
+        self._disk_bytes -= row[0]
+        if commit:
+            self._conn.commit()
+
+    def _evict_disk(self):
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        # 上限を超えたら最終アクセスが古いものから削除（未反映のアクセス時刻を先に書き込む）
+        self._flush_access_times()
+        while self._disk_bytes > self.disk_max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM tiles ORDER BY accessed_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._disk_bytes = 0
+                return
+            self._conn.execute("DELETE FROM tiles WHERE key = ?", (row[0],))
+            self._disk_bytes -= row[1]
+            self._count("disk_evictions")
+
+
+@lru_cache()
+def get_tile_cache() -> TileCache:
+    """アプリケーション共有のタイルキャッシュを返す（初回呼び出し時に作成）"""
+    logger.info(f"Tile cache opened: {TILE_CACHE_PATH}")
+    return TileCache(TILE_CACHE_PATH)
@@ -0,0 +1,125 @@
+"""
+URLフロンティアモジュール
+- 取得対象URLを正規化して重複を除き、URLごとに所有者（取得結果の振り分け先）を記録
+- 上限付きキューでワーカーにURLを供給し、ワーカーの処理が追いつくまで投入を待たせる
+- URLのハッシュでシャードに振り分け、複数のプロセスやマシンで取得対象を分担できる
+"""
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Generic, Iterator, List, Optional, TypeVar
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+Owner = TypeVar("Owner")
+
+
+def normalize_url(url: str) -> str:
+    """重複判定用にURLを正規化する（スキーム・ホストの小文字化、フラグメントの除去）"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def shard_index(url: str, shard_count: int) -> int:
+    """
+    URLが属するシャードの番号（0始まり）を返す
+    組み込みのhash()と違い、プロセスやマシンが違っても同じURLは同じシャードになる
+    """
+    digest = hashlib.sha1(normalize_url(url).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+class UrlFrontier(Generic[Owner]):
+    """重複を除いた取得対象URLと、その所有者の一覧を保持するフロンティア"""
+    def __init__(self):
+        self._owners: Dict[str, List[Owner]] = {}
+        self.added_count = 0
+        self._queue: Optional[asyncio.Queue] = None
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._owners)
+
+    def add(self, url: str, owner: Owner) -> bool:
+        """
+        URLを所有者とともに追加する
+
+        Returns:
+            bool: 新しいURLであればTrue（既に追加済みのURLは所有者のみ追加してFalse）
+        """
+        self.added_count += 1
+        key = normalize_url(url)
+        owners = self._owners.get(key)
+        if owners is None:
+            self._owners[key] = [owner]
+            return True
+        owners.append(owner)
+        return False
+
+    def owners(self, url: str) -> List[Owner]:
+        return self._owners.get(normalize_url(url), [])
+
+    @property
+    def duplicate_count(self) -> int:
+        """重複として除外したURLの数"""
+        return self.added_count - len(self._owners)
+
+    @property
+    def queue_depth(self) -> int:
+        """drain中のキューに溜まっているURLの数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def select_shard(self, index: int, shard_count: int) -> "UrlFrontier[Owner]":
+        """
+        指定したシャード（0始まり）に属するURLだけを持つフロンティアを返す
+        追加件数（added_count）はシャード内のURLの所有者の数とする
+        """
+        shard: UrlFrontier[Owner] = UrlFrontier()
+        shard._owners = {url: owners for url, owners in self._owners.items() if shard_index(url, shard_count) == index}
+        shard.added_count = sum(len(owners) for owners in shard._owners.values())
+        return shard
+
+    async def drain(
+        self,
+        handler: Callable[[str, List[Owner]], Awaitable[None]],
+        concurrency: int,
+        queue_size: int
+    ):
+        """
+        全URLを上限付きキュー経由でワーカーに渡し、処理が終わるまで待つ
+
+        Args:
+            handler: (URL, 所有者のリスト) を受け取って処理するコルーチン関数
+            concurrency: ワーカー数
+            queue_size: キューの上限（ワーカーが追いつくまで投入を待たせる）
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._queue = queue
+
+        async def worker():
+            while True:
+                url = await queue.get()
+                try:
+                    if url is None:
+                        return
+                    await handler(url, self._owners[url])
+                except Exception as e:
+                    # 1件の失敗でワーカーが止まり、キューへの投入が詰まらないようにする
+                    logger.error(f"Error while processing {url}: {e}", exc_info=True)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for url in self._owners:
+                await queue.put(url)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            self._queue = None
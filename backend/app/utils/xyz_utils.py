@@ -2,9 +2,19 @@
 XYZタイル座標ユーティリティモジュール
 - 経度緯度↔XYZ 変換
 - タイル境界計算
+- 円（中心・半径）を覆うタイル集合の計算
+- 経度緯度配列↔XYZ 配列のまとめて変換
 """
 import math
 from typing import Dict, List, Tuple
+import numpy as np
+from numpy.typing import ArrayLike
+from .point_to_point_distance import calculate_distance
+
+# 赤道の円周(km)
+EARTH_CIRCUMFERENCE_KM = 40075.016686
+# 経線方向の1度あたりの距離(km)（calculate_distanceの地球半径6371kmに合わせる）
+KM_PER_DEGREE = 2 * math.pi * 6371 / 360
 
 class XYZCoordinate:
     def __init__(self, z: int, x: int, y: int):
@@ -22,6 +32,24 @@ def lon_lat_to_xyz(lon: float, lat: float, z: int) -> Dict[str, int]:
     )
     return {"z": z, "x": x, "y": y}
 
+def lon_lat_to_xyz_array(lons: ArrayLike, lats: ArrayLike, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """経度緯度の配列からXYZタイル座標（x配列, y配列）にまとめて変換（lon_lat_to_xyzの配列版）"""
+    n = 2 ** z
+    lons = np.asarray(lons, dtype=np.float64)
+    lat_rad = (np.asarray(lats, dtype=np.float64) * math.pi) / 180
+    x = np.floor(((lons + 180) / 360) * n)
+    y = np.floor(
+        ((1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / math.pi) / 2) * n
+    )
+    return x.astype(np.int64), y.astype(np.int64)
+
+def xyz_array_to_tile_center_lon_lat(xs: ArrayLike, ys: ArrayLike, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """XYZタイル座標の配列からタイル中心の経度緯度（経度配列, 緯度配列）にまとめて変換"""
+    n = 2 ** z
+    lon = ((np.asarray(xs, dtype=np.float64) + 0.5) / n) * 360 - 180
+    lat_rad = np.arctan(np.sinh(math.pi * (1 - (2 * (np.asarray(ys, dtype=np.float64) + 0.5)) / n)))
+    return lon, (lat_rad * 180) / math.pi
+
 def xyz_to_top_left_lon_lat(xyz: Dict[str, int]) -> Dict[str, float]:
     """タイル左上の経度緯度を返す（lon/lat）"""
     n = 2 ** xyz["z"]
@@ -56,3 +84,34 @@ def normalize_lon(lon: float) -> float:
     while v > 180:
         v -= 360
     return v
+
+
+def tile_area_km2(z: int, lat: float) -> float:
+    """指定緯度付近におけるズームレベルzのタイル1枚の面積(km²)を返す"""
+    width_km = EARTH_CIRCUMFERENCE_KM * math.cos(math.radians(lat)) / (2 ** z)
+    return width_km * width_km
+
+def tiles_covering_circle(lon: float, lat: float, radius_km: float, z: int) -> List[Dict[str, int]]:
+    """
+    中心(lon, lat)・半径radius_kmの円と交差するズームレベルzのタイル一覧を返す
+    """
+    lat_span = radius_km / KM_PER_DEGREE
+    # 検索範囲内で最も極に近い緯度で経度方向の幅を見積もる
+    extreme_lat = min(85.0, max(abs(lat - lat_span), abs(lat + lat_span)))
+    lon_span = lat_span / math.cos(math.radians(extreme_lat))
+
+    max_tile_coord = 2 ** z - 1
+    north_west = lon_lat_to_xyz(lon - lon_span, min(85.0, lat + lat_span), z)
+    south_east = lon_lat_to_xyz(lon + lon_span, max(-85.0, lat - lat_span), z)
+
+    tiles = []
+    for x in range(max(0, north_west["x"]), min(max_tile_coord, south_east["x"]) + 1):
+        for y in range(max(0, north_west["y"]), min(max_tile_coord, south_east["y"]) + 1):
+            xyz = {"z": z, "x": x, "y": y}
+            west, south, east, north = xyz_to_bbox(xyz)
+            # タイル内で円の中心に最も近い点までの距離で交差判定
+            nearest_lon = min(max(lon, west), east)
+            nearest_lat = min(max(lat, south), north)
+            if calculate_distance(lon, lat, nearest_lon, nearest_lat) <= radius_km:
+                tiles.append(xyz)
+    return tiles
@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.api.mlit import get_did
+from backend.app.api.mlit.get_did import (
+    TileStreamingResponse,
+    accepts_compressed,
+    build_tile_response,
+)
+from backend.app.utils import mlit_api
+from backend.app.utils.mbtiles_store import MBTilesStore
+from backend.app.utils.mlit_api import MLITAPIClient
+from backend.app.utils.tile_cache import CachedTile, TileCache, TileKey
+
+DID_KEY = TileKey(api="XKT031", z=12, x=3638, y=1612, response_format="geojson")
+BODY = b'{"type": "FeatureCollection", "features": []}'
+
+
+@pytest.fixture
+def tile_cache(tmp_path, monkeypatch):
+    cache = TileCache(str(tmp_path / "tiles.sqlite3"))
+    monkeypatch.setattr(mlit_api, "get_tile_cache", lambda: cache)
+    return cache
+
+
+class GzipStream(httpx.AsyncByteStream):
+    """圧縮済みの本文（バイト列で渡すと読み込み済みになり、未加工のまま中継できないため）"""
+    async def __aiter__(self):
+        yield gzip.compress(BODY)
+
+
+def gzip_upstream(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200,
+        stream=GzipStream(),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate", True),
+    ("gzip;q=1.0, deflate;q=0.5, br", True),
+    ("*", True),
+    ("gzip", False),
+    ("identity", False),
+    ("", False),
+])
+def test_accepts_compressed(accept_encoding, expected):
+    assert accepts_compressed(accept_encoding) is expected
+
+
+def test_cached_tile_is_forwarded_compressed_or_decoded():
+    tile = CachedTile(content=gzip.compress(BODY), media_type="application/json", stored_at=0.0, content_encoding="gzip")
+
+    compressed = build_tile_response(tile, "application/json", compressed_ok=True)
+    assert compressed.body == tile.content
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+
+    decoded = build_tile_response(tile, "application/json", compressed_ok=False)
+    assert decoded.body == BODY
+    assert "content-encoding" not in decoded.headers
+    assert decoded.media_type == "application/json"
+
+
+@pytest.mark.parametrize("decode", [False, True])
+def test_stream_is_relayed_without_parsing(tile_cache, decode):
+    client = MLITAPIClient()
+    client._client = httpx.AsyncClient(base_url="https://mlit.test", transport=httpx.MockTransport(gzip_upstream))
+
+    async def relay():
+        tile = await client.stream_tile(DID_KEY, decode=decode)
+        response = build_tile_response(tile, "application/json", compressed_ok=not decode)
+        assert isinstance(response, TileStreamingResponse)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        await tile.aclose()
+        await client.close()
+        return response, body
+
+    response, body = asyncio.run(relay())
+    if decode:
+        assert body == BODY
+        assert "content-encoding" not in response.headers
+    else:
+        # 上流の圧縮をそのまま転送する
+        assert gzip.decompress(body) == BODY
+        assert response.headers["content-encoding"] == "gzip"
+
+
+def test_prefetched_store_answers_without_calling_upstream(tmp_path, monkeypatch):
+    store = MBTilesStore(str(tmp_path / "did.mbtiles"))
+    store.put_tile(12, 3638, 1612, BODY)
+    store.mark_missing(12, 3639, 1612)
+    monkeypatch.setattr(get_did, "get_did_tile_store", lambda response_format: store)
+
+    async def upstream_must_not_be_called(*args, **kwargs):
+        raise AssertionError("MLIT API should not be called")
+
+    monkeypatch.setattr(get_did.mlit_api_client, "stream_tile", upstream_must_not_be_called)
+    app = FastAPI()
+    app.include_router(get_did.router)
+    client = TestClient(app)
+
+    stored = client.get("/api/mlit/did", params={"z": 12, "x": 3638, "y": 1612})
+    assert stored.status_code == 200
+    assert stored.content == BODY
+
+    # 上流に存在しないことを確認済みのタイルは空のレスポンスを返す
+    missing = client.get("/api/mlit/did", params={"z": 12, "x": 3639, "y": 1612})
+    assert missing.status_code == 204
+    assert missing.content == b""
+    store.close()
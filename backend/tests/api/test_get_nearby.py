@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.api.stations import get_nearby
+from backend.app.utils.xyz_utils import lon_lat_to_xyz
+
+TOKYO = (139.7671, 35.6812)
+
+
+def station_feature(code, name, lon, lat):
+    return {
+        "type": "Feature",
+        "properties": {"S12_001c": code, "S12_001_ja": name, "S12_002_ja": "会社", "S12_003_ja": "路線"},
+        "geometry": {"type": "LineString", "coordinates": [[lon - 0.0005, lat], [lon + 0.0005, lat]]},
+    }
+
+
+class StubStations:
+    """タイルごとの駅データを返すfetch_stationsの代わり（取得したタイルを記録する）"""
+    def __init__(self, features):
+        self.features = features
+        self.requests = []
+
+    async def __call__(self, z, x, y, timeout=None):
+        self.requests.append((z, x, y))
+        # 駅を含むタイルに加え、隣接タイルにも同じfeatureを返してタイル境界の重複を再現する
+        features = []
+        for feature in self.features:
+            tile = lon_lat_to_xyz(*feature["geometry"]["coordinates"][0], z)
+            if abs(tile["x"] - x) <= 1 and abs(tile["y"] - y) <= 1:
+                features.append(feature)
+        return {"type": "FeatureCollection", "features": features}
+
+
+@pytest.fixture
+def stub_stations(monkeypatch):
+    stub = StubStations([
+        station_feature("1", "東京", *TOKYO),
+        station_feature("2", "神田", 139.7708, 35.6918),
+        station_feature("3", "品川", 139.7387, 35.6285),
+    ])
+    monkeypatch.setattr(get_nearby.mlit_api_client, "fetch_stations", stub)
+    return stub
+
+
+def test_mlit_search_fetches_every_covering_tile_and_dedupes(stub_stations):
+    lon, lat = TOKYO
+    results = asyncio.run(get_nearby.find_nearby_stations_mlit(lon, lat, 2.0))
+
+    tiles = get_nearby.choose_station_tiles(lon, lat, 2.0)
+    assert len(tiles) > 1
+    assert sorted(stub_stations.requests) == sorted((t["z"], t["x"], t["y"]) for t in tiles)
+    # 複数タイルに含まれる駅も1回だけ返し、半径外の駅は含まない
+    assert [station["name"] for station in results] == ["東京", "神田"]
+    assert results[0]["distance_km"] <= results[1]["distance_km"] <= 2.0
+
+
+def test_mlit_batch_matches_single_queries(stub_stations):
+    queries = [(*TOKYO, 2.0), (139.7387, 35.6285, 1.0), (139.7708, 35.6918, 0.5)]
+    batch = asyncio.run(get_nearby.find_nearby_stations_mlit_many(queries))
+    singles = [asyncio.run(get_nearby.find_nearby_stations_mlit(*query)) for query in queries]
+    assert batch == singles
+
+
+def test_mlit_batch_uses_one_zoom_for_all_queries(stub_stations):
+    queries = [(*TOKYO, 5.0), (139.7500, 35.6700, 0.3), (139.7708, 35.6918, 0.3)]
+    asyncio.run(get_nearby.find_nearby_stations_mlit_many(queries))
+
+    z = get_nearby.choose_station_zoom(*queries[0])
+    assert {tile[0] for tile in stub_stations.requests} == {z}
+    # 小さい検索円のタイルは大きい検索円のタイルと共有され、同じタイルは1回だけ取得する
+    assert len(stub_stations.requests) == len(set(stub_stations.requests))
+    assert set(stub_stations.requests) == {
+        (tile["z"], tile["x"], tile["y"]) for tile in get_nearby.tiles_covering_circle(*queries[0], z)
+    }
+
+
+def test_mlit_batch_rejects_too_many_tiles_before_fetching(stub_stations, monkeypatch):
+    monkeypatch.setattr(get_nearby, "MAX_NEARBY_MLIT_BATCH_TILES", 10)
+    app = FastAPI()
+    app.include_router(get_nearby.router)
+    queries = [{"lon": 130.0 + i * 0.5, "lat": 33.0 + i * 0.3, "radius": 10.0} for i in range(5)]
+
+    response = TestClient(app).post(
+        "/api/stations/get_near_by_coordinates/batch", json={"queries": queries, "source": "mlit"}
+    )
+    assert response.status_code == 413
+    assert stub_stations.requests == []
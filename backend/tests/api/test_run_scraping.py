@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.utils.scrape_metrics import scrape_metrics
+
+
+def test_second_request_is_rejected_while_scraping_runs(monkeypatch):
+    started = []
+    # スクレイピングの代わりに、実行中のまま終わらないタスクを登録する
+    monkeypatch.setattr(main, "run_rent_scraping", lambda: started.append(scrape_metrics.snapshot()["status"]))
+    scrape_metrics.reset()
+    client = TestClient(main.app)
+
+    try:
+        assert client.post("/run-scraping").status_code == 200
+        # バックグラウンドタスクの開始前から実行中として扱う
+        assert started == ["running"]
+        assert client.get("/run-scraping/status").json()["status"] == "running"
+        assert client.post("/run-scraping").status_code == 409
+        assert len(started) == 1
+
+        scrape_metrics.finish()
+        assert client.post("/run-scraping").status_code == 200
+        assert len(started) == 2
+    finally:
+        scrape_metrics.reset()
@@ -0,0 +1,71 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.api.stations import get_coordinates_by_stationid
+from backend.app.api.xyz import router as xyz_router
+from backend.app.models.xyz import MAX_BATCH_SIZE
+from backend.app.utils.station_repository import StationRecord, StationRepository
+from backend.app.utils.xyz_utils import lon_lat_to_xyz, xyz_to_tile_center_lon_lat
+
+app = FastAPI()
+app.include_router(xyz_router)
+app.include_router(get_coordinates_by_stationid.router)
+client = TestClient(app)
+
+
+def test_lon_lat_to_xyz_batch_matches_single_endpoint_and_reports_errors():
+    points = [
+        {"lon": 139.7671, "lat": 35.6812, "z": 15},
+        {"lon": 135.4959, "lat": 34.7024, "z": 11},
+        {"lon": 139.7671, "lat": 35.6812, "z": 25},
+        {"lon": 181.0, "lat": 35.0, "z": 10},
+        {"lon": 139.0, "lat": 89.0, "z": 10},
+    ]
+    response = client.post("/api/xyz/lon-lat-to-xyz/batch", json={"points": points})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(points)
+    for point, result in zip(points[:2], results[:2]):
+        assert result == lon_lat_to_xyz(point["lon"], point["lat"], point["z"])
+        single = client.get("/api/xyz/lon-lat-to-xyz", params=point).json()
+        assert result == single
+    # 変換できない点はerrorのみを返し、他の点の変換は続ける
+    assert all(set(result) == {"error"} for result in results[2:])
+
+
+def test_tile_center_batch_matches_scalar_and_reports_errors():
+    tiles = [{"x": 29100, "y": 12903, "z": 15}, {"x": 0, "y": 0, "z": 0}, {"x": 4, "y": 0, "z": 2}]
+    response = client.post("/api/xyz/tile-center/batch", json={"tiles": tiles})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    for tile, result in zip(tiles[:2], results[:2]):
+        expected = xyz_to_tile_center_lon_lat(tile)
+        assert result["lon"] == pytest.approx(expected["lon"], abs=1e-12)
+        assert result["lat"] == pytest.approx(expected["lat"], abs=1e-12)
+    assert set(results[2]) == {"error"}
+
+
+@pytest.mark.parametrize("size", [0, MAX_BATCH_SIZE + 1])
+def test_batch_size_is_limited(size):
+    points = [{"lon": 139.0, "lat": 35.0, "z": 10}] * size
+    assert client.post("/api/xyz/lon-lat-to-xyz/batch", json={"points": points}).status_code == 422
+
+
+def test_station_coordinates_batch_keeps_request_order(monkeypatch):
+    repository = StationRepository([
+        StationRecord("003700", "東京", "山手線", "東日本旅客鉄道", 139.7671, 35.6812),
+        StationRecord("900000", "大阪", "大阪環状線", "西日本旅客鉄道", 135.4959, 34.7024),
+    ])
+    monkeypatch.setattr(get_coordinates_by_stationid, "get_station_repository", lambda: repository)
+
+    response = client.post(
+        "/api/stations/get_coordinates_by_stationid/batch",
+        json={"station_ids": ["900000", "missing", "003700"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"station_id": "900000", "coordinates": {"lng": 135.4959, "lat": 34.7024}},
+        {"station_id": "missing", "error": "指定された駅IDが見つかりません"},
+        {"station_id": "003700", "coordinates": {"lng": 139.7671, "lat": 35.6812}},
+    ]
@@ -0,0 +1,74 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.app.utils.columnar_store import (
+    columnar_path,
+    read_frame,
+    read_records,
+    write_columnar_companion,
+    write_frame,
+)
+
+RECORDS = [
+    {"company": "東日本旅客鉄道", "line": "山手線", "station": "東京", "stationcode": "003700",
+     "coordinates": [139.7671, 35.6812], "rent": 11.3, "count": 3, "open": True, "note": None, "tags": ["a"]},
+    {"company": "東京地下鉄", "line": "丸ノ内線", "station": "東京", "stationcode": "004500",
+     "coordinates": [139.7645, 35.6818], "rent": None, "count": 5, "open": False, "note": "改装中", "tags": {"b": 1}},
+    {"company": "東日本旅客鉄道", "line": "山手線", "station": "神田", "stationcode": "003701",
+     "coordinates": [139.7708, 35.6918], "rent": 9.8, "count": 1, "open": True, "note": "", "tags": []},
+]
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = tmp_path / "stationcode.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(RECORDS, f, ensure_ascii=False, indent=4)
+    return str(path)
+
+
+def test_round_trip_matches_read_json(json_path):
+    directory = write_columnar_companion(json_path)
+    assert directory == columnar_path(json_path) and os.path.isdir(directory)
+
+    expected = pd.read_json(json_path)
+    frame = read_records(json_path)
+    pd.testing.assert_frame_equal(frame, expected)
+    assert frame["coordinates"].tolist() == [record["coordinates"] for record in RECORDS]
+
+    # メモリマップした列を変更してもストアは変わらない
+    frame.loc[0, "count"] = 100
+    pd.testing.assert_frame_equal(read_frame(directory), expected)
+
+
+def test_stale_or_broken_store_falls_back_to_json(json_path):
+    directory = write_columnar_companion(json_path)
+
+    records = RECORDS[:2]
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+    # JSONが更新されたのでストアは使わない
+    pd.testing.assert_frame_equal(read_records(json_path), pd.read_json(json_path))
+
+    write_columnar_companion(json_path)
+    os.remove(os.path.join(directory, "col-0000.npy"))
+    pd.testing.assert_frame_equal(read_records(json_path), pd.read_json(json_path))
+
+
+def test_write_frame_rejects_custom_index(tmp_path):
+    with pytest.raises(ValueError):
+        write_frame(pd.DataFrame({"a": [1, 2]}, index=[3, 4]), str(tmp_path / "frame.columns"))
+
+
+def test_write_frame_replaces_existing_store(tmp_path):
+    directory = str(tmp_path / "frame.columns")
+    write_frame(pd.DataFrame({"a": np.arange(3), "b": ["x", None, "y"]}), directory)
+    replacement = pd.DataFrame({"c": [1.5]})
+    write_frame(replacement, directory)
+    pd.testing.assert_frame_equal(read_frame(directory), replacement)
+    assert os.listdir(tmp_path) == ["frame.columns"]
+    assert write_columnar_companion(str(tmp_path / "missing.json")) is None
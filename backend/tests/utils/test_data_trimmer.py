@@ -0,0 +1,94 @@
+import copy
+import json
+import random
+
+from backend.app.utils import data_trimmer
+from backend.app.utils.station_data_writer import render_json_array_item, write_rendered_json_array_atomic
+
+
+def write_station_geojson(path, count: int):
+    rng = random.Random(0)
+    features = []
+    for i in range(count):
+        geometry = {
+            "type": "LineString",
+            "coordinates": [[rng.uniform(122.0, 146.0), rng.uniform(24.0, 46.0)] for _ in range(rng.randint(2, 5))],
+        }
+        if i % 11 == 0:
+            geometry["coordinates"] = []
+        if i % 13 == 0:
+            geometry = {"type": "Point", "coordinates": [139.7, 35.6]}
+        features.append({
+            "type": "Feature",
+            "properties": {"N02_004": f"会社{i % 3}", "N02_003": f"路線{i % 7}", "N02_005": f"駅{i}", "N02_005c": f"{i:06d}"},
+            "geometry": geometry,
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, ensure_ascii=False)
+
+
+def station_config(tmp_path, output_name: str):
+    class Config(data_trimmer.StationCodeConfig):
+        input_file_path = str(tmp_path / "stations.geojson")
+        output_file_path = str(tmp_path / output_name)
+        processor_specific_config = copy.deepcopy(data_trimmer.StationCodeConfig.processor_specific_config)
+
+    Config.processor_specific_config["geometry_config"]["centroid_batch_size"] = 7
+    return Config
+
+
+def test_parallel_output_and_log_match_serial(tmp_path, capsys):
+    write_station_geojson(tmp_path / "stations.geojson", 200)
+    config = station_config(tmp_path, "stationcode.json")
+
+    data_trimmer._process_and_save(config, max_processes=1)
+    serial_log = capsys.readouterr().out
+    with open(config.output_file_path, "rb") as f:
+        serial = f.read()
+
+    data_trimmer._process_and_save(config, max_processes=2)
+    assert capsys.readouterr().out == serial_log
+    with open(config.output_file_path, "rb") as f:
+        assert f.read() == serial
+
+    records = json.loads(serial)
+    assert len(records) == 200 - len({i for i in range(200) if i % 11 == 0 or i % 13 == 0})
+    assert "geometry issues" in serial_log
+
+
+def test_rendered_items_match_json_dump(tmp_path):
+    records = [{"station": "東京", "coordinates": [139.7671, 35.6812], "nested": {"a": [1, {}], "b": []}}, {}]
+    path = str(tmp_path / "rendered.json")
+    write_rendered_json_array_atomic(map(render_json_array_item, records), path)
+    with open(path, "r", encoding="utf-8") as f:
+        assert f.read() == json.dumps(records, ensure_ascii=False, indent=4)
+
+
+def test_main_runs_serially_by_default(tmp_path, monkeypatch):
+    write_station_geojson(tmp_path / "stations.geojson", 20)
+    configs = [station_config(tmp_path, "a.json"), station_config(tmp_path, "b.json")]
+    monkeypatch.setattr(data_trimmer, "ALL_CONFIGS", configs)
+    # CPUコア数が多い環境でも、既定では並列処理しない
+    monkeypatch.setattr(data_trimmer.os, "cpu_count", lambda: 8)
+
+    def no_process_pool(*args, **kwargs):
+        raise AssertionError("ProcessPoolExecutor should not be used by default")
+
+    monkeypatch.setattr(data_trimmer, "ProcessPoolExecutor", no_process_pool)
+    data_trimmer.main()
+    for config in configs:
+        with open(config.output_file_path, encoding="utf-8") as f:
+            assert len(json.load(f)) > 0
+
+
+def test_output_directory_created_concurrently_is_not_an_error(tmp_path, monkeypatch, capsys):
+    write_station_geojson(tmp_path / "stations.geojson", 20)
+    config = station_config(tmp_path, "out/stationcode.json")
+    # 存在を確認した直後に別のプロセスがディレクトリを作成した場合を再現する
+    (tmp_path / "out").mkdir()
+    monkeypatch.setattr(data_trimmer.os.path, "exists", lambda path: False)
+
+    data_trimmer._process_and_save(config)
+    assert "unexpected error" not in capsys.readouterr().out
+    with open(config.output_file_path, encoding="utf-8") as f:
+        assert len(json.load(f)) > 0
@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from backend.app.utils.did_tile_prefetcher import _fetch_did_tile, iter_did_tiles, prefetch_did_tiles
+from backend.app.utils.mbtiles_store import MBTilesStore, xyz_to_tms_row
+
+# 大阪周辺の小さな範囲（ズーム9〜10で数タイル）
+TEST_BBOX = (135.3, 34.5, 135.7, 34.8)
+
+
+class StubMLITHandler(BaseHTTPRequestHandler):
+    """XKT031を模したスタブサーバー（x座標が奇数のタイルは404を返す）"""
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        StubMLITHandler.requests.append((url.path, params))
+
+        if int(params["x"]) % 2 == 1:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = json.dumps({"type": "FeatureCollection", "features": [], "tile": params}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubMLITHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMLITHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def run_prefetch(store, base_url):
+    return asyncio.run(prefetch_did_tiles(
+        store,
+        response_format="geojson",
+        bboxes=[TEST_BBOX],
+        min_zoom=9,
+        max_zoom=10,
+        base_url=base_url,
+        api_key="test-key",
+        rate=1000.0,
+        burst=10,
+        concurrency=2,
+        retry_base_delay=0.0
+    ))
+
+
+def test_iter_did_tiles_dedupes_overlapping_bboxes():
+    tiles = list(iter_did_tiles([TEST_BBOX, TEST_BBOX], 9, 10))
+    assert len(tiles) == len(set(tiles))
+    assert tiles == list(iter_did_tiles([TEST_BBOX], 9, 10))
+
+
+def test_prefetch_stores_tiles_and_resumes(stub_server, tmp_path):
+    store = MBTilesStore(str(tmp_path / "did.mbtiles"))
+    expected_tiles = list(iter_did_tiles([TEST_BBOX], 9, 10))
+
+    stats = run_prefetch(store, stub_server)
+
+    assert len(StubMLITHandler.requests) == len(expected_tiles)
+    assert all(path == "/XKT031" for path, _ in StubMLITHandler.requests)
+    assert stats["fetched"] + stats["missing"] == len(expected_tiles)
+    assert stats["failed"] == 0
+    assert store.count_tiles() == stats["fetched"]
+
+    for z, x, y in expected_tiles:
+        tile_data = store.get_tile(z, x, y)
+        if x % 2 == 1:
+            assert tile_data is None
+        else:
+            assert json.loads(gzip.decompress(tile_data))["tile"] == {
+                "response_format": "geojson", "z": str(z), "x": str(x), "y": str(y)
+            }
+
+    # 再実行時は取得済みのタイルに対してリクエストしない
+    StubMLITHandler.requests = []
+    stats = run_prefetch(store, stub_server)
+    assert StubMLITHandler.requests == []
+    assert stats["skipped"] == len(expected_tiles)
+    assert store.get_metadata()["maxzoom"] == "10"
+    store.close()
+
+
+class RecordingLimiter:
+    """トークンを待たずに払い出し、pauseの呼び出しを記録するレートリミッター"""
+    def __init__(self):
+        self.pauses = []
+
+    async def acquire(self):
+        pass
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+def fetch_with_responses(tmp_path, responses, retry_base_delay=0.01):
+    store = MBTilesStore(str(tmp_path / "did.mbtiles"))
+    limiter = RecordingLimiter()
+    stats = {"fetched": 0, "missing": 0, "skipped": 0, "failed": 0}
+    remaining = list(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return remaining.pop(0)
+
+    async def fetch():
+        async with httpx.AsyncClient(base_url="https://mlit.test", transport=httpx.MockTransport(handler)) as client:
+            await _fetch_did_tile(
+                client, limiter, store, "geojson", (9, 455, 201), stats, asyncio.Event(), 3, retry_base_delay
+            )
+
+    asyncio.run(fetch())
+    assert remaining == []
+    return store, limiter, stats
+
+
+def test_rate_limited_fetch_waits_for_retry_after_and_pauses_limiter(tmp_path):
+    store, limiter, stats = fetch_with_responses(tmp_path, [
+        httpx.Response(429, headers={"Retry-After": "0.05"}),
+        httpx.Response(200, content=b"{}"),
+    ])
+    assert stats["fetched"] == 1
+    assert store.get_tile(9, 455, 201) is not None
+    # Retry-Afterが指数バックオフより長ければRetry-Afterに従い、他のワーカーも止める
+    assert limiter.pauses == [0.05]
+    store.close()
+
+
+def test_server_error_without_retry_after_uses_backoff_only(tmp_path):
+    store, limiter, stats = fetch_with_responses(tmp_path, [
+        httpx.Response(503),
+        httpx.Response(204),
+    ])
+    assert stats["missing"] == 1
+    assert store.is_missing(9, 455, 201)
+    assert limiter.pauses == []
+    store.close()
+
+
+def test_xyz_to_tms_row_flips_y_axis():
+    assert xyz_to_tms_row(0, 0) == 0
+    assert xyz_to_tms_row(10, 0) == 1023
+    assert xyz_to_tms_row(10, 1023) == 0
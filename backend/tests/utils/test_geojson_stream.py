@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+from backend.app.utils.geojson_stream import iter_geojson_features
+
+FEATURES = [
+    {
+        "type": "Feature",
+        "properties": {"N02_005": "東京", "N02_003": "山手線", "note": "引用符 \" と \\ と ]}, を含む"},
+        "geometry": {"type": "LineString", "coordinates": [[139.76712345678, 35.68123456789], [139.7708, 35.6918]]},
+    },
+    {"type": "Feature", "properties": {}, "geometry": None},
+    {
+        "type": "Feature",
+        "properties": {"count": 1234567890, "ratio": -1.5e-7, "flag": True, "missing": None},
+        "geometry": {"type": "Point", "coordinates": [140, 36]},
+    },
+]
+DOCUMENT = json.dumps(
+    {"type": "FeatureCollection", "name": "N02-22", "crs": {"type": "name"}, "features": FEATURES, "after": [1, 2]},
+    ensure_ascii=False,
+    indent=2,
+)
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 2, 3, 7, 64, len(DOCUMENT)])
+def test_features_match_json_load_at_any_chunk_boundary(chunk_chars):
+    assert list(iter_geojson_features(io.StringIO(DOCUMENT), chunk_chars)) == FEATURES
+
+
+def test_numbers_split_across_chunks_are_read_whole():
+    document = '{"features": [1234567890, -0.000125, 6.02e23, 7]}'
+    expected = json.loads(document)["features"]
+    for chunk_chars in range(1, len(document) + 1):
+        assert list(iter_geojson_features(io.StringIO(document), chunk_chars)) == expected
+
+
+def test_empty_and_missing_features():
+    assert list(iter_geojson_features(io.StringIO('{"type": "FeatureCollection", "features": []}'), 4)) == []
+    assert list(iter_geojson_features(io.StringIO('{}'), 4)) == []
+
+
+@pytest.mark.parametrize("document, error", [
+    ('[{"type": "Feature"}]', ValueError),
+    ('{"features": {"type": "Feature"}}', ValueError),
+    ('{"features": [{"type": "Feature"}, {"type": ', json.JSONDecodeError),
+    ('{"features": [1 2]}', ValueError),
+])
+def test_invalid_documents_raise(document, error):
+    with pytest.raises(error):
+        list(iter_geojson_features(io.StringIO(document), 3))
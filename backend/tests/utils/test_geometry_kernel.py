@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from backend.app.utils.geometry_kernel import MIN_BATCH_SPLIT_FEATURES, GeometryDiagnostics, calculate_centroids
+
+
+def reference_average_coordinates(coordinates):
+    """ベクトル化前の data_trimmer._calculate_average_coordinates（ログ出力を除く）"""
+    if not coordinates or not isinstance(coordinates, list):
+        return None
+
+    flat_points = []
+
+    def flatten(coords):
+        if isinstance(coords, list) and len(coords) > 0 and isinstance(coords[0], (int, float)):
+            flat_points.append(coords)
+        elif isinstance(coords, list):
+            for item in coords:
+                flatten(item)
+
+    flatten(coordinates)
+    if not flat_points:
+        return None
+
+    sum_lon, sum_lat = 0.0, 0.0
+    num_points = 0
+    for point_pair in flat_points:
+        try:
+            if isinstance(point_pair, list) and len(point_pair) >= 2:
+                lon = float(point_pair[0])
+                lat = float(point_pair[1])
+                sum_lon += lon
+                sum_lat += lat
+                num_points += 1
+            else:
+                raise TypeError("Point is not a list of two numbers")
+        except (ValueError, TypeError, IndexError):
+            pass
+    if num_points > 0:
+        return [sum_lon / num_points, sum_lat / num_points]
+    return None
+
+
+def random_point(rng):
+    return [rng.uniform(122.0, 146.0), rng.uniform(24.0, 46.0)]
+
+
+def random_coordinates(rng, dirty: bool):
+    kind = rng.randrange(4)
+    if kind == 0:
+        coordinates = [random_point(rng) for _ in range(rng.randint(2, 6))]
+    elif kind == 1:
+        coordinates = [[random_point(rng) for _ in range(rng.randint(2, 4))] for _ in range(rng.randint(1, 3))]
+    elif kind == 2:
+        coordinates = [[[random_point(rng) for _ in range(4)]]]
+    else:
+        coordinates = random_point(rng)
+    if not dirty or rng.random() < 0.5:
+        return coordinates
+    return rng.choice([
+        [],
+        None,
+        "139.7,35.6",
+        [[139, 35], [140, 36, 12.5]],
+        [[139.7], [139.8, 35.7]],
+        [[True, 35.0], [139.8, 35.7]],
+        [["139.7", 35.6], [139.8, 35.7]],
+        [[139.7, "x"], [[139.8, 35.7]]],
+        [[[]], [[139.8, 35.7]]],
+        [[float("nan"), 35.0], [139.8, 35.7]],
+    ])
+
+
+@pytest.mark.parametrize("dirty", [False, True])
+def test_centroids_match_per_feature_reference(dirty):
+    rng = random.Random(0)
+    coordinates_list = [random_coordinates(rng, dirty) for _ in range(MIN_BATCH_SPLIT_FEATURES * 20 + 3)]
+    feature_ids = [str(i) for i in range(len(coordinates_list))]
+
+    centroids = calculate_centroids(coordinates_list, feature_ids, GeometryDiagnostics())
+    assert len(centroids) == len(coordinates_list)
+    for coordinates, centroid in zip(coordinates_list, centroids):
+        expected = reference_average_coordinates(coordinates)
+        if expected is None:
+            assert centroid is None, coordinates
+        else:
+            assert centroid == pytest.approx(expected, rel=1e-12, nan_ok=True), coordinates
+
+
+def test_empty_input():
+    assert calculate_centroids([], [], GeometryDiagnostics()) == []
@@ -0,0 +1,39 @@
+import pytest
+
+from backend.app.utils.html_extractor_benchmark import (
+    DEFAULT_FIXTURE_DIR,
+    FIXTURE_BASE_URL,
+    extract_all,
+    load_fixture_pages,
+)
+from backend.app.utils.html_extractors import HTML_EXTRACTORS, get_html_extractor
+
+PAGES = load_fixture_pages(DEFAULT_FIXTURE_DIR)
+
+
+@pytest.mark.parametrize("name", list(HTML_EXTRACTORS))
+def test_extractors_match_full_tree_parse(name):
+    assert extract_all(get_html_extractor(name), PAGES) == extract_all(get_html_extractor("bs4"), PAGES)
+
+
+@pytest.mark.parametrize("name", list(HTML_EXTRACTORS))
+def test_extractor_reads_fixture_pages(name):
+    extractor = get_html_extractor(name)
+    html = {url.rsplit("/", 1)[-1]: html for url, _, html in PAGES}
+
+    prefectures = extractor.extract_prefectures(html["soba_top.html"], FIXTURE_BASE_URL)
+    assert prefectures[0].name == "北海道"
+    assert prefectures[0].url == "https://suumo.jp/chintai/soba/hokkaido/ensen/"
+
+    lines = extractor.extract_lines(html["ensen_tokyo.html"], FIXTURE_BASE_URL)
+    assert "ダミー" not in lines
+    assert lines["JR東日本"][0].url == "https://suumo.jp/chintai/soba/tokyo/en_0_0/"
+
+    rents = extractor.extract_station_rents(html["line_tokyo_yamanote.html"], FIXTURE_BASE_URL)
+    assert rents[5].station == "欠損駅"
+    assert rents[5].rent == "不明"
+
+
+def test_unknown_extractor_is_rejected():
+    with pytest.raises(ValueError):
+        get_html_extractor("unknown")
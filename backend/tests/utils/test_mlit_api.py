@@ -0,0 +1,294 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend.app.exceptions.station import MLITGatewayTimeoutError, MLITUnauthorizedError
+from backend.app.utils import mlit_api
+from backend.app.utils.mlit_api import MLITAPIClient
+from backend.app.utils.tile_cache import CachedTile, TileCache, TileKey
+
+STATION_KEY = TileKey(api="XKT015", z=18, x=232837, y=103222, response_format="geojson")
+DID_KEY = TileKey(api="XKT031", z=12, x=3638, y=1612, response_format="geojson")
+
+
+class StubUpstream:
+    """MLIT APIを模したMockTransportのハンドラ（リクエストを記録する）"""
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        body = json.dumps({"type": "FeatureCollection", "features": [], "path": request.url.path}).encode()
+        return httpx.Response(200, content=body, headers={"Content-Type": "application/json"})
+
+
+@pytest.fixture
+def tile_cache(tmp_path, monkeypatch):
+    cache = TileCache(str(tmp_path / "tiles.sqlite3"))
+    monkeypatch.setattr(mlit_api, "get_tile_cache", lambda: cache)
+    return cache
+
+
+def make_client(upstream: StubUpstream) -> MLITAPIClient:
+    client = MLITAPIClient()
+    client._client = httpx.AsyncClient(base_url="https://mlit.test", transport=httpx.MockTransport(upstream))
+    return client
+
+
+def test_fetch_tile_on_cache_miss_stores_and_returns_tile(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_API_KEY", "test-key")
+    upstream = StubUpstream()
+    client = make_client(upstream)
+
+    async def fetch_twice():
+        first = await client.fetch_tile(STATION_KEY)
+        second = await client.fetch_tile(STATION_KEY)
+        await client.close()
+        return first, second
+
+    first, second = asyncio.run(fetch_twice())
+    assert isinstance(first, CachedTile)
+    assert json.loads(first.content)["path"] == "/XKT015"
+    assert first.media_type == "application/json"
+    # 2回目はキャッシュから返し、上流には問い合わせない
+    assert second.content == first.content
+    assert len(upstream.requests) == 1
+    assert upstream.requests[0].headers["Ocp-Apim-Subscription-Key"] == "test-key"
+    assert tile_cache.get(STATION_KEY).content == first.content
+
+
+def test_did_tiles_do_not_require_api_key(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_API_KEY", None)
+    upstream = StubUpstream()
+    client = make_client(upstream)
+
+    async def fetch():
+        did_tile = await client.fetch_tile(DID_KEY)
+        with pytest.raises(MLITUnauthorizedError):
+            await client.fetch_tile(STATION_KEY)
+        await client.close()
+        return did_tile
+
+    did_tile = asyncio.run(fetch())
+    assert json.loads(did_tile.content)["path"] == "/XKT031"
+    assert len(upstream.requests) == 1
+    assert "Ocp-Apim-Subscription-Key" not in upstream.requests[0].headers
+
+
+def test_concurrent_fetches_share_one_upstream_request(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_API_KEY", "test-key")
+    upstream = StubUpstream(delay=0.05)
+    client = make_client(upstream)
+
+    async def fetch_concurrently():
+        tiles = await asyncio.gather(*(client.fetch_tile(STATION_KEY) for _ in range(10)))
+        in_flight = dict(client._in_flight)
+        await client.close()
+        return tiles, in_flight
+
+    tiles, in_flight = asyncio.run(fetch_concurrently())
+    assert len(upstream.requests) == 1
+    assert all(isinstance(tile, CachedTile) for tile in tiles)
+    assert len({tile.content for tile in tiles}) == 1
+    assert json.loads(tiles[0].content)["path"] == "/XKT015"
+    assert in_flight == {}
+
+
+def test_cancelled_caller_does_not_cancel_shared_fetch(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_API_KEY", "test-key")
+    upstream = StubUpstream(delay=0.05)
+    client = make_client(upstream)
+
+    async def cancel_first_caller():
+        first = asyncio.ensure_future(client.fetch_tile(STATION_KEY))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(client.fetch_tile(STATION_KEY))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        tile = await second
+        await client.close()
+        return tile
+
+    tile = asyncio.run(cancel_first_caller())
+    assert isinstance(tile, CachedTile)
+    assert len(upstream.requests) == 1
+
+
+class TrackingStream(httpx.AsyncByteStream):
+    """閉じられたかを記録するレスポンス本文"""
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StreamingUpstream(StubUpstream):
+    def __init__(self):
+        super().__init__()
+        self.streams = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        stream = TrackingStream([b'{"type": "FeatureCollection", ', b'"features": []}'])
+        self.streams.append(stream)
+        return httpx.Response(200, stream=stream, headers={"Content-Type": "application/json"})
+
+
+def test_consumed_stream_is_cached_and_shared(tile_cache):
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def stream_with_follower():
+        stream = await client.stream_tile(DID_KEY)
+        follower = asyncio.ensure_future(client.fetch_tile(DID_KEY))
+        await asyncio.sleep(0)
+        body = b"".join([chunk async for chunk in stream.chunks])
+        await stream.aclose()
+        tile = await follower
+        await client.close()
+        return body, tile
+
+    body, tile = asyncio.run(stream_with_follower())
+    assert body == b'{"type": "FeatureCollection", "features": []}'
+    assert tile.content == body
+    assert len(upstream.requests) == 1
+    assert upstream.streams[0].closed
+    assert tile_cache.get(DID_KEY).content == body
+
+
+def test_stream_over_cache_limit_is_shared_with_followers_but_not_cached(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_STREAM_CACHE_MAX_BYTES", 8)
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def stream_with_followers():
+        stream = await client.stream_tile(DID_KEY)
+        followers = [asyncio.ensure_future(client.fetch_tile(DID_KEY)) for _ in range(3)]
+        # キャッシュの確認を終えて中継の結果を待ち始めるまで待つ
+        while sum(client._followers.values()) < 3:
+            await asyncio.sleep(0.01)
+        body = b"".join([chunk async for chunk in stream.chunks])
+        await stream.aclose()
+        tiles = await asyncio.wait_for(asyncio.gather(*followers), 1.0)
+        await client.close()
+        return body, tiles
+
+    body, tiles = asyncio.run(stream_with_followers())
+    assert body == b'{"type": "FeatureCollection", "features": []}'
+    # 上限を超えても待機中のリクエストは中継の結果を共有し、上流には1回だけ問い合わせる
+    assert [tile.content for tile in tiles] == [body] * 3
+    assert len(upstream.requests) == 1
+    assert tile_cache.get(DID_KEY) is None
+    assert client._in_flight == {}
+    assert client._followers == {}
+
+
+def test_stream_over_cache_limit_without_followers_is_not_buffered(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_STREAM_CACHE_MAX_BYTES", 8)
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def stream_alone():
+        stream = await client.stream_tile(DID_KEY)
+        chunks = stream.chunks.__aiter__()
+        body = await chunks.__anext__()
+        # 上限を超えた時点で待機者がいなければ、以降のリクエストはこの中継を待たない
+        in_flight = dict(client._in_flight)
+        body += b"".join([chunk async for chunk in chunks])
+        await stream.aclose()
+        await client.close()
+        return body, in_flight
+
+    body, in_flight = asyncio.run(stream_alone())
+    assert body == b'{"type": "FeatureCollection", "features": []}'
+    assert in_flight == {}
+    assert tile_cache.get(DID_KEY) is None
+
+
+def test_unconsumed_stream_releases_followers_and_connection(tile_cache):
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def abandon_stream():
+        stream = await client.stream_tile(DID_KEY)
+        follower = asyncio.ensure_future(client.fetch_tile(DID_KEY))
+        await asyncio.sleep(0)
+        # クライアントが本文を受け取る前に切断した場合と同じく、本文を読まずに閉じる
+        await stream.aclose()
+        tile = await asyncio.wait_for(follower, 1.0)
+        await client.close()
+        return tile
+
+    tile = asyncio.run(abandon_stream())
+    assert upstream.streams[0].closed
+    # 待機していたリクエストは改めて取得する
+    assert len(upstream.requests) == 2
+    assert tile.content == b'{"type": "FeatureCollection", "features": []}'
+    assert client._in_flight == {}
+
+
+def test_stream_never_started_is_closed_after_timeout(tile_cache, monkeypatch):
+    monkeypatch.setattr(mlit_api, "MLIT_STREAM_START_TIMEOUT_SECONDS", 0.05)
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def leak_stream():
+        await client.stream_tile(DID_KEY)
+        await asyncio.sleep(0.2)
+        in_flight = dict(client._in_flight)
+        await client.close()
+        return in_flight
+
+    assert asyncio.run(leak_stream()) == {}
+    assert upstream.streams[0].closed
+
+
+def test_follower_wait_is_bounded_by_timeout(tile_cache):
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def wait_for_stuck_stream():
+        stream = await client.stream_tile(DID_KEY)
+        with pytest.raises(MLITGatewayTimeoutError):
+            await client.fetch_tile(DID_KEY, timeout=0.05)
+        await stream.aclose()
+        await client.close()
+
+    asyncio.run(wait_for_stuck_stream())
+
+
+def test_streaming_response_closes_stream_when_client_disconnects(tile_cache):
+    from backend.app.api.mlit.get_did import TileStreamingResponse
+
+    upstream = StreamingUpstream()
+    client = make_client(upstream)
+
+    async def disconnect_before_body():
+        stream = await client.stream_tile(DID_KEY)
+        response = TileStreamingResponse(stream, media_type="application/json")
+
+        async def send(message):
+            raise OSError("client disconnected")
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        with pytest.raises(Exception):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        in_flight = dict(client._in_flight)
+        await client.close()
+        return in_flight
+
+    assert asyncio.run(disconnect_before_body()) == {}
+    assert upstream.streams[0].closed
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from backend.app.utils import normalization_helper
+from backend.app.utils.normalization_helper import (
+    NormalizationContext,
+    generate_all_comparison_files,
+    generate_company_comparison_files,
+    generate_line_comparison_files,
+    generate_station_comparison_files,
+    get_normalization_context,
+)
+
+MAIN = [
+    {"company": "東日本旅客鉄道", "line": "山手線", "station": "東京", "stationcode": "003700"},
+    {"company": "東日本旅客鉄道", "line": "山手線", "station": "東京", "stationcode": "003700"},
+    {"company": "東京地下鉄", "line": "丸ノ内線", "station": "ＡＢＣ　駅", "stationcode": "004500"},
+]
+LOOKUP = [
+    {"company": "JR", "line": "山手線", "station": "東京", "rent": 11.3},
+    {"company": "東京メトロ", "line": "丸ノ内線", "station": "abc駅", "rent": 9.8},
+    {"company": "東急電鉄", "line": "東横線", "station": "渋谷", "rent": 12.0},
+]
+
+
+def write_json(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+    return str(path)
+
+
+@pytest.fixture
+def data_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(normalization_helper, "_context_cache", {})
+    return write_json(tmp_path / "main.json", MAIN), write_json(tmp_path / "lookup.json", LOOKUP)
+
+
+def test_context_is_reused_until_an_input_changes(data_paths):
+    main_path, lookup_path = data_paths
+    context = get_normalization_context(main_path, lookup_path)
+    assert get_normalization_context(main_path, lookup_path) is context
+    assert context.df_main["norm_station"].tolist() == ["東京", "abc駅"]
+    assert context.normalized() is context.normalized()
+    assert context.normalized()[1]["norm_company"].tolist() == ["jr", "東京メトロ", "東急電鉄"]
+
+    write_json(lookup_path, LOOKUP[:2])
+    updated = get_normalization_context(main_path, lookup_path)
+    assert updated is not context
+    assert len(updated.df_lookup) == 2
+    assert get_normalization_context(main_path, lookup_path) is updated
+
+
+def test_failed_loads_are_not_cached(data_paths, tmp_path):
+    main_path, lookup_path = data_paths
+    broken_path = write_json(tmp_path / "broken.json", [{"company": "東日本旅客鉄道"}])
+    assert get_normalization_context(main_path, broken_path).empty
+    assert get_normalization_context(main_path, str(tmp_path / "missing.json")).empty
+
+    write_json(broken_path, LOOKUP)
+    assert not get_normalization_context(main_path, broken_path).empty
+
+
+def test_shared_context_writes_the_same_files_as_separate_runs(data_paths, tmp_path):
+    main_path, lookup_path = data_paths
+    shared_dir, separate_dir = str(tmp_path / "shared"), str(tmp_path / "separate")
+    generate_all_comparison_files(main_path, lookup_path, shared_dir)
+    for generate in (generate_company_comparison_files, generate_line_comparison_files, generate_station_comparison_files):
+        generate(main_path, lookup_path, separate_dir, context=NormalizationContext(main_path, lookup_path))
+
+    names = sorted(os.listdir(shared_dir))
+    assert names == sorted(os.listdir(separate_dir)) and len(names) == 3
+    for name in names:
+        pd.testing.assert_frame_equal(
+            pd.read_csv(os.path.join(shared_dir, name)), pd.read_csv(os.path.join(separate_dir, name))
+        )
+    company = pd.read_csv(os.path.join(shared_dir, "company_normalized_comparison.csv"))
+    assert company["company_normalized_lookup_only"].dropna().tolist() == ["東急電鉄"]
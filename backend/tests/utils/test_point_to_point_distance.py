@@ -0,0 +1,30 @@
+import numpy as np
+
+from backend.app.utils.point_to_point_distance import (
+    calculate_distance,
+    calculate_distance_matrix,
+    calculate_distances,
+)
+
+rng = np.random.default_rng(0)
+LONS = rng.uniform(122.0, 146.0, 200)
+LATS = rng.uniform(24.0, 46.0, 200)
+
+
+def test_calculate_distances_matches_scalar():
+    distances = calculate_distances(139.7, 35.68, LONS, LATS)
+    expected = [calculate_distance(139.7, 35.68, lon, lat) for lon, lat in zip(LONS, LATS)]
+    np.testing.assert_allclose(distances, expected, rtol=1e-12, atol=1e-9)
+
+
+def test_calculate_distances_same_point_is_zero():
+    assert calculate_distances(135.5, 34.7, [135.5], [34.7])[0] == 0.0
+
+
+def test_calculate_distance_matrix_matches_scalar_across_chunks():
+    # 1ブロック7要素に制限して、行方向の分割の境界をまたぐ
+    matrix = calculate_distance_matrix(LONS[:13], LATS[:13], LONS[:5], LATS[:5], chunk_elements=7)
+    assert matrix.shape == (13, 5)
+    for i in range(13):
+        for j in range(5):
+            assert np.isclose(matrix[i, j], calculate_distance(LONS[i], LATS[i], LONS[j], LATS[j]), rtol=1e-12, atol=1e-9)
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from pathlib import Path
+
+import httpx
+
+from backend.app.utils.html_archive import HtmlArchive
+from backend.app.utils.html_extractors import get_html_extractor
+from backend.app.utils.rate_limiter import HostRateLimiter
+from backend.app.utils.rent_scraper import SuumoScraper, _parse_archived_pages
+from backend.app.utils.scrape_state import ScrapeStateStore
+
+FIXTURE_DIR = Path(__file__).parents[1] / "fixtures" / "suumo"
+LINE_URL = "https://suumo.jp/chintai/soba/tokyo/en_yamanotesen/"
+LINE_HTML = (FIXTURE_DIR / "line_tokyo_yamanote.html").read_text(encoding="utf-8")
+
+
+class StubSite:
+    """URLごとのレスポンスを返すMockTransportのハンドラ（リクエストを記録する）"""
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.pages[str(request.url)](request)
+
+
+def make_scraper(site: StubSite, **kwargs) -> SuumoScraper:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(site))
+    return SuumoScraper(
+        headers={}, client=client, rate_limiter=HostRateLimiter(rate=1000.0, burst=1000),
+        extractor=get_html_extractor("bs4"), **kwargs
+    )
+
+
+def test_charset_is_detected_from_the_body():
+    # Content-Typeにcharsetのない Shift_JIS のページ
+    body = LINE_HTML.replace('charset="UTF-8"', 'charset="Shift_JIS"').encode("cp932")
+    site = StubSite({LINE_URL: lambda request: httpx.Response(200, content=body, headers={"Content-Type": "text/html"})})
+
+    async def fetch():
+        scraper = make_scraper(site)
+        result = await scraper.get_station_rent_list(LINE_URL)
+        await scraper.client.aclose()
+        return result
+
+    expected = get_html_extractor("bs4").extract_station_rents(LINE_HTML, LINE_URL)
+    assert asyncio.run(fetch()) == expected
+    assert expected[0].station == "駅0"
+
+
+class ConditionalPage:
+    """ETagによる条件付きリクエストに対応したページ"""
+    def __init__(self, body: bytes, etag: str = '"v1"'):
+        self.body = body
+        self.etag = etag
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.etag and request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304, headers={"ETag": self.etag})
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        if self.etag:
+            headers["ETag"] = self.etag
+        return httpx.Response(200, content=self.body, headers=headers)
+
+
+def test_unchanged_pages_are_not_parsed_again(tmp_path):
+    page = ConditionalPage(LINE_HTML.encode("utf-8"))
+    site = StubSite({LINE_URL: page})
+    state_store = ScrapeStateStore(str(tmp_path / "state.sqlite3"))
+
+    async def scrape_run():
+        state_store.begin_run()
+        scraper = make_scraper(site, state_store=state_store)
+        first = await scraper.get_station_rent_list(LINE_URL)
+        # 同じ実行で確認済みのページは取得しない
+        second = await scraper.get_station_rent_list(LINE_URL)
+        await scraper.client.aclose()
+        state_store.finish_run()
+        return scraper.page_stats, first, second
+
+    stats, first, second = asyncio.run(scrape_run())
+    assert stats == {"parsed": 1, "not_modified": 0, "unchanged": 0, "resumed": 1}
+    assert first == second and len(site.requests) == 1
+
+    # 次の実行では条件付きリクエストを送り、304なら前回の解析結果を返す
+    stats, first, _ = asyncio.run(scrape_run())
+    assert stats["not_modified"] == 1 and stats["parsed"] == 0
+    assert site.requests[-1].headers["If-None-Match"] == '"v1"'
+    assert first == second
+
+    # 検証子がなくても本文のハッシュが同じなら解析しない
+    page.etag = None
+    stats, first, _ = asyncio.run(scrape_run())
+    assert stats["unchanged"] == 1 and stats["parsed"] == 0
+    assert first == second
+
+
+def test_not_modified_and_resumed_pages_are_archived(tmp_path):
+    site = StubSite({LINE_URL: ConditionalPage(LINE_HTML.encode("utf-8"))})
+    state_store = ScrapeStateStore(str(tmp_path / "state.sqlite3"))
+    archive_dir = str(tmp_path / "archive")
+    archive = HtmlArchive(archive_dir)
+
+    async def scrape_run(fetch_count=1):
+        state_store.begin_run()
+        scraper = make_scraper(site, state_store=state_store, archive=archive)
+        results = [await scraper.get_station_rent_list(LINE_URL) for _ in range(fetch_count)]
+        await scraper.client.aclose()
+        state_store.finish_run()
+        return scraper.page_stats, results[-1]
+
+    _, parsed = asyncio.run(scrape_run())
+    first_run_end = time.time()
+    stats, _ = asyncio.run(scrape_run(fetch_count=2))
+    assert stats["not_modified"] == 1 and stats["resumed"] == 1
+
+    # 304・再開の取得も最後に保存した本文の記録として残り、その時点のページとして再解析できる
+    pages = archive.latest_pages()
+    assert len(pages) == 1 and pages[0].fetched_at > first_run_end
+    replayed = _parse_archived_pages(archive_dir, pages, "bs4")
+    assert replayed[0][:3] == (LINE_URL, "station_rents", parsed)
+    fetch_count = archive._conn.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+    assert fetch_count == 3
+    archive.close()
+
+
+def test_pages_missing_from_the_archive_are_fetched_in_full(tmp_path):
+    site = StubSite({LINE_URL: ConditionalPage(LINE_HTML.encode("utf-8"))})
+    state_store = ScrapeStateStore(str(tmp_path / "state.sqlite3"))
+
+    async def scrape_run(archive=None):
+        state_store.begin_run()
+        scraper = make_scraper(site, state_store=state_store, archive=archive)
+        result = await scraper.get_station_rent_list(LINE_URL)
+        await scraper.client.aclose()
+        state_store.finish_run()
+        return scraper.page_stats, result
+
+    _, parsed = asyncio.run(scrape_run())
+    # 前回はアーカイブなしで取得したため、条件付きリクエストを使わずに本文を取得して保存する
+    archive = HtmlArchive(str(tmp_path / "archive"))
+    stats, result = asyncio.run(scrape_run(archive))
+    assert stats["parsed"] == 1 and result == parsed
+    assert "If-None-Match" not in site.requests[-1].headers
+    assert archive.latest_page(LINE_URL).content_hash == state_store.get(LINE_URL).content_hash
+    archive.close()
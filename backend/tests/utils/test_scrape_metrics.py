@@ -0,0 +1,45 @@
+import threading
+
+from backend.app.utils.scrape_metrics import ScrapeMetrics
+
+
+def test_try_start_claims_the_run_only_once():
+    metrics = ScrapeMetrics()
+    barrier = threading.Barrier(8)
+    claimed = []
+
+    def claim():
+        barrier.wait()
+        claimed.append(metrics.try_start())
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == [False] * 7 + [True]
+    assert metrics.snapshot()["status"] == "running"
+
+    metrics.finish(error="failed")
+    assert metrics.try_start(shard="1/2")
+    snapshot = metrics.snapshot()
+    assert (snapshot["status"], snapshot["shard"], snapshot["error"]) == ("running", "1/2", None)
+
+
+def test_progress_and_eta():
+    metrics = ScrapeMetrics()
+    metrics.start()
+    metrics.set_lines_total(4)
+    metrics.record_line_done(queue_depth=3)
+    metrics.record_page("station_rents", "parsed")
+    snapshot = metrics.snapshot()
+    assert snapshot["progress"]["lines_done"] == 1
+    assert snapshot["progress"]["percent"] == 25.0
+    assert snapshot["progress"]["max_queue_depth"] == 3
+    assert snapshot["pages_total"] == 1
+
+    metrics.finish()
+    snapshot = metrics.snapshot()
+    assert snapshot["status"] == "finished"
+    assert snapshot["progress"]["eta_seconds"] is None
@@ -0,0 +1,108 @@
+import asyncio
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from backend.app.utils import rent_scraper
+from backend.app.utils.rent_models import Line, Prefecture, StationRentInfo
+from backend.app.utils.rent_scraper import (
+    ArchiveReplayScraper,
+    ScrapingOrchestrator,
+    load_prefecture_code_map,
+    publish_shard_data,
+    station_record_sort_key,
+)
+from backend.app.utils.scrape_shards import (
+    ShardSpec,
+    find_missing_shards,
+    merge_shard_files,
+    parse_shard_spec,
+    shard_file_path,
+)
+from backend.app.utils.station_data_writer import SortedSpool
+
+BASE_URL = "https://suumo.jp/chintai/soba/"
+PREFECTURE_CODES_FILE = str(Path(__file__).parents[2] / "app" / "const" / "prefecture_codes.json")
+PREFECTURE_CODES = load_prefecture_code_map(PREFECTURE_CODES_FILE)
+SORT_KEY = station_record_sort_key(PREFECTURE_CODES)
+
+
+def build_site() -> dict:
+    """都道府県一覧・路線一覧・路線ページの解析結果（県境をまたぐ路線を含む）"""
+    prefectures = ["北海道", "東京都", "神奈川県"]
+    pages = {BASE_URL: [Prefecture(name, f"{BASE_URL}{i}/ensen/") for i, name in enumerate(prefectures)]}
+    for i, name in enumerate(prefectures):
+        lines = [Line(f"{name}線{j}", f"{BASE_URL}line_{i}_{j}/") for j in range(8)]
+        if name != "北海道":
+            lines.append(Line("東急東横線", f"{BASE_URL}line_toyoko/"))
+        pages[f"{BASE_URL}{i}/ensen/"] = {"会社A": lines[:4], "会社B": lines[4:]}
+        for line in lines:
+            pages[line.url] = [StationRentInfo(f"{line.name}駅{k}", f"{5 + k}.5") for k in range(3)]
+    return pages
+
+
+def scrape(pages: dict, spool: SortedSpool, shard: ShardSpec | None = None):
+    orchestrator = ScrapingOrchestrator(scraper=ArchiveReplayScraper(pages), max_workers=4, shard=shard)
+    asyncio.run(orchestrator.execute(BASE_URL, sink=lambda station_data: spool.write(asdict(station_data))))
+
+
+def collect(pages: dict) -> list:
+    """シャードに分けずに取得した場合の並べ替え済みの駅データ"""
+    with SortedSpool(sort_key=SORT_KEY) as spool:
+        scrape(pages, spool)
+        return list(spool.iter_sorted())
+
+
+def write_shard(pages: dict, shard_dir: str, shard: ShardSpec) -> bytes:
+    with SortedSpool(sort_key=SORT_KEY) as spool:
+        scrape(pages, spool, shard)
+        assert publish_shard_data(spool.iter_sorted(), shard_dir, shard)
+    return Path(shard_file_path(shard_dir, shard)).read_bytes()
+
+
+def test_parse_shard_spec():
+    assert parse_shard_spec("2/4") == ShardSpec(2, 4)
+    assert str(ShardSpec(2, 4)) == "2/4" and ShardSpec(2, 4).index == 1
+    for value in ("4", "0/4", "5/4", "1/0"):
+        with pytest.raises(ValueError):
+            parse_shard_spec(value)
+
+
+def test_merged_shards_match_unsharded_run(tmp_path):
+    pages = build_site()
+    shard_dir = str(tmp_path / "shards")
+    shards = [ShardSpec(number, 3) for number in range(1, 4)]
+    outputs = [write_shard(pages, shard_dir, shard) for shard in shards]
+
+    # 同じシャードを再実行しても同じ出力になる
+    assert write_shard(pages, shard_dir, shards[1]) == outputs[1]
+    assert all(outputs)
+    merged = list(merge_shard_files(shard_dir, 3, SORT_KEY))
+    assert merged == collect(pages)
+    # 県境をまたぐ路線は1つのシャードで1回だけ取得し、各都道府県に振り分ける
+    assert sum(record["line_name"] == "東急東横線" for record in merged) == 6
+
+
+def test_merge_reports_missing_shards(tmp_path, monkeypatch):
+    pages = build_site()
+    shard_dir = str(tmp_path / "shards")
+    output = str(tmp_path / "rent_marketprice.json")
+    monkeypatch.setattr(rent_scraper.PathConfig, "PREFECTURE_CODE_MAP_FILE", PREFECTURE_CODES_FILE)
+    write_shard(pages, shard_dir, ShardSpec(1, 2))
+
+    assert find_missing_shards(shard_dir, 2) == [ShardSpec(2, 2)]
+    with pytest.raises(FileNotFoundError):
+        merge_shard_files(shard_dir, 2, SORT_KEY)
+    # mainは終了せずに終了コードを返す（APIのバックグラウンドタスクからも呼ばれるため）
+    assert rent_scraper.main(["--merge", "2", "--shard-dir", shard_dir, "--output", output]) == 1
+    assert not Path(output).exists()
+
+    write_shard(pages, shard_dir, ShardSpec(2, 2))
+    assert rent_scraper.main(["--merge", "2", "--shard-dir", shard_dir, "--output", output]) == 0
+    with open(output, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    expected = collect(pages)
+    assert [record["station_name"] for record in saved] == [record["station_name"] for record in expected]
+    assert all(record["lastupdate"] for record in saved)
@@ -0,0 +1,43 @@
+from backend.app.utils.scrape_state import ScrapeStateStore
+
+URL = "https://suumo.jp/chintai/soba/tokyo/en_yamanotesen/"
+
+
+def test_unfinished_run_is_resumed(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    store = ScrapeStateStore(path)
+    run_id = store.begin_run()
+    store.save(URL, '"v1"', None, "hash", "[]")
+    assert store.is_checked_in_current_run(store.get(URL))
+    store.close()
+
+    # 中断した実行は同じIDで再開し、確認済みのページはそのまま
+    reopened = ScrapeStateStore(path)
+    assert reopened.begin_run() == run_id
+    assert reopened.is_checked_in_current_run(reopened.get(URL))
+    assert reopened.count_pages() == {"total": 1, "checked_in_current_run": 1}
+
+    # 完了した実行の次は新しい実行になり、前回の状態は再検証の対象になる
+    reopened.finish_run()
+    assert reopened.begin_run() != run_id
+    assert not reopened.is_checked_in_current_run(reopened.get(URL))
+    assert reopened.count_pages() == {"total": 1, "checked_in_current_run": 0}
+
+
+def test_mark_checked_keeps_validators_unless_new_ones_are_given(tmp_path):
+    store = ScrapeStateStore(str(tmp_path / "state.sqlite3"))
+    store.begin_run()
+    store.save(URL, '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT", "hash", '[{"station": "駅0"}]')
+    store.finish_run()
+    store.begin_run()
+
+    store.mark_checked(URL)
+    state = store.get(URL)
+    assert (state.etag, state.last_modified) == ('"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    assert store.is_checked_in_current_run(state)
+
+    store.mark_checked(URL, etag='"v2"')
+    state = store.get(URL)
+    assert (state.etag, state.last_modified) == ('"v2"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    assert state.parse_result == '[{"station": "駅0"}]'
+    assert store.get("https://suumo.jp/missing/") is None
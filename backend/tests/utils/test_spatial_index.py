@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from backend.app.utils.point_to_point_distance import calculate_distances
+from backend.app.utils.spatial_index import GridSpatialIndex
+
+rng = np.random.default_rng(0)
+LONS = rng.uniform(139.0, 140.5, 2000)
+LATS = rng.uniform(35.0, 36.2, 2000)
+POINTS = list(zip(LONS.tolist(), LATS.tolist()))
+
+
+def brute_force(lon, lat, radius_km):
+    distances = calculate_distances(lon, lat, LONS, LATS)
+    indices = np.flatnonzero(distances <= radius_km)
+    return sorted(indices.tolist(), key=lambda i: distances[i])
+
+
+@pytest.mark.parametrize("cell_size_deg", [0.01, 0.05, 1.0])
+def test_query_radius_matches_brute_force(cell_size_deg):
+    index = GridSpatialIndex(POINTS, cell_size_deg=cell_size_deg)
+    for lon, lat, radius in [(139.7, 35.68, 0.5), (139.7, 35.68, 5.0), (140.5, 36.2, 12.0), (138.0, 35.0, 3.0)]:
+        results = index.query_radius(lon, lat, radius)
+        assert [i for i, _ in results] == brute_force(lon, lat, radius)
+        distances = [distance for _, distance in results]
+        assert distances == sorted(distances)
+        assert all(distance <= radius for distance in distances)
+
+
+def test_query_radius_many_matches_single_queries():
+    index = GridSpatialIndex(POINTS)
+    queries = [(139.7, 35.68, 2.0), (140.1, 35.9, 7.5), (138.0, 35.0, 3.0), (139.7, 35.68, 2.0)]
+    assert index.query_radius_many(queries) == [index.query_radius(*query) for query in queries]
+
+
+def test_empty_index_and_empty_queries():
+    index = GridSpatialIndex([])
+    assert len(index) == 0
+    assert index.query_radius(139.7, 35.68, 10.0) == []
+    assert index.query_radius_many([(139.7, 35.68, 10.0)]) == [[]]
+    assert GridSpatialIndex(POINTS).query_radius_many([]) == []
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+from backend.app.utils.station_data_writer import (
+    SortedSpool,
+    iter_jsonl,
+    write_json_array_atomic,
+    write_jsonl_atomic,
+)
+
+RECORDS = [
+    {"prefecture": "東京都", "line": "山手線", "stations": [{"station": "東京", "rent": "11.3"}, {"station": "神田", "rent": "-"}]},
+    {"prefecture": "北海道", "line": "函館本線", "stations": [], "extra": {}},
+    {"prefecture": "沖縄県", "line": "ゆいレール", "stations": [{"station": "那覇空港", "rent": None}], "note": "\"引用\"\n改行"},
+]
+
+
+def json_dump_bytes(records, tmp_path) -> bytes:
+    path = tmp_path / "expected.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=4)
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize("records", [RECORDS, RECORDS[:1], []])
+def test_json_array_is_byte_identical_to_json_dump(tmp_path, records):
+    path = str(tmp_path / "out" / "data.json")
+    assert write_json_array_atomic(iter(records), path) == len(records)
+    expected = json_dump_bytes(records, tmp_path)
+    with open(path, "rb") as f:
+        assert f.read() == expected
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o644)
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    write_json_array_atomic(RECORDS, path)
+
+    def broken_records():
+        yield RECORDS[0]
+        raise RuntimeError("scrape failed")
+
+    with pytest.raises(RuntimeError):
+        write_json_array_atomic(broken_records(), path)
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f) == RECORDS
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_sorted_spool_is_stable_across_runs(tmp_path):
+    records = [{"key": i % 5, "order": i} for i in range(103)]
+    with SortedSpool(sort_key=lambda record: record["key"], directory=str(tmp_path), run_size=10) as spool:
+        for record in records:
+            spool.write(record)
+        assert len(spool) == len(records)
+        # 同じキーのレコードはランをまたいでも書き込み順を保つ
+        assert list(spool.iter_sorted()) == sorted(records, key=lambda record: record["key"])
+    assert os.listdir(tmp_path) == []
+
+
+def test_jsonl_round_trip(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    assert write_jsonl_atomic(RECORDS, path) == len(RECORDS)
+    assert list(iter_jsonl(path)) == RECORDS
@@ -0,0 +1,106 @@
+import json
+import warnings
+
+import geopandas as gpd
+import pytest
+
+from backend.app.utils.point_to_point_distance import calculate_distance
+from backend.app.utils.station_repository import StationRecord, StationRepository
+
+RECORDS = [
+    StationRecord("003700", "東京", "山手線", "東日本旅客鉄道", 139.7671, 35.6812),
+    StationRecord("003701", "有楽町", "山手線", "東日本旅客鉄道", 139.7630, 35.6749),
+    StationRecord("003702", "新橋", "山手線", "東日本旅客鉄道", 139.7584, 35.6663),
+    StationRecord("004500", "東京", "丸ノ内線", "東京地下鉄", 139.7645, 35.6818),
+    # 同じ駅IDの2件目は駅ID検索では使われない
+    StationRecord("003700", "東京(重複)", "東海道線", "東日本旅客鉄道", 139.7670, 35.6810),
+    StationRecord("900000", "大阪", "大阪環状線", "西日本旅客鉄道", 135.4959, 34.7024),
+]
+
+
+@pytest.fixture
+def repository():
+    return StationRepository(RECORDS)
+
+
+def test_lookup_by_station_id_keeps_first_record(repository):
+    assert len(repository) == len(RECORDS)
+    assert repository.get_by_station_id("003700").name == "東京"
+    assert repository.get_by_station_id("900000").name == "大阪"
+    assert repository.get_by_station_id("missing") is None
+
+
+def test_lookup_by_line_and_company(repository):
+    stations = repository.find_by_line_and_company("山手線", "東日本旅客鉄道")
+    assert [station.name for station in stations] == ["東京", "有楽町", "新橋"]
+    assert repository.find_by_line_and_company("山手線", "東京地下鉄") == []
+
+
+def test_find_nearby_matches_brute_force(repository):
+    lon, lat, radius = 139.7650, 35.6800, 1.5
+    expected = sorted(
+        (calculate_distance(lon, lat, record.lng, record.lat), index)
+        for index, record in enumerate(RECORDS)
+        if calculate_distance(lon, lat, record.lng, record.lat) <= radius
+    )
+    results = repository.find_nearby(lon, lat, radius)
+    assert [station for station, _ in results] == [RECORDS[index] for _, index in expected]
+    for (_, distance), (expected_distance, _) in zip(results, expected):
+        assert distance == pytest.approx(expected_distance, rel=1e-12)
+    assert all(station.name != "大阪" for station, _ in results)
+
+
+def test_find_nearby_many_matches_single_queries(repository):
+    queries = [(139.7650, 35.6800, 1.5), (135.5, 34.7, 2.0), (0.0, 0.0, 1.0)]
+    assert repository.find_nearby_many(queries) == [repository.find_nearby(*query) for query in queries]
+
+
+def test_from_geojson_computes_centroids(tmp_path):
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"S12_001c": 3700, "S12_001": "東京", "S12_003": "山手線", "S12_002": "東日本旅客鉄道"},
+            "geometry": {"type": "LineString", "coordinates": [[139.76, 35.68], [139.77, 35.68]]},
+        },
+    ]
+    path = tmp_path / "stations.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}, ensure_ascii=False), encoding="utf-8")
+
+    repository = StationRepository.from_geojson(path)
+    station = repository.get_by_station_id("3700")
+    assert station.name == "東京"
+    assert station.lng == pytest.approx(139.765)
+    assert station.lat == pytest.approx(35.68)
+    with pytest.raises(FileNotFoundError):
+        StationRepository.from_geojson(tmp_path / "missing.geojson")
+
+
+def test_from_geojson_matches_per_row_centroids(tmp_path):
+    # 頂点の平均と幾何学的な重心が一致しない形状で、従来の row.geometry.centroid と比較する
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"S12_001c": 100, "S12_001": "折れ線", "S12_003": "線A", "S12_002": "会社A"},
+            "geometry": {"type": "LineString", "coordinates": [[139.70, 35.60], [139.701, 35.60], [139.75, 35.65]]},
+        },
+        {
+            "type": "Feature",
+            "properties": {"S12_001c": 200, "S12_001": "多角形", "S12_003": "線B", "S12_002": "会社B"},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[135.0, 34.0], [135.1, 34.0], [135.1, 34.01], [135.0, 34.3], [135.0, 34.0]]],
+            },
+        },
+    ]
+    path = tmp_path / "stations.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}, ensure_ascii=False), encoding="utf-8")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        repository = StationRepository.from_geojson(path)
+
+    gdf = gpd.read_file(path, encoding='utf-8')
+    for _, row in gdf.iterrows():
+        station = repository.get_by_station_id(str(row["S12_001c"]))
+        assert station.lng == row.geometry.centroid.x
+        assert station.lat == row.geometry.centroid.y
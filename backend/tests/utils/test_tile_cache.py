@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from backend.app.utils.tile_cache import TileCache, TileKey
+
+
+def tile_key(x: int) -> TileKey:
+    return TileKey(api="XKT031", z=12, x=x, y=0, response_format="geojson")
+
+
+def test_memory_lru_evicts_least_recently_used(tmp_path):
+    cache = TileCache(str(tmp_path / "tiles.sqlite3"), memory_max_entries=2)
+    cache.set(tile_key(1), b"one", "application/json")
+    cache.set(tile_key(2), b"two", "application/json")
+    assert cache.get(tile_key(1)).content == b"one"
+    cache.set(tile_key(3), b"three", "application/json")
+
+    # 2が最も古いのでLRUから外れ、永続ストアから読み直される
+    assert cache.get_from_memory(tile_key(2)) is None
+    assert cache.get_from_memory(tile_key(1)).content == b"one"
+    assert cache.get(tile_key(2)).content == b"two"
+    stats = cache.stats()
+    assert stats["memory_evictions"] == 2
+    assert stats["disk_hits"] == 1
+
+
+def test_memory_lru_respects_byte_limit(tmp_path):
+    cache = TileCache(str(tmp_path / "tiles.sqlite3"), memory_max_bytes=10)
+    cache.set(tile_key(1), b"x" * 6, "application/json")
+    cache.set(tile_key(2), b"y" * 6, "application/json")
+    assert cache.stats()["memory_bytes"] == 6
+    assert cache.get_from_memory(tile_key(1)) is None
+
+
+def test_disk_evicts_least_recently_accessed(tmp_path):
+    path = str(tmp_path / "tiles.sqlite3")
+    cache = TileCache(path, memory_max_entries=0, disk_max_bytes=30)
+    cache.set(tile_key(1), b"a" * 10, "application/json")
+    cache.set(tile_key(2), b"b" * 10, "application/json")
+    cache.set(tile_key(3), b"c" * 10, "application/json")
+    time.sleep(0.01)
+    # 1へのアクセス時刻は遅延書き込みだが、追い出しの前に反映される
+    assert cache.get(tile_key(1)) is not None
+    cache.set(tile_key(4), b"d" * 10, "application/json")
+
+    assert cache.get(tile_key(2)) is None
+    assert cache.get(tile_key(1)).content == b"a" * 10
+    assert cache.stats()["disk_evictions"] == 1
+    assert cache.stats()["disk_bytes"] == 30
+
+
+def test_access_times_are_batched(tmp_path):
+    cache = TileCache(str(tmp_path / "tiles.sqlite3"), memory_max_entries=0, access_flush_entries=3)
+    for x in range(3):
+        cache.set(tile_key(x), b"data", "application/json")
+    stored = dict(cache._conn.execute("SELECT key, accessed_at FROM tiles"))
+
+    time.sleep(0.01)
+    cache.get(tile_key(0))
+    cache.get(tile_key(1))
+    assert dict(cache._conn.execute("SELECT key, accessed_at FROM tiles")) == stored
+
+    cache.get(tile_key(2))
+    updated = dict(cache._conn.execute("SELECT key, accessed_at FROM tiles"))
+    assert all(updated[key] > stored[key] for key in stored)
+
+
+def test_expired_tiles_are_misses(tmp_path):
+    cache = TileCache(str(tmp_path / "tiles.sqlite3"), ttl_seconds=0.01)
+    cache.set(tile_key(1), b"data", "application/json")
+    time.sleep(0.02)
+    assert cache.get(tile_key(1)) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_async_access_and_persistence(tmp_path):
+    path = str(tmp_path / "tiles.sqlite3")
+
+    async def store_and_read():
+        cache = TileCache(path)
+        stored = await cache.aset(tile_key(1), b"data", "application/json", "gzip")
+        return stored, await cache.aget(tile_key(1)), await cache.aget(tile_key(2))
+
+    stored, hit, miss = asyncio.run(store_and_read())
+    assert stored.content == b"data" and stored.content_encoding == "gzip"
+    assert hit == stored
+    assert miss is None
+
+    reopened = TileCache(path)
+    tile = asyncio.run(reopened.aget(tile_key(1)))
+    assert tile.content == b"data"
+    assert reopened.stats()["disk_hits"] == 1
@@ -0,0 +1,52 @@
+import asyncio
+
+from backend.app.utils.url_frontier import UrlFrontier, normalize_url, shard_index
+
+URLS = [f"https://suumo.jp/chintai/soba/tokyo/en_{i}/" for i in range(50)]
+
+
+def test_duplicate_urls_are_merged_with_their_owners():
+    frontier = UrlFrontier()
+    assert frontier.add("https://suumo.jp/chintai/soba/tokyo/en_1/", "東京都")
+    assert not frontier.add("HTTPS://SUUMO.JP/chintai/soba/tokyo/en_1/#top", "神奈川県")
+    assert frontier.add("https://suumo.jp/chintai/soba/tokyo/en_2/", "東京都")
+
+    assert len(frontier) == 2
+    assert frontier.added_count == 3
+    assert frontier.duplicate_count == 1
+    assert frontier.owners("https://suumo.jp/chintai/soba/tokyo/en_1/") == ["東京都", "神奈川県"]
+    assert normalize_url("https://SUUMO.jp") == "https://suumo.jp/"
+
+
+def test_shards_partition_urls_deterministically():
+    frontier = UrlFrontier()
+    for i, url in enumerate(URLS):
+        frontier.add(url, i)
+
+    shards = [frontier.select_shard(index, 4) for index in range(4)]
+    assert sorted(url for shard in shards for url in shard) == sorted(frontier)
+    assert sum(shard.added_count for shard in shards) == frontier.added_count
+    for index, shard in enumerate(shards):
+        assert all(shard_index(url, 4) == index for url in shard)
+    # ハッシュはプロセスによらず固定（組み込みのhash()に依存しない）
+    assert [shard_index(url, 4) for url in URLS[:5]] == [1, 0, 0, 1, 1]
+
+
+def test_drain_bounds_the_queue_and_survives_handler_errors():
+    frontier = UrlFrontier()
+    for i, url in enumerate(URLS):
+        frontier.add(url, i)
+
+    handled, depths = [], []
+
+    async def handler(url, owners):
+        depths.append(frontier.queue_depth)
+        await asyncio.sleep(0)
+        if owners == [3]:
+            raise RuntimeError("parse error")
+        handled.append(url)
+
+    asyncio.run(frontier.drain(handler, concurrency=3, queue_size=5))
+    assert sorted(handled) == sorted(url for url in URLS if url != URLS[3])
+    assert max(depths) <= 5
+    assert frontier.queue_depth == 0
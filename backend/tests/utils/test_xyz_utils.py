@@ -0,0 +1,59 @@
+import numpy as np
+
+from backend.app.utils.point_to_point_distance import calculate_distances
+from backend.app.utils.xyz_utils import (
+    lon_lat_to_xyz,
+    lon_lat_to_xyz_array,
+    tiles_covering_circle,
+    xyz_array_to_tile_center_lon_lat,
+    xyz_to_bbox,
+    xyz_to_tile_center_lon_lat,
+)
+
+rng = np.random.default_rng(0)
+LONS = rng.uniform(-179.9, 179.9, 500)
+LATS = rng.uniform(-85.0, 85.0, 500)
+
+
+def test_lon_lat_to_xyz_array_matches_scalar():
+    for z in (0, 5, 11, 15, 18):
+        xs, ys = lon_lat_to_xyz_array(LONS, LATS, z)
+        expected = [lon_lat_to_xyz(lon, lat, z) for lon, lat in zip(LONS, LATS)]
+        assert xs.tolist() == [xyz["x"] for xyz in expected]
+        assert ys.tolist() == [xyz["y"] for xyz in expected]
+
+
+def test_xyz_array_to_tile_center_lon_lat_matches_scalar():
+    z = 12
+    xs, ys = lon_lat_to_xyz_array(LONS, LATS, z)
+    center_lons, center_lats = xyz_array_to_tile_center_lon_lat(xs, ys, z)
+    for x, y, lon, lat in zip(xs, ys, center_lons, center_lats):
+        expected = xyz_to_tile_center_lon_lat({"z": z, "x": int(x), "y": int(y)})
+        assert np.isclose(lon, expected["lon"], rtol=0, atol=1e-12)
+        assert np.isclose(lat, expected["lat"], rtol=0, atol=1e-12)
+
+
+def test_tiles_covering_circle_contains_every_point_in_the_circle():
+    lon, lat, radius, z = 139.7671, 35.6812, 3.0, 14
+    tiles = tiles_covering_circle(lon, lat, radius, z)
+    covered = {(tile["x"], tile["y"]) for tile in tiles}
+    assert len(covered) == len(tiles)
+    assert all(tile["z"] == z for tile in tiles)
+
+    # 円内の点が必ずいずれかのタイルに含まれる
+    sample_lons = rng.uniform(lon - 0.05, lon + 0.05, 5000)
+    sample_lats = rng.uniform(lat - 0.05, lat + 0.05, 5000)
+    within = calculate_distances(lon, lat, sample_lons, sample_lats) <= radius
+    xs, ys = lon_lat_to_xyz_array(sample_lons[within], sample_lats[within], z)
+    assert set(zip(xs.tolist(), ys.tolist())) <= covered
+
+    # 円と交差しないタイルは含まない
+    for tile in tiles:
+        west, south, east, north = xyz_to_bbox(tile)
+        nearest_lon = min(max(lon, west), east)
+        nearest_lat = min(max(lat, south), north)
+        assert calculate_distances(lon, lat, [nearest_lon], [nearest_lat])[0] <= radius
+
+
+def test_tiles_covering_small_circle_is_single_tile():
+    assert tiles_covering_circle(139.7671, 35.6812, 0.01, 11) == [lon_lat_to_xyz(139.7671, 35.6812, 11)]